@@ -6,13 +6,14 @@ import time
 import tempfile
 from tkinter import Tk, Label, Button, filedialog, messagebox, Frame, Entry, LabelFrame, Canvas, Toplevel, Scrollbar, StringVar, Listbox, END, ttk, LEFT, RIGHT, BooleanVar, Checkbutton
 from PIL import Image, ImageTk
-import cv2
 import threading
-import pygame
-from moviepy import VideoFileClip
-from LogicaRenombramiento import RenamerTool
-from LogicaFacial import FaceBrain
+from LogicaRenombramiento import RenamerTool, formato_bytes
+from LogicaDiario import diario_por_defecto
+from LogicaProgreso import ReporteProgreso, texto_progreso
+from LogicaFacial import FaceBrain, ColaSugerencias, SUGERENCIA_ERROR, precalentar_async
+from LogicaVisor import Precargador, CacheMiniaturas, PobladorMiniaturas
 from EditorImagen import EditorImagen
+from CuadriculaMiniaturas import CuadriculaMiniaturas
 
 COLOR_BG = "#202124"
 COLOR_SIDEBAR = "#2f3136"
@@ -23,6 +24,8 @@ COLOR_TEXT = "#ffffff"
 COLOR_TEXT_SEC = "#b9bbbe"
 FONT_MAIN = ("Segoe UI", 10)
 FONT_BOLD = ("Segoe UI", 11, "bold")
+# "Vaciar Cuarentena" solo borra lo eliminado hace más de estos días
+DIAS_CUARENTENA = 30
 
 class Clasificador:
     def __init__(self):
@@ -33,18 +36,27 @@ class Clasificador:
         alto = self.ventana.winfo_screenheight()
         self.cursor = 'hand2' if platform.system() != 'Darwin' else 'pointinghand'
         
-        try: pygame.mixer.init()
-        except: print("No se pudo iniciar el audio")
+        # cv2, pygame, moviepy y DeepFace se importan en el primer uso;
+        # el audio y el modelo de IA se preparan en segundo plano
+        threading.Thread(target=self._iniciar_audio, daemon=True).start()
         
         self.renamer = RenamerTool(log_callback=print)
+        self.diario = diario_por_defecto()
         self.ia = None
         self.sugerenciaIA = StringVar(value="IA Inactiva")
         self.estado_carga_texto = StringVar(value="Esperando configuración...")
         
         self.var_autoclose = BooleanVar(value=True)
-        self.current_job_id = 0
+        # Sugerencias de la IA calculadas por adelantado para toda la cola
+        self.sugerencias = None
+        self.reporte_ia = ReporteProgreso(self.ventana).iniciar()
         
         self.popup_video_actual = None
+        # Vistas ya escaladas de los elementos cercanos, preparadas en segundo plano a
+        # partir de las miniaturas en disco, que otro hilo de baja prioridad va creando
+        self.miniaturas = CacheMiniaturas()
+        self.precarga = Precargador(decodificar=self.miniaturas.vista)
+        self.poblador = PobladorMiniaturas(self.miniaturas)
         
         self.ventana.geometry(f'{ancho}x{alto}+{ancho // 2 - ancho // 2}+{alto // 2 - alto // 2}')
         self.ventana.resizable(True, True)
@@ -61,8 +73,15 @@ class Clasificador:
         self.videoValido = ('.mp4', '.avi', '.mov', '.mkv')
         
         self.setup_ui()
+        self.ventana.after(200, lambda: precalentar_async(FaceBrain.DEFAULT_MODEL))
         self.ventana.mainloop()
 
+    def _iniciar_audio(self):
+        try:
+            import pygame
+            pygame.mixer.init()
+        except: print("No se pudo iniciar el audio")
+
     def setup_ui(self):
         self.panel_izquierdo = Frame(self.ventana, bg=COLOR_SIDEBAR, width=250)
         self.panel_izquierdo.pack(side='left', fill='y')
@@ -82,6 +101,7 @@ class Clasificador:
         
         Label(self.panel_izquierdo, text="ACCIONES", bg=COLOR_SIDEBAR, fg=COLOR_TEXT_SEC, font=("Arial", 8, "bold")).pack(pady=(5, 5), anchor="w", padx=15)
         self.btn_crear_moderno(self.panel_izquierdo, "Nueva Carpeta", self.nuevaCarpetaPopup, "#4f545c", ruta_imagen="iconos/agregarIcono.png")
+        self.btn_crear_moderno(self.panel_izquierdo, "Cuadrícula", self.abrirCuadricula, "#4f545c")
         self.btn_crear_moderno(self.panel_izquierdo, "Herramientas", self.abrir_menu_herramientas, COLOR_WARNING, ruta_imagen="iconos/herramientasIcono.png")
 
         self.panel_derecho = Frame(self.ventana, bg=COLOR_SIDEBAR, width=280)
@@ -230,10 +250,11 @@ class Clasificador:
             if actual >= total:
                 self.barra_carga['value'] = 100
                 self.estado_carga_texto.set("IA Activa y Lista")
-                if self.lista:
+                # Las sugerencias calculadas antes de cargar las referencias ya no valen
+                self._olvidar_sugerencias()
+                if self.lista and self.sugerencias:
                     self.sugerenciaIA.set("Re-Analizando...")
-                    self.current_job_id += 1
-                    threading.Thread(target=self._predecir_actual, args=(self.lista[self.indiceActual], self.current_job_id), daemon=True).start()
+                    self._pedir_sugerencias()
         self.ventana.update_idletasks()
 
     def seleccionarCarpeta(self):
@@ -246,8 +267,13 @@ class Clasificador:
         self.barra_carga['value'] = 0
         self.estado_carga_texto.set("Iniciando Motor IA...")
         self.ia = FaceBrain(self.carpetaDestino, log_callback=print, progress_callback=self.actualizar_barra_ia)
+        if self.sugerencias: self.sugerencias.detener()
+        # El hilo de la cola no toca Tk: los resultados pasan por el reporte, que los entrega en el hilo de la ventana
+        self.sugerencias = ColaSugerencias(self.ia, al_listo=lambda ruta, res: self.reporte_ia.en_ui(lambda: self._mostrar_sugerencia(ruta, res)))
         self.ia.cargar_referencias_async()
+        self.renamer.usar_cache(self.carpetaDestino)
         self.carpetasDestino = {f: os.path.join(self.carpetaDestino, f) for f in os.listdir(self.carpetaDestino) if os.path.isdir(os.path.join(self.carpetaDestino, f))}
+        self.poblador.agregar(self.carpetasDestino.values())
         self.actualizarBotones()
         
     def cargarElementos(self):
@@ -259,13 +285,12 @@ class Clasificador:
             return
         if not self.lista: messagebox.showerror('Info', 'Carpeta vacía de multimedia.')
         else:
+            self.poblador.agregar(self.lista, prioridad=True)
             self.indiceActual = 0
             self.mostrarContenido()
 
     def mostrarContenido(self):
         if not self.lista: return
-        self.current_job_id += 1
-        job_id = self.current_job_id
         
         contenido = self.lista[self.indiceActual]
         ext = os.path.splitext(contenido)[1].lower()
@@ -283,10 +308,13 @@ class Clasificador:
         for widget in self.frame_imagen.winfo_children():
             if isinstance(widget, Button): widget.destroy()
 
+        tamano = (w_frame, h_frame)
+        img = self.precarga.obtener(contenido, tamano)
+        self.precarga.pedir(self.precarga.alrededor(self.lista, self.indiceActual), tamano)
+
         if ext in self.imagenValida:
             try:
-                img = Image.open(contenido)
-                img.thumbnail((w_frame, h_frame), Image.Resampling.LANCZOS)
+                if img is None: raise ValueError(contenido)
                 foto = ImageTk.PhotoImage(img)
                 self.etiquetaElemento.config(image=foto, text="")
                 self.etiquetaElemento.image = foto
@@ -297,14 +325,8 @@ class Clasificador:
                 self.etiquetaElemento.config(image="", text="Error al cargar imagen")
                 
         elif ext in self.videoValido:
-            cap = cv2.VideoCapture(contenido)
-            ret, frame = cap.read()
-            cap.release()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img_pil = Image.fromarray(frame)
-                img_pil.thumbnail((w_frame, h_frame))
-                foto = ImageTk.PhotoImage(img_pil)
+            if img is not None:
+                foto = ImageTk.PhotoImage(img)
                 self.etiquetaElemento.config(image=foto, text="")
                 self.etiquetaElemento.image = foto
                 
@@ -320,18 +342,22 @@ class Clasificador:
         self.card_ia.config(bg="#202225")
         
         if self.ia:
-            self.sugerenciaIA.set("Analizando...")
-            threading.Thread(target=self._predecir_actual, args=(contenido, job_id), daemon=True).start()
+            res = self.sugerencias.resultado(contenido)
+            if res: self._mostrar_sugerencia(contenido, res)
+            else: self.sugerenciaIA.set("Analizando...")
+            self._pedir_sugerencias()
         else:
             self.sugerenciaIA.set("IA Inactiva")
 
     def abrirEditor(self, image_path):
         def alTerminar(coords=None):
+            self.precarga.cache.invalidar(image_path)
+            if self.sugerencias: self.sugerencias.invalidar(image_path)
             self.mostrarContenido() 
-            if self.ia: threading.Thread(target=self._predecir_actual, args=(image_path, self.current_job_id), daemon=True).start()
         EditorImagen(self.ventana, image_path, alTerminar, modo_video=False)
 
     def abrir_editor_video(self, video_path):
+        import cv2
         try:
             cap = cv2.VideoCapture(video_path)
             ret, frame = cap.read()
@@ -353,6 +379,7 @@ class Clasificador:
             x1, y1, x2, y2 = coords
             
             def procesar():
+                from moviepy import VideoFileClip
                 popup = Toplevel(self.ventana)
                 popup.title("Procesando Video...")
                 popup.geometry("300x100")
@@ -369,6 +396,8 @@ class Clasificador:
                     cropped_clip.close()
                     time.sleep(0.5) 
                     shutil.move(temp_out, video_path)
+                    self.precarga.cache.invalidar(video_path)
+                    if self.sugerencias: self.sugerencias.invalidar(video_path)
                     
                     self.ventana.after(0, lambda: messagebox.showinfo("Éxito", "Video recortado."))
                     self.ventana.after(0, self.mostrarContenido)
@@ -380,54 +409,27 @@ class Clasificador:
 
         EditorImagen(self.ventana, temp_ref, al_recibir_coords, modo_video=True)
 
-    def _predecir_actual(self, image_path, job_id):
-        if job_id != self.current_job_id: return
-        if not self.ia: return
-        
-        img_para_analisis = image_path
-        es_video = False
-        
-        if image_path.lower().endswith(self.videoValido):
-            try:
-                cap = cv2.VideoCapture(image_path)
-                length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                if length > 10: cap.set(cv2.CAP_PROP_POS_FRAMES, int(length * 0.15))
-                ret, frame = cap.read()
-                cap.release()
-                if ret:
-                    temp_frame_path = f"temp_frame_{uuid.uuid4().hex}.jpg"
-                    cv2.imwrite(temp_frame_path, frame)
-                    img_para_analisis = temp_frame_path
-                    es_video = True
-                else: return
-            except: return
-
-        if job_id != self.current_job_id: 
-            if es_video and os.path.exists(img_para_analisis):
-                try: os.remove(img_para_analisis)
-                except: pass
-            return
-
-        res = self.ia.sugerir_persona(img_para_analisis)
-        
-        if es_video and os.path.exists(img_para_analisis):
-            try: os.remove(img_para_analisis)
-            except: pass
+    def _olvidar_sugerencias(self):
+        # Cambiaron las carpetas de destino: lo sugerido hasta ahora puede nombrar algo que ya no está
+        if self.sugerencias: self.sugerencias.limpiar()
 
-        if job_id != self.current_job_id: return
+    def _pedir_sugerencias(self):
+        # El actual primero y después el resto de la cola a partir del cursor
+        i = self.indiceActual
+        self.sugerencias.pedir(self.lista[i], self.lista[i + 1:] + self.lista[:i])
 
-        def update_ui_ia():
-            if "Desconocido" in res or "No detecto" in res:
-                self.card_ia.config(bg="#202225")
-                self.btn_accion_ia.pack_forget()
-            else:
-                nombre_carpeta = res.split(" (")[0]
-                if nombre_carpeta in self.carpetasDestino:
-                    self.btn_accion_ia.config(text=f"Mover a: {nombre_carpeta}", 
-                                            command=lambda: self.clasificar(nombre_carpeta))
-                    self.btn_accion_ia.pack(fill='x', pady=5)
-            self.sugerenciaIA.set(res)
-        self.ventana.after(0, update_ui_ia)
+    def _mostrar_sugerencia(self, ruta, res):
+        if not self.lista or self.lista[self.indiceActual] != ruta: return
+        if "Desconocido" in res or "No detecto" in res or "no visible" in res or res == SUGERENCIA_ERROR:
+            self.card_ia.config(bg="#202225")
+            self.btn_accion_ia.pack_forget()
+        else:
+            nombre_carpeta = res.split(" (")[0]
+            if nombre_carpeta in self.carpetasDestino:
+                self.btn_accion_ia.config(text=f"Mover a: {nombre_carpeta}", 
+                                        command=lambda: self.clasificar(nombre_carpeta))
+                self.btn_accion_ia.pack(fill='x', pady=5)
+        self.sugerenciaIA.set(res)
 
     def siguienteElemento(self):
         if self.lista:
@@ -444,20 +446,71 @@ class Clasificador:
         contenido = self.lista[self.indiceActual]
         destino = os.path.join(self.carpetasDestino[carpeta], os.path.basename(contenido))
         try:
-            shutil.move(contenido, destino)
+            self.diario.mover(contenido, destino)
+            self.precarga.cache.invalidar(contenido)
             self.lista.pop(self.indiceActual)
             if self.lista:
                 self.indiceActual %= len(self.lista)
                 self.mostrarContenido()
             else:
-                self.etiquetaElemento.config(image="", text="¡Carpeta terminada! 🎉")
-                self.lbl_contador.config(text="0 / 0")
-                self.lbl_nombre_archivo.config(text="...")
-                self.sugerenciaIA.set("-")
-                self.btn_accion_ia.pack_forget()
+                self.carpetaTerminada()
         except Exception as e:
             messagebox.showerror('Error', f'Error al mover: {e}')
 
+    def carpetaTerminada(self):
+        self.etiquetaElemento.config(image="", text="¡Carpeta terminada! 🎉")
+        self.lbl_contador.config(text="0 / 0")
+        self.lbl_nombre_archivo.config(text="...")
+        self.sugerenciaIA.set("-")
+        self.btn_accion_ia.pack_forget()
+
+    def abrirCuadricula(self):
+        if not self.lista:
+            messagebox.showwarning("Atención", "Selecciona primero una carpeta de origen con archivos.")
+            return
+        CuadriculaMiniaturas(self.ventana, self.lista, self.miniaturas, self.carpetasDestino.keys(), self.moverVarios, self.irA)
+
+    def irA(self, ruta):
+        if ruta in self.lista:
+            self.indiceActual = self.lista.index(ruta)
+            self.mostrarContenido()
+
+    def moverVarios(self, rutas, carpeta, al_terminar=None):
+        """Mueve varios archivos a una carpeta destino en un hilo, como una sola sesión del diario.
+
+        Al terminar (en el hilo de Tk) los quita de la lista, conserva el
+        elemento que se estaba viendo y llama a `al_terminar(movidas)`.
+        """
+        def worker():
+            movidas, errores = [], []
+            with self.diario.sesion(f"Mover {len(rutas)} archivos a {carpeta}"):
+                for ruta in rutas:
+                    try:
+                        # Dos archivos con el mismo nombre no se pisan: el diario usa nombre_1, nombre_2...
+                        self.diario.mover(ruta, os.path.join(self.carpetasDestino[carpeta], os.path.basename(ruta)))
+                        movidas.append(ruta)
+                    except Exception as e:
+                        errores.append(f"{os.path.basename(ruta)}: {e}")
+            self.ventana.after(0, lambda: terminar(movidas, errores))
+
+        def terminar(movidas, errores):
+            quitadas = set(movidas)
+            for ruta in movidas: self.precarga.cache.invalidar(ruta)
+            actual = self.lista[self.indiceActual] if self.lista else None
+            self.lista = [r for r in self.lista if r not in quitadas]
+            if not self.lista:
+                self.carpetaTerminada()
+            elif actual not in quitadas:
+                self.indiceActual = self.lista.index(actual)
+                self.lbl_contador.config(text=f"{self.indiceActual + 1} / {len(self.lista)}")
+            else:
+                self.indiceActual = min(self.indiceActual, len(self.lista) - 1)
+                self.mostrarContenido()
+            if al_terminar: al_terminar(movidas)
+            if errores:
+                messagebox.showerror("Error", f"No se pudieron mover {len(errores)} archivos:\n" + "\n".join(errores[:10]))
+        threading.Thread(target=worker, daemon=True).start()
+
     def nuevaCarpetaPopup(self):
         if not self.carpetaDestino:
             messagebox.showwarning("Atención", "Selecciona primero la carpeta de destino.")
@@ -478,6 +531,7 @@ class Clasificador:
                 try:
                     os.makedirs(path, exist_ok=True)
                     self.carpetasDestino[nombre] = path
+                    self._olvidar_sugerencias()
                     self.actualizarBotones()
                     top.destroy()
                 except Exception as e: messagebox.showerror("Error", str(e))
@@ -486,33 +540,98 @@ class Clasificador:
     def abrir_menu_herramientas(self):
         top = Toplevel(self.ventana)
         top.title("Herramientas Avanzadas")
-        w_pop, h_pop = 450, 500
+        w_pop, h_pop = 450, 600
         x = self.ventana.winfo_screenwidth() // 2 - w_pop // 2
         y = self.ventana.winfo_screenheight() // 2 - h_pop // 2
         top.geometry(f"{w_pop}x{h_pop}+{x}+{y}")
         top.configure(bg=COLOR_BG)
         lbl_status = Label(top, text="Esperando...", bg=COLOR_BG, fg="gray"); lbl_status.pack(side="bottom", pady=5)
         pb_renombrar = ttk.Progressbar(top, orient="horizontal", mode="determinate", length=400); pb_renombrar.pack(side="bottom", pady=5, padx=20)
-        def update_ui_safe(current, total, msg):
+        def update_ui_safe(current, total, msg, velocidad, eta):
             pb_renombrar["maximum"] = total; pb_renombrar["value"] = current
-            lbl_status.config(text=f"{msg} ({int(current/total*100)}%)" if total > 0 else msg)
-        def progress_adapter(current, total, msg=""): top.after(0, lambda: update_ui_safe(current, total, msg))
+            lbl_status.config(text=texto_progreso(current, total, msg, velocidad, eta))
+        # Los avisos de los hilos se juntan y se pintan a 10 Hz desde el hilo de Tk
+        reporte = ReporteProgreso(top, on_progress=update_ui_safe).iniciar()
+        def progress_adapter(current, total, msg=""): reporte.progreso(current, total, msg)
         self.renamer.progress_callback = progress_adapter
         def run_threaded(rutas):
             if not isinstance(rutas, list): rutas = [rutas]
             if messagebox.askyesno("Confirmar", "El proceso iniciará ahora."):
                 pb_renombrar["value"] = 0
                 def worker():
-                    for path in rutas: self.renamer.procesar_carpeta(path)
+                    # Varias carpetas a la vez, con un solo progreso conjunto
+                    self.renamer.procesar_carpetas(rutas)
                     top.after(0, lambda: messagebox.showinfo("Listo", "Proceso finalizado"))
-                    top.after(0, lambda: [self.cargarElementos(), self.actualizarBotones(), top.destroy()])
+                    top.after(0, lambda: [self._olvidar_sugerencias(), self.cargarElementos(), self.actualizarBotones(), top.destroy()])
                 threading.Thread(target=worker, daemon=True).start()
 
         Label(top, text="Limpieza y Renombrado", bg=COLOR_BG, fg="white", font=FONT_BOLD).pack(pady=10)
+        def deshacer_ultima():
+            sesiones = [x for x in self.diario.sesiones() if x["operaciones"] > 0 and not x["deshecha"]]
+            if not sesiones:
+                messagebox.showinfo("Deshacer", "No hay operaciones para deshacer"); return
+            ultima = sesiones[-1]
+            if not messagebox.askyesno("Deshacer", f"¿Deshacer la última sesión?\n\n{ultima['descripcion']}\n{ultima['operaciones']} operaciones"): return
+            def worker():
+                res = self.diario.deshacer(ultima["sesion"])
+                top.after(0, lambda: messagebox.showinfo("Deshacer", f"Restaurados: {res['restaurados']}, omitidos: {res['omitidos']}"))
+                top.after(0, lambda: [self._olvidar_sugerencias(), self.cargarElementos(), self.actualizarBotones()])
+            threading.Thread(target=worker, daemon=True).start()
+        Button(top, text="Deshacer Última Sesión", command=deshacer_ultima, bg=COLOR_SIDEBAR, fg="white", bd=0, pady=8, width=40).pack(pady=5)
+        def vaciar_cuarentena():
+            if not messagebox.askyesno("Cuarentena", f"¿Borrar definitivamente los archivos eliminados hace más de {DIAS_CUARENTENA} días?\n\nEsas eliminaciones ya no se podrán deshacer."): return
+            def worker():
+                res = self.diario.purgar(DIAS_CUARENTENA)
+                top.after(0, lambda: messagebox.showinfo("Cuarentena", f"Borrados: {res['archivos']} archivos, {formato_bytes(res['bytes'])} liberados"))
+            threading.Thread(target=worker, daemon=True).start()
+        Button(top, text=f"Vaciar Cuarentena (más de {DIAS_CUARENTENA} días)", command=vaciar_cuarentena, bg=COLOR_SIDEBAR, fg="white", bd=0, pady=8, width=40).pack(pady=5)
         if self.carpetaOrigen: Button(top, text="Limpiar Carpeta Origen (Actual)", command=lambda: run_threaded(self.carpetaOrigen), bg=COLOR_SIDEBAR, fg="white", bd=0, pady=8, width=40).pack(pady=5)
         if self.carpetaDestino:
             rutas_destino = [os.path.join(self.carpetaDestino, d) for d in os.listdir(self.carpetaDestino) if os.path.isdir(os.path.join(self.carpetaDestino, d))]
             Button(top, text="Limpiar TODAS las Subcarpetas Destino", command=lambda: run_threaded(rutas_destino), bg=COLOR_WARNING, fg="white", bd=0, pady=8, width=40).pack(pady=5)
+            def deduplicar_biblioteca():
+                # Prioridad: subcarpetas destino (ya clasificadas) antes que el origen
+                carpetas = rutas_destino + ([self.carpetaOrigen] if self.carpetaOrigen else [])
+                def worker():
+                    grupos, stats = self.renamer.duplicados_biblioteca(
+                        carpetas, progress_callback=lambda hechos, total, _: progress_adapter(hechos, total, "Indexando biblioteca"))
+                    self.renamer.log_estadisticas(stats)
+                    top.after(0, lambda: confirmar(grupos))
+                def confirmar(grupos):
+                    pb_renombrar["value"] = 0
+                    if not grupos:
+                        messagebox.showinfo("Biblioteca", "No hay duplicados entre carpetas"); return
+                    ejemplos = "\n".join(f"{os.path.relpath(g[1], self.carpetaDestino)} = {os.path.relpath(g[0], self.carpetaDestino)}" for g in grupos[:8])
+                    total = sum(len(g) - 1 for g in grupos)
+                    if messagebox.askyesno("Duplicados en la biblioteca", f"{len(grupos)} grupos, {total} copias a eliminar (se conserva la de destino):\n\n{ejemplos}\n\n¿Eliminar las copias?"):
+                        def borrar():
+                            eliminados, _ = self.renamer.eliminar_duplicados(grupos)
+                            top.after(0, lambda: messagebox.showinfo("Listo", f"Eliminados: {eliminados}"))
+                            top.after(0, lambda: [self.cargarElementos(), self.actualizarBotones()])
+                        threading.Thread(target=borrar, daemon=True).start()
+                threading.Thread(target=worker, daemon=True).start()
+            Button(top, text="Duplicados en TODA la Biblioteca", command=deduplicar_biblioteca, bg=COLOR_SIDEBAR, fg="white", bd=0, pady=8, width=40).pack(pady=5)
+            def fotos_similares():
+                from LogicaSimilitud import DetectorSimilares
+                carpetas = rutas_destino + ([self.carpetaOrigen] if self.carpetaOrigen else [])
+                def worker():
+                    rutas = [r for carpeta in carpetas for r in self.renamer.listar_archivos(carpeta)]
+                    detector = DetectorSimilares(log_callback=print, progress_callback=progress_adapter, cache=self.renamer.cache)
+                    grupos = detector.buscar_similares(rutas) + detector.buscar_videos_similares(rutas)
+                    top.after(0, lambda: confirmar(grupos))
+                def confirmar(grupos):
+                    if not grupos:
+                        messagebox.showinfo("Biblioteca", "No hay fotos ni videos similares"); return
+                    ejemplos = "\n".join(f"{os.path.basename(g[1])} ≈ {os.path.basename(g[0])}" for g in grupos[:8])
+                    total = sum(len(g) - 1 for g in grupos)
+                    if messagebox.askyesno("Fotos y videos similares", f"{len(grupos)} grupos, {total} copias de menor resolución:\n\n{ejemplos}\n\n¿Eliminar las copias?"):
+                        def borrar():
+                            eliminados, _ = self.renamer.eliminar_duplicados(grupos)
+                            top.after(0, lambda: messagebox.showinfo("Listo", f"Eliminados: {eliminados}"))
+                            top.after(0, lambda: [self.cargarElementos(), self.actualizarBotones()])
+                        threading.Thread(target=borrar, daemon=True).start()
+                threading.Thread(target=worker, daemon=True).start()
+            Button(top, text="Fotos y Videos Similares", command=fotos_similares, bg=COLOR_SIDEBAR, fg="white", bd=0, pady=8, width=40).pack(pady=5)
             Label(top, text="--- O selecciona una específica ---", bg=COLOR_BG, fg=COLOR_TEXT_SEC).pack(pady=(15, 5))
             frame_list = Frame(top, bg=COLOR_BG); frame_list.pack(fill='both', expand=True, padx=20, pady=5)
             scrollbar = Scrollbar(frame_list, orient="vertical"); listbox = Listbox(frame_list, yscrollcommand=scrollbar.set, bg=COLOR_SIDEBAR, fg="white", selectbackground=COLOR_ACCENT, bd=0, highlightthickness=0)
@@ -525,6 +644,9 @@ class Clasificador:
             Button(top, text="Procesar Selección", command=procesar_seleccion, bg=COLOR_ACCENT, fg="white", bd=0, pady=8, width=40).pack(pady=10)
 
     def reproducirVideo(self, rutaVideo):
+        import cv2
+        import pygame
+        from moviepy import VideoFileClip
         if self.popup_video_actual and self.popup_video_actual.winfo_exists():
             self.popup_video_actual.destroy()
             self.video_activo = False
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import ClasificadorDaemon
+from LogicaRenombramiento import POLITICAS_CONSERVAR
+
+# Interfaz de línea de comandos sin Tk: cada línea de stdout es un objeto JSON
+# con un campo "evento" y la marca de tiempo "t":
+#   log         mensaje de registro ("mensaje")
+#   progreso    "actual", "total" y "mensaje"
+#   sugerencia  resultado de `sugerir` para un archivo
+#   duplicados  grupo de copias idénticas ("conservar", "eliminar", "bytes")
+#   similares   grupo de fotos o videos casi idénticos ("conservar", "eliminar")
+#   sesion      una sesión del diario (`deshacer --listar`)
+#   resumen     última línea de cada comando; "ok" es false si algo falló y entonces el código
+#               de salida es 2 (argumentos, carpetas o archivos inválidos) o 1 (fallo o cancelación)
+
+# Varias carpetas se procesan en paralelo: una línea JSON no debe mezclarse con otra
+_salida_lock = threading.Lock()
+
+def emitir(evento, **datos):
+    datos["evento"] = evento
+    datos["t"] = round(time.time(), 3)
+    linea = json.dumps(datos, ensure_ascii=False) + "\n"
+    with _salida_lock:
+        sys.stdout.write(linea)
+        sys.stdout.flush()
+
+
+def log_json(mensaje):
+    mensaje = mensaje.strip()
+    if mensaje:
+        emitir("log", mensaje=mensaje)
+
+
+def progreso_json(actual, total, mensaje=""):
+    emitir("progreso", actual=actual, total=total, mensaje=mensaje)
+
+
+def subcarpetas(carpeta):
+    """Subcarpetas visibles de `carpeta`, ordenadas por nombre."""
+    return [os.path.join(carpeta, d) for d in sorted(os.listdir(carpeta))
+            if not d.startswith('.') and os.path.isdir(os.path.join(carpeta, d))]
+
+
+def carpetas_inexistentes(carpetas):
+    """Emite un resumen con ok=false si alguna carpeta no existe. Devuelve True en ese caso."""
+    faltan = [c for c in carpetas if not os.path.isdir(c)]
+    if faltan:
+        emitir("resumen", ok=False, error="No existe la carpeta", carpetas=faltan)
+    return bool(faltan)
+
+
+def comando_clasificar(args):
+    from ClasificadorFacial import FacialImageClassifier
+
+    unificado = args.modo == "unificado"
+    if not unificado and not args.referencias:
+        emitir("resumen", ok=False, error="--referencias es obligatorio en modo separado")
+        return 2
+
+    classifier = FacialImageClassifier(
+        args.referencias, args.entrada, args.salida,
+        use_output_as_reference=unificado,
+        max_reference_images=args.max_referencias,
+        num_workers=args.procesos
+    )
+    classifier.model_name = args.modelo
+    classifier.threshold = args.umbral
+    classifier.sample_rate = args.sample_rate
+    classifier.video_frames = args.fotogramas
+    classifier.set_log_callback(log_json)
+    classifier.progress_callback = progreso_json
+    classifier.is_running = True
+
+    def cancelar(*_):
+        classifier.is_running = False
+    signal.signal(signal.SIGINT, cancelar)
+    signal.signal(signal.SIGTERM, cancelar)
+
+    inicio = time.monotonic()
+    resumen = classifier.run()
+    if resumen is None:
+        emitir("resumen", ok=False, error="Carpetas inválidas")
+        return 1
+    ok = not resumen["cancelled"]
+    emitir("resumen", ok=ok, segundos=round(time.monotonic() - inicio, 2), **resumen)
+    return 0 if ok else 1
+
+
+def comando_sugerir(args):
+    from LogicaFacial import FaceBrain
+
+    if carpetas_inexistentes([args.salida]):
+        return 2
+    faltan = [ruta for ruta in args.archivos if not os.path.isfile(ruta)]
+    if faltan:
+        emitir("resumen", ok=False, error="No existe el archivo", archivos=faltan)
+        return 2
+    brain = FaceBrain(args.salida, log_callback=log_json, progress_callback=progreso_json)
+    brain.threshold = args.umbral
+    brain._load_references()
+
+    sugerencias = []
+    for ruta in args.archivos:
+        candidatos = brain.candidatos(ruta, top_k=args.top)
+        if candidatos is None:
+            resultado = {"archivo": ruta, "persona": None, "candidatos": [], "error": "Rostro no visible"}
+        else:
+            mejor = candidatos[0] if candidatos and candidatos[0][1] < brain.threshold else None
+            resultado = {
+                "archivo": ruta,
+                "persona": mejor[0] if mejor else None,
+                "candidatos": [{"persona": nombre, "distancia": round(distancia, 4)} for nombre, distancia in candidatos]
+            }
+        emitir("sugerencia", **resultado)
+        sugerencias.append(resultado)
+
+    emitir("resumen", ok=True, archivos=len(sugerencias),
+           identificados=sum(1 for s in sugerencias if s["persona"]))
+    return 0
+
+
+def comando_renombrar(args):
+    from LogicaRenombramiento import RenamerTool
+
+    if carpetas_inexistentes(args.carpetas):
+        return 2
+    renamer = RenamerTool(log_callback=log_json, progress_callback=progreso_json)
+    totales = {"carpetas": 0, "eliminados": 0, "renombrados": 0, "errores": 0}
+    for raiz in args.carpetas:
+        # La caché vive en la raíz indicada: la comparten todas sus subcarpetas
+        renamer.usar_cache(None if args.sin_cache else raiz)
+        if args.recursivo:
+            carpetas = renamer.listar_arbol(raiz)
+        elif args.subcarpetas:
+            carpetas = subcarpetas(raiz)
+        else:
+            carpetas = [raiz]
+        resultado = renamer.procesar_carpetas(carpetas, max_carpetas=args.carpetas_paralelo)
+        for clave in totales:
+            totales[clave] += resultado[clave]
+
+    renamer.usar_cache(None)
+    emitir("resumen", ok=totales["errores"] == 0, **totales)
+    return 0 if totales["errores"] == 0 else 1
+
+
+def comando_deduplicar(args):
+    from LogicaRenombramiento import RenamerTool, formato_bytes
+
+    if carpetas_inexistentes(args.carpetas):
+        return 2
+    renamer = RenamerTool(log_callback=log_json, progress_callback=progreso_json)
+    if not args.sin_cache:
+        renamer.usar_cache(args.carpetas[0])
+    # El orden de los argumentos es la prioridad; con --subcarpetas cada raíz va antes que sus subcarpetas
+    carpetas = []
+    for carpeta in args.carpetas:
+        carpetas.append(carpeta)
+        if args.subcarpetas:
+            carpetas.extend(subcarpetas(carpeta))
+
+    grupos, stats = renamer.duplicados_biblioteca(carpetas, politica=args.politica, progress_callback=progreso_json)
+    renamer.log_estadisticas(stats)
+    redundantes = 0
+    for grupo in grupos:
+        size = os.path.getsize(grupo[0]) if os.path.exists(grupo[0]) else 0
+        redundantes += size * (len(grupo) - 1)
+        emitir("duplicados", conservar=grupo[0], eliminar=grupo[1:], bytes=size)
+
+    # Los eliminados van a cuarentena: el espacio se libera con `deshacer --purgar`
+    eliminados, apartados = renamer.eliminar_duplicados(grupos) if args.aplicar else (0, 0)
+    renamer.usar_cache(None)
+    emitir("resumen", ok=True, grupos=len(grupos), aplicado=args.aplicar, eliminados=eliminados,
+           bytes_redundantes=redundantes, en_cuarentena=formato_bytes(apartados))
+    return 0
+
+
+def comando_similares(args):
+    from LogicaRenombramiento import RenamerTool
+    from LogicaSimilitud import DetectorSimilares
+
+    if carpetas_inexistentes(args.carpetas):
+        return 2
+    renamer = RenamerTool(log_callback=log_json, progress_callback=progreso_json)
+    if not args.sin_cache:
+        renamer.usar_cache(args.carpetas[0])
+    carpetas = []
+    for carpeta in args.carpetas:
+        carpetas.append(carpeta)
+        if args.subcarpetas:
+            carpetas.extend(subcarpetas(carpeta))
+    rutas = [ruta for carpeta in carpetas for ruta in renamer.listar_archivos(carpeta)]
+
+    detector = DetectorSimilares(log_callback=log_json, progress_callback=progreso_json,
+                                 tipo=args.huella, radio=args.radio, cache=renamer.cache)
+    grupos = detector.buscar_similares(rutas)
+    if not args.sin_videos:
+        grupos += detector.buscar_videos_similares(rutas)
+    for grupo in grupos:
+        emitir("similares", conservar=grupo[0], eliminar=grupo[1:])
+
+    eliminados, apartados = renamer.eliminar_duplicados(grupos) if args.aplicar else (0, 0)
+    renamer.usar_cache(None)
+    emitir("resumen", ok=True, grupos=len(grupos), uniformes=len(detector.uniformes), aplicado=args.aplicar,
+           eliminados=eliminados, bytes_en_cuarentena=apartados)
+    return 0
+
+
+def comando_deshacer(args):
+    from LogicaDiario import DiarioOperaciones
+
+    diario = DiarioOperaciones(args.diario, log_callback=log_json)
+    if args.listar:
+        for sesion in diario.sesiones():
+            emitir("sesion", **sesion)
+        emitir("resumen", ok=True, **{f"{k}_en_cuarentena": v for k, v in diario.en_cuarentena().items()})
+        return 0
+    if args.purgar:
+        emitir("resumen", ok=True, **diario.purgar(args.dias, args.sesion))
+        return 0
+    resultado = diario.deshacer(args.sesion)
+    if resultado is None:
+        emitir("resumen", ok=False, error="No hay sesiones para deshacer")
+        return 1
+    ok = resultado["omitidos"] == 0
+    emitir("resumen", ok=ok, **resultado)
+    return 0 if ok else 1
+
+
+def comando_vigilar(args):
+    daemon = ClasificadorDaemon.build_daemon(args, log_callback=log_json)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run()
+    emitir("resumen", ok=True)
+    return 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Clasificador facial y renombrado sin interfaz gráfica (salida JSON por línea)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("clasificar", help="Clasifica una carpeta por rostro (equivalente a ClasificadorFacial.py)")
+    p.add_argument("--modo", choices=["unificado", "separado"], default="separado",
+                   help="unificado: la salida sirve de referencia; separado: carpeta de referencias aparte")
+    p.add_argument("--referencias", help="Carpeta de rostros conocidos (modo separado)")
+    p.add_argument("--entrada", required=True, help="Carpeta con los archivos a clasificar")
+    p.add_argument("--salida", required=True, help="Carpeta destino")
+    p.add_argument("--max-referencias", type=int, default=5, help="Imágenes de referencia por persona")
+    p.add_argument("--modelo", default="VGG-Face", help="Modelo de DeepFace (VGG-Face, Facenet, OpenFace, ...)")
+    p.add_argument("--umbral", type=float, default=0.6, help="Distancia coseno máxima para aceptar una coincidencia")
+    p.add_argument("--sample-rate", type=int, default=30, help="Como máximo 1 de cada N fotogramas en videos")
+    p.add_argument("--fotogramas", type=int, default=10, help="Fotogramas máximos por video")
+    p.add_argument("--procesos", type=int, default=1, help="Procesos en paralelo")
+    p.set_defaults(func=comando_clasificar)
+
+    p = sub.add_parser("sugerir", help="Sugiere la persona de uno o más archivos con FaceBrain")
+    p.add_argument("--salida", required=True, help="Carpeta destino con una subcarpeta por persona")
+    p.add_argument("--umbral", type=float, default=0.65)
+    p.add_argument("--top", type=int, default=3, help="Candidatos a devolver por archivo")
+    p.add_argument("archivos", nargs="+")
+    p.set_defaults(func=comando_sugerir)
+
+    p = sub.add_parser("renombrar", help="Elimina duplicados y renombra (equivalente a Renombramiento.py)")
+    p.add_argument("--subcarpetas", action="store_true", help="Procesar cada subcarpeta de las carpetas indicadas")
+    p.add_argument("--recursivo", action="store_true", help="Procesar la carpeta y todo su árbol de subcarpetas")
+    p.add_argument("--carpetas-paralelo", type=int, default=3, help="Carpetas que se procesan a la vez")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de hashes (.hashes.sqlite3)")
+    p.add_argument("carpetas", nargs="+")
+    p.set_defaults(func=comando_renombrar)
+
+    p = sub.add_parser("deduplicar", help="Busca duplicados entre carpetas (origen y destino) con un único índice")
+    p.add_argument("--subcarpetas", action="store_true", help="Incluir las subcarpetas de cada carpeta indicada")
+    p.add_argument("--politica", choices=POLITICAS_CONSERVAR, default="prioridad",
+                   help="Copia a conservar: prioridad (orden de las carpetas), antiguo, reciente o ruta_corta")
+    p.add_argument("--aplicar", action="store_true", help="Borrar los duplicados (por defecto solo se informa)")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de hashes de la primera carpeta")
+    p.add_argument("carpetas", nargs="+", help="Carpetas de más a menos prioridad")
+    p.set_defaults(func=comando_deduplicar)
+
+    p = sub.add_parser("similares", help="Busca fotos y videos casi idénticos (re-guardados, redimensionados, re-codificados)")
+    p.add_argument("--subcarpetas", action="store_true", help="Incluir las subcarpetas de cada carpeta indicada")
+    p.add_argument("--huella", choices=["ahash", "dhash", "phash"], default="phash", help="Tipo de huella perceptual")
+    p.add_argument("--radio", type=int, default=8, help="Bits distintos (de 64) para considerar dos fotos iguales")
+    p.add_argument("--aplicar", action="store_true", help="Borrar las copias de menor resolución (por defecto solo se informa)")
+    p.add_argument("--sin-videos", action="store_true", help="Comparar solo imágenes")
+    p.add_argument("--sin-cache", action="store_true", help="No guardar las huellas en la caché de la primera carpeta")
+    p.add_argument("carpetas", nargs="+")
+    p.set_defaults(func=comando_similares)
+
+    p = sub.add_parser("deshacer", help="Deshace la última sesión de movimientos, borrados y renombrados")
+    p.add_argument("--sesion", help="Identificador de la sesión (por defecto, la última)")
+    p.add_argument("--listar", action="store_true", help="Solo listar las sesiones del diario")
+    p.add_argument("--purgar", action="store_true",
+                   help="Borrar definitivamente la cuarentena de las sesiones con más de --dias días (o de --sesion)")
+    p.add_argument("--dias", type=float, default=30, help="Antigüedad mínima para --purgar (por defecto 30)")
+    p.add_argument("--diario", help="Ruta del diario de operaciones (por defecto, en la carpeta de estado del usuario)")
+    p.set_defaults(func=comando_deshacer)
+
+    p = sub.add_parser("vigilar", help="Clasifica continuamente los archivos nuevos (daemon)")
+    ClasificadorDaemon.add_arguments(p)
+    p.set_defaults(func=comando_vigilar)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
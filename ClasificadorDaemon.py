@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import select
+import signal
+import struct
+import argparse
+import ctypes
+import ctypes.util
+from datetime import datetime
+
+# Constantes de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Avisa de archivos creados/terminados de escribir en una carpeta (solo Linux)"""
+    def __init__(self, folder):
+        self.folder = folder
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch falló")
+
+    def wait(self, timeout):
+        """Espera hasta `timeout` segundos y devuelve los nombres que cambiaron"""
+        names = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return names
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # El kernel descartó eventos: no se sabe cuáles, se revisa la carpeta entera
+                try:
+                    names.update(os.listdir(self.folder))
+                except OSError:
+                    pass
+            elif name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Alternativa portátil: compara tamaño y mtime de la carpeta en cada intervalo"""
+    def __init__(self, folder):
+        self.folder = folder
+        self.snapshot = {}
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        current = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        st = entry.stat()
+                        current[entry.name] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return set()
+        changed = {name for name, sig in current.items() if self.snapshot.get(name) != sig}
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class WatchFolderDaemon:
+    """Clasifica continuamente los archivos nuevos de la carpeta de entrada.
+
+    El modelo y las referencias se cargan una vez. Un archivo se procesa cuando
+    su tamaño y mtime llevan `debounce` segundos sin cambiar (copias a medias).
+    El archivo de estado guarda los archivos ya tratados (nombre + tamaño + mtime)
+    para que un reinicio no vuelva a analizar los que no se pudieron clasificar.
+    """
+    def __init__(self, classifier, state_path=None, debounce=2.0, poll_interval=2.0, use_inotify=True,
+                 rescan_interval=300.0):
+        self.classifier = classifier
+        self.inbox = classifier.unknown_files_dir
+        self.state_path = state_path or os.path.join(classifier.output_dir, ".clasificador_estado.json")
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.rescan_interval = rescan_interval
+        self.handled = {}
+        self.pending = {}
+
+    def log(self, message):
+        self.classifier.log(message)
+
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.handled = {name: tuple(sig) for name, sig in json.load(f).get("handled", {}).items()}
+        except Exception:
+            self.handled = {}
+
+    def save_state(self):
+        # Olvidar archivos que ya no están en la entrada
+        try:
+            present = set(os.listdir(self.inbox))
+        except OSError:
+            present = set()
+        self.handled = {name: sig for name, sig in self.handled.items() if name in present}
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"handled": self.handled}, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            self.log(f"⚠️  No se pudo guardar el estado: {e}")
+
+    def _make_watcher(self):
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                watcher = InotifyWatcher(self.inbox)
+                self.log("👀 Vigilando con inotify")
+                return watcher
+            except Exception as e:
+                self.log(f"⚠️  inotify no disponible ({e}), usando sondeo")
+        self.log(f"👀 Vigilando por sondeo cada {self.poll_interval}s")
+        return PollingWatcher(self.inbox)
+
+    def _signature(self, file_name):
+        try:
+            st = os.stat(os.path.join(self.inbox, file_name))
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _enqueue(self, names):
+        for name in names:
+            if name.startswith('.'):
+                continue
+            self.pending.setdefault(name, (None, 0.0))
+
+    def _ready_files(self):
+        """Archivos pendientes cuyo tamaño y mtime no han cambiado durante `debounce` segundos"""
+        now = time.monotonic()
+        ready = []
+        for name, (last_sig, since) in list(self.pending.items()):
+            sig = self._signature(name)
+            if sig is None:
+                del self.pending[name]
+            elif self.handled.get(name) == sig:
+                del self.pending[name]
+            elif sig != last_sig:
+                self.pending[name] = (sig, now)
+            elif now - since >= self.debounce:
+                del self.pending[name]
+                ready.append((name, sig))
+        return ready
+
+    def _kind(self, file_name):
+        file_lower = file_name.lower()
+        if any(file_lower.endswith(fmt) for fmt in self.classifier.image_formats):
+            return True
+        if any(file_lower.endswith(fmt) for fmt in self.classifier.video_formats):
+            return False
+        return None
+
+    def process_ready(self):
+        processed = 0
+        for file_name, sig in self._ready_files():
+            if not self.classifier.is_running:
+                break
+            is_image = self._kind(file_name)
+            if is_image is not None:
+                self.classifier.classify_file(file_name, os.path.join(self.inbox, file_name), is_image)
+                processed += 1
+            self.handled[file_name] = sig
+        if processed:
+            self.save_state()
+        return processed
+
+    def run(self):
+        classifier = self.classifier
+        classifier.is_running = True
+        if not classifier.prepare():
+            return
+        if not classifier.known_faces_data:
+            self.log("❌ No hay rostros conocidos cargados.")
+            return
+
+        self.load_state()
+        self._enqueue(os.listdir(self.inbox))
+        watcher = self._make_watcher()
+        last_rescan = time.monotonic()
+        self.log(f"🚀 Daemon activo: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            with classifier.diario.sesion(f"Vigilancia de {self.inbox}"):
+                while classifier.is_running:
+                    # Con archivos pendientes se revisa a menudo para respetar el debounce
+                    timeout = min(self.poll_interval, self.debounce / 2) if self.pending else self.poll_interval
+                    self._enqueue(watcher.wait(timeout))
+                    # Red de seguridad por si se pierde algún evento (p. ej. carpetas de red)
+                    if self.rescan_interval and time.monotonic() - last_rescan >= self.rescan_interval:
+                        self._enqueue(os.listdir(self.inbox))
+                        last_rescan = time.monotonic()
+                    self.process_ready()
+        finally:
+            watcher.close()
+            self.save_state()
+            self.log("⏹️  Daemon detenido")
+
+    def stop(self, *args):
+        self.classifier.is_running = False
+
+
+def add_arguments(parser):
+    parser.add_argument("--entrada", required=True, help="Carpeta vigilada con los archivos a clasificar")
+    parser.add_argument("--salida", required=True, help="Carpeta destino con una subcarpeta por persona")
+    parser.add_argument("--referencias", help="Carpeta de rostros conocidos (si se omite, se usa la de salida)")
+    parser.add_argument("--max-referencias", type=int, default=5)
+    parser.add_argument("--debounce", type=float, default=2.0, help="Segundos sin cambios antes de procesar un archivo")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Intervalo de sondeo en segundos")
+    parser.add_argument("--estado", help="Ruta del archivo de estado")
+    parser.add_argument("--reescaneo", type=float, default=300.0,
+                        help="Segundos entre revisiones completas de la entrada (0 para desactivar)")
+    parser.add_argument("--sin-inotify", action="store_true", help="Forzar el modo de sondeo")
+
+
+def build_daemon(args, log_callback=print):
+    # Import diferido: el parser de la CLI no necesita cargar DeepFace
+    from ClasificadorFacial import FacialImageClassifier
+    classifier = FacialImageClassifier(
+        args.referencias, args.entrada, args.salida,
+        use_output_as_reference=not args.referencias,
+        max_reference_images=args.max_referencias
+    )
+    classifier.set_log_callback(log_callback)
+    return WatchFolderDaemon(classifier, state_path=args.estado, debounce=args.debounce,
+                             poll_interval=args.intervalo, use_inotify=not args.sin_inotify,
+                             rescan_interval=args.reescaneo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clasificador facial en segundo plano para una carpeta de entrada")
+    add_arguments(parser)
+    daemon = build_daemon(parser.parse_args())
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run()
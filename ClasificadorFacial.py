@@ -1,29 +1,46 @@
 import os
-import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 import threading
-from deepface import DeepFace
-import cv2
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
 import numpy as np
 from datetime import datetime
+from LogicaFacial import EmbeddingStore, IndiceEmbeddings, cargar_deepface, precalentar_async, represent_batch
+from LogicaDiario import diario_por_defecto
+from LogicaProgreso import ReporteProgreso, texto_progreso
 import warnings
 warnings.filterwarnings('ignore')
 
 class FacialImageClassifier:
-    def __init__(self, known_faces_dir, unknown_files_dir, output_dir, use_output_as_reference=False, max_reference_images=5):
+    DEFAULT_MODEL = "VGG-Face"
+
+    def __init__(self, known_faces_dir, unknown_files_dir, output_dir, use_output_as_reference=False, max_reference_images=5, num_workers=1):
         self.known_faces_dir = known_faces_dir
         self.unknown_files_dir = unknown_files_dir
         self.output_dir = output_dir
         self.use_output_as_reference = use_output_as_reference
         self.max_reference_images = max_reference_images
+        self.num_workers = max(1, int(num_workers))
         self.known_faces_data = {}
+        self.reference_index = IndiceEmbeddings({})
         self.image_formats = {'.jpg', '.jpeg', '.png', '.bmp', '.gif'}
         self.video_formats = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'}
         self.log_callback = None
+        self.progress_callback = None
         self.is_running = False
-        self.model_name = "VGG-Face"
+        self.model_name = self.DEFAULT_MODEL
+        self.detector_backend = "opencv"
         self.distance_metric = "cosine"
+        self.threshold = 0.6
+        self.sample_rate = 30
+        self.video_frames = 10
+        self.batch_size = 16
+        self.early_exit = True
+        self.vote_margin = 3
+        # Cada movimiento queda anotado para poder deshacer la clasificación
+        self.diario = diario_por_defecto()
 
     def set_log_callback(self, callback):
         self.log_callback = callback
@@ -55,19 +72,29 @@ class FacialImageClassifier:
             self.log(f"❌ No existe la carpeta: {reference_dir}")
             return
         
+        # Embeddings de referencia calculados en ejecuciones anteriores
+        store = EmbeddingStore(reference_dir, self.model_name, self.detector_backend).load()
+        known_embeddings = {}
+        vigentes = set()
+        
+        pending_by_person = {}
+        face_images_by_person = {}
+        
         for person_name in os.listdir(reference_dir):
             person_dir = os.path.join(reference_dir, person_name)
             
-            if not os.path.isdir(person_dir):
+            if not os.path.isdir(person_dir) or person_name.startswith('.'):
                 continue
             
-            self.log(f"  Procesando: {person_name}")
-            face_images = []
-            image_count = 0
+            face_images = face_images_by_person[person_name] = []
+            known_embeddings[person_name] = []
+            pending = pending_by_person[person_name] = []
+            image_names = os.listdir(person_dir)
+            vigentes.update(os.path.join(person_name, image_name) for image_name in image_names)
             
-            for image_name in os.listdir(person_dir):
+            for image_name in image_names:
                 # Limitar número de imágenes de referencia
-                if image_count >= self.max_reference_images:
+                if len(face_images) >= self.max_reference_images:
                     break
                 
                 # Ignorar archivos ocultos de sistema (macOS, Windows)
@@ -89,102 +116,103 @@ class FacialImageClassifier:
                     self.log(f"        Sugerencia: Renombra la carpeta sin espacios/acentos")
                     continue
                 
-                try:
-                    # Verificar que hay un rostro en la imagen
-                    faces = DeepFace.extract_faces(
-                        img_path=image_path,
-                        detector_backend='opencv',
-                        enforce_detection=False
-                    )
-                    
-                    if faces and len(faces) > 0:
-                        face_images.append(image_path)
-                        image_count += 1
-                    else:
-                        self.log(f"    ⚠️  No se detectó rostro en: {image_name}")
-                except Exception as e:
-                    self.log(f"    ❌ Error al procesar {image_name}: {str(e)[:80]}")
+                encontrado, embedding = store.get(image_path)
+                if not encontrado:
+                    pending.append(image_path)
+                elif embedding is not None:
+                    face_images.append(image_path)
+                    known_embeddings[person_name].append(embedding)
+        
+        # Las imágenes nuevas se calculan por lotes; si alguna falla, la siguiente
+        # ronda toma otra imagen de la misma persona
+        while True:
+            batch = []
+            for person_name, pending in pending_by_person.items():
+                missing = self.max_reference_images - len(face_images_by_person[person_name])
+                take = pending[:max(0, missing)]
+                del pending[:len(take)]
+                batch.extend((person_name, image_path) for image_path in take)
+            if not batch:
+                break
             
+            self.log(f"  Calculando {len(batch)} imagen(es) de referencia...")
+            results = self.represent_batch([image_path for _, image_path in batch])
+            for (person_name, image_path), result in zip(batch, results):
+                store.put(image_path, result["embedding"])
+                if result["embedding"] is not None:
+                    face_images_by_person[person_name].append(image_path)
+                    known_embeddings[person_name].append(result["embedding"])
+                else:
+                    self.log(f"    ⚠️  {person_name}: no se pudo usar {os.path.basename(image_path)} ({str(result['error'])[:80]})")
+        
+        for person_name, face_images in face_images_by_person.items():
             if face_images:
                 self.known_faces_data[person_name] = face_images
-                self.log(f"    ✓ {len(face_images)} imagen(es) de referencia")
+                self.log(f"  ✓ {person_name}: {len(face_images)} imagen(es) de referencia")
+            else:
+                del known_embeddings[person_name]
+        
+        store.prune(vigentes)
+        store.save()
+        self.reference_index = IndiceEmbeddings(known_embeddings)
 
-    def extract_faces_from_video(self, video_path, sample_rate=30):
-        """Extrae fotogramas del video y los guarda temporalmente"""
-        temp_frames = []
-        try:
-            cap = cv2.VideoCapture(video_path)
-            frame_count = 0
-            temp_dir = os.path.join(os.path.dirname(video_path), "temp_frames")
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                if frame_count % sample_rate == 0:
-                    temp_frame_path = os.path.join(temp_dir, f"frame_{frame_count}.jpg")
-                    cv2.imwrite(temp_frame_path, frame)
-                    temp_frames.append(temp_frame_path)
-                
-                frame_count += 1
-            
-            cap.release()
-            return temp_frames
-        except Exception as e:
-            self.log(f"    ❌ Error al procesar video: {e}")
-            return []
+    def represent_batch(self, images):
+        """Embeddings por lotes (rutas o fotogramas) con el modelo y detector del clasificador"""
+        return represent_batch(images, self.model_name, self.detector_backend,
+                               batch_size=self.batch_size, enforce_detection=False)
 
-    def identify_person(self, image_path, is_temp_frame=False):
-        """Identifica a qué persona pertenece el rostro usando DeepFace"""
+    def compute_embedding(self, image):
+        """Calcula el embedding del primer rostro de una ruta o fotograma (array BGR).
+        Pasa por represent_batch, igual que las referencias, para que las distancias sean comparables"""
+        result = self.represent_batch([image])[0]
+        if result["embedding"] is None and result["error"]:
+            raise ValueError(result["error"])
+        return result["embedding"]
+
+    def sample_video_frames(self, video_path, max_frames=None, sample_rate=None):
+        """Genera fotogramas (arrays BGR) repartidos uniformemente por el video, sin tocar el disco.
+        Salta directo a cada posición en lugar de decodificar el video completo."""
+        max_frames = self.video_frames if max_frames is None else max_frames
+        sample_rate = self.sample_rate if sample_rate is None else sample_rate
+        import cv2
+        cap = cv2.VideoCapture(video_path)
         try:
-            best_match = None
-            best_distance = float('inf')
-            threshold = 0.6
-            
-            for person_name, reference_images in self.known_faces_data.items():
-                for ref_image in reference_images:
-                    try:
-                        result = DeepFace.verify(
-                            img1_path=image_path,
-                            img2_path=ref_image,
-                            model_name=self.model_name,
-                            distance_metric=self.distance_metric,
-                            detector_backend='opencv',
-                            enforce_detection=False
-                        )
-                        
-                        distance = result['distance']
-                        
-                        if distance < threshold and distance < best_distance:
-                            best_distance = distance
-                            best_match = person_name
-                            
-                    except Exception:
-                        continue
+            if not cap.isOpened():
+                return
             
-            return best_match
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if total <= 0:
+                # Sin número de fotogramas fiable: lectura secuencial con salto de sample_rate
+                frame_count = 0
+                yielded = 0
+                while yielded < max_frames:
+                    ret = cap.grab()
+                    if not ret:
+                        break
+                    if frame_count % sample_rate == 0:
+                        ret, frame = cap.retrieve()
+                        if ret:
+                            yielded += 1
+                            yield frame
+                    frame_count += 1
+                return
             
+            # Nunca más de 1 de cada sample_rate fotogramas, ni más de max_frames
+            num_frames = max(1, min(max_frames, total // max(1, sample_rate)))
+            step = total / num_frames
+            for i in range(num_frames):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(step * i + step / 2))
+                ret, frame = cap.read()
+                if ret:
+                    yield frame
         except Exception as e:
-            if not is_temp_frame:
-                self.log(f"    ⚠️ Error en identificación: {e}")
-            return None
+            self.log(f"    ❌ Error al procesar video: {e}")
+        finally:
+            cap.release()
 
-    def classify_files(self):
-        if not self.known_faces_data:
-            self.log("❌ No hay rostros conocidos cargados.")
-            return
-        
-        self.log("\n🔍 Clasificando archivos...")
-        classified_count = 0
-        unclassified_count = 0
-        
+    def list_pending_files(self):
+        """Devuelve (nombre, ruta, es_imagen) de cada imagen/video por clasificar"""
         for file_name in os.listdir(self.unknown_files_dir):
-            if not self.is_running:
-                self.log("⏸️  Proceso cancelado por el usuario")
-                break
-            
             file_path = os.path.join(self.unknown_files_dir, file_name)
             
             if not os.path.isfile(file_path):
@@ -194,79 +222,250 @@ class FacialImageClassifier:
             is_image = any(file_lower.endswith(fmt) for fmt in self.image_formats)
             is_video = any(file_lower.endswith(fmt) for fmt in self.video_formats)
             
-            if not (is_image or is_video):
-                continue
+            if is_image or is_video:
+                yield file_name, file_path, is_image
+
+    def _frame_embeddings(self, frames):
+        """Embedding de cada fotograma bajo demanda (None si el fotograma falla)"""
+        for frame in frames:
+            try:
+                yield self.compute_embedding(frame)
+            except Exception:
+                yield None
+
+    def match_embedding(self, embedding):
+        """Persona más cercana bajo el umbral como (nombre, distancia), o None"""
+        candidates = self.reference_index.buscar(embedding, top_k=1)
+        if candidates and candidates[0][1] < self.threshold:
+            return candidates[0]
+        return None
+
+    def vote_embeddings(self, embeddings, max_frames):
+        """Votación secuencial sobre embeddings consumidos uno a uno.
+        Con early_exit se deja de pedir fotogramas cuando el líder ya no puede ser
+        alcanzado con los que quedan o cuando aventaja al segundo por vote_margin votos."""
+        person_votes = {}
+        person_distances = {}
+        frames_used = 0
+        
+        for embedding in embeddings:
+            frames_used += 1
+            match = self.match_embedding(embedding) if embedding is not None else None
+            if match:
+                name, distance = match
+                person_votes[name] = person_votes.get(name, 0) + 1
+                person_distances.setdefault(name, []).append(distance)
             
+            if self.early_exit and person_votes:
+                ranking = sorted(person_votes.values(), reverse=True)
+                lead = ranking[0] - (ranking[1] if len(ranking) > 1 else 0)
+                if lead > max_frames - frames_used or lead >= self.vote_margin:
+                    break
+        
+        # Empate en votos: gana la menor distancia media
+        mean_distances = {name: float(np.mean(d)) for name, d in person_distances.items()}
+        best_match = min(person_votes, key=lambda n: (-person_votes[n], mean_distances[n])) if person_votes else None
+        return {
+            "person": best_match,
+            "votes": person_votes,
+            "distances": mean_distances,
+            "frames_used": frames_used,
+            "frames_max": max_frames
+        }
+
+    def analyze_file(self, file_path, is_image):
+        """Decide a qué persona pertenece un archivo.
+        Devuelve el resultado de la votación, o None si el video no tiene fotogramas legibles."""
+        if is_image:
+            return self.vote_embeddings([self.compute_embedding(file_path)], 1)
+        
+        frames = self.sample_video_frames(file_path)
+        try:
+            result = self.vote_embeddings(self._frame_embeddings(frames), self.video_frames)
+        finally:
+            frames.close()
+        
+        if not result["frames_used"]:
+            return None
+        return result
+
+    def move_to_person(self, file_path, file_name, person_name):
+        output_person_dir = os.path.join(self.output_dir, person_name)
+        os.makedirs(output_person_dir, exist_ok=True)
+        
+        output_path = os.path.join(output_person_dir, file_name)
+        
+        # Verificar si el archivo ya existe en destino (evitar sobrescribir)
+        if os.path.exists(output_path):
+            base, ext = os.path.splitext(file_name)
+            counter = 1
+            while os.path.exists(output_path):
+                output_path = os.path.join(output_person_dir, f"{base}_{counter}{ext}")
+                counter += 1
+        
+        self.diario.mover(file_path, output_path)
+        return output_path
+
+    def _iter_analysis_sequential(self, pending):
+        for file_name, file_path, is_image in pending:
+            if is_image:
+                self.log(f"  📷 Procesando imagen: {file_name}")
+            else:
+                self.log(f"  🎬 Procesando video: {file_name}")
             try:
-                if is_image:
-                    self.log(f"  📷 Procesando imagen: {file_name}")
-                    best_match = self.identify_person(file_path)
-                    
+                yield file_name, file_path, is_image, self.analyze_file(file_path, is_image), None
+            except Exception as e:
+                yield file_name, file_path, is_image, None, e
+
+    def _iter_analysis_batched(self, pending):
+        """Como la secuencial, pero las imágenes consecutivas se analizan en lotes de batch_size"""
+        images = []
+        
+        def flush():
+            results = self.represent_batch([file_path for _, file_path in images])
+            for (file_name, file_path), result in zip(images, results):
+                self.log(f"  📷 Procesando imagen: {file_name}")
+                if result["embedding"] is None and result["error"]:
+                    yield file_name, file_path, True, None, result["error"]
                 else:
-                    self.log(f"  🎬 Procesando video: {file_name}")
-                    temp_frames = self.extract_faces_from_video(file_path)
-                    
-                    if not temp_frames:
-                        self.log(f"     ⚠️  No se pudieron extraer fotogramas")
-                        unclassified_count += 1
-                        continue
-                    
-                    # Analizar múltiples frames y usar votación
-                    person_votes = {}
-                    for frame_path in temp_frames[:10]:
-                        match = self.identify_person(frame_path, is_temp_frame=True)
-                        if match:
-                            person_votes[match] = person_votes.get(match, 0) + 1
-                    
-                    # Limpiar frames temporales
-                    for frame_path in temp_frames:
-                        try:
-                            os.remove(frame_path)
-                        except:
-                            pass
-                    
-                    # Eliminar directorio temporal
-                    temp_dir = os.path.dirname(temp_frames[0]) if temp_frames else None
-                    if temp_dir and os.path.exists(temp_dir):
-                        try:
-                            os.rmdir(temp_dir)
-                        except:
-                            pass
-                    
-                    best_match = max(person_votes, key=person_votes.get) if person_votes else None
+                    yield file_name, file_path, True, self.vote_embeddings([result["embedding"]], 1), None
+            images.clear()
+        
+        for file_name, file_path, is_image in pending:
+            if is_image:
+                images.append((file_name, file_path))
+                if len(images) >= self.batch_size:
+                    yield from flush()
+                continue
+            if images:
+                yield from flush()
+            yield from self._iter_analysis_sequential([(file_name, file_path, is_image)])
+        if images:
+            yield from flush()
+
+    def _iter_analysis_parallel(self, pending):
+        """Analiza archivos en un pool de procesos y entrega los resultados en el orden original.
+        Los movimientos se hacen en el hilo que consume el generador."""
+        executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_analysis_worker,
+            initargs=(self.worker_settings(), self.reference_index)
+        )
+        in_flight = deque()
+        pending = iter(pending)
+        try:
+            while True:
+                # Mantener una ventana acotada de trabajos en vuelo
+                while self.is_running and len(in_flight) < self.num_workers * 2:
+                    item = next(pending, None)
+                    if item is None:
+                        break
+                    in_flight.append((item, executor.submit(_analyze_file_in_worker, item[1], item[2])))
                 
-                if best_match:
-                    output_person_dir = os.path.join(self.output_dir, best_match)
-                    os.makedirs(output_person_dir, exist_ok=True)
-                    
-                    output_path = os.path.join(output_person_dir, file_name)
-                    
-                    # Verificar si el archivo ya existe en destino (evitar sobrescribir)
-                    if os.path.exists(output_path):
-                        base, ext = os.path.splitext(file_name)
-                        counter = 1
-                        while os.path.exists(output_path):
-                            output_path = os.path.join(output_person_dir, f"{base}_{counter}{ext}")
-                            counter += 1
-                    
-                    shutil.move(file_path, output_path)
-                    
-                    self.log(f"     ✓ Movido a: {best_match}")
-                    classified_count += 1
-                else:
-                    self.log(f"     ❌ No coincide con ninguna persona")
-                    unclassified_count += 1
+                if not in_flight:
+                    return
+                
+                (file_name, file_path, is_image), future = in_flight.popleft()
+                while self.is_running and not future.done():
+                    wait([future], timeout=0.2)
+                if not self.is_running:
+                    return
+                
+                icon = "📷" if is_image else "🎬"
+                self.log(f"  {icon} Procesado: {file_name}")
+                try:
+                    yield file_name, file_path, is_image, future.result(), None
+                except Exception as e:
+                    yield file_name, file_path, is_image, None, e
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def worker_settings(self):
+        """Ajustes que necesita cada proceso del pool para analizar archivos"""
+        return {name: getattr(self, name) for name in (
+            "model_name", "detector_backend", "threshold", "sample_rate",
+            "video_frames", "early_exit", "vote_margin")}
+
+    def apply_analysis(self, file_name, file_path, is_image, analysis, error=None):
+        """Registra el resultado del análisis de un archivo y lo mueve si hubo coincidencia.
+        Devuelve la ruta de destino, o None si el archivo quedó sin clasificar."""
+        if error is not None:
+            self.log(f"     ❌ Error al procesar: {error}")
+            return None
+        
+        if analysis is None:
+            self.log(f"     ⚠️  No se pudieron extraer fotogramas")
+            return None
+        
+        if not is_image:
+            votes = ", ".join(f"{name}: {count} ({analysis['distances'][name]:.2f})" 
+                              for name, count in analysis["votes"].items()) or "-"
+            self.log(f"     🗳️  Votos: {votes} · fotogramas: {analysis['frames_used']}/{analysis['frames_max']}")
+        
+        try:
+            best_match = analysis["person"]
+            
+            if best_match:
+                output_path = self.move_to_person(file_path, file_name, best_match)
+                self.log(f"     ✓ Movido a: {best_match}")
+                return output_path
+            
+            self.log(f"     ❌ No coincide con ninguna persona")
+        except Exception as e:
+            self.log(f"     ❌ Error al procesar: {e}")
+        return None
+
+    def classify_file(self, file_name, file_path, is_image):
+        """Analiza y clasifica un solo archivo en el proceso actual (modelo ya cargado)"""
+        for result in self._iter_analysis_sequential([(file_name, file_path, is_image)]):
+            return self.apply_analysis(*result)
+
+    def classify_files(self):
+        """Clasifica toda la carpeta. Devuelve {'classified', 'unclassified', 'cancelled'}"""
+        summary = {"classified": 0, "unclassified": 0, "cancelled": False}
+        if not self.known_faces_data:
+            self.log("❌ No hay rostros conocidos cargados.")
+            return summary
+        
+        self.log("\n🔍 Clasificando archivos...")
+        if self.num_workers > 1:
+            self.log(f"⚙️  Procesos en paralelo: {self.num_workers}")
+        
+        pending = list(self.list_pending_files())
+        total = len(pending)
+        if self.num_workers > 1:
+            results = self._iter_analysis_parallel(pending)
+        else:
+            results = self._iter_analysis_batched(pending)
+        
+        try:
+            with self.diario.sesion(f"Clasificación de {self.unknown_files_dir}"):
+                for done, result in enumerate(results, 1):
+                    if not self.is_running:
+                        break
                     
-            except Exception as e:
-                self.log(f"     ❌ Error al procesar: {e}")
-                unclassified_count += 1
+                    if self.apply_analysis(*result):
+                        summary["classified"] += 1
+                    else:
+                        summary["unclassified"] += 1
+                    if self.progress_callback:
+                        self.progress_callback(done, total, result[0])
+        finally:
+            results.close()
+        
+        if not self.is_running:
+            summary["cancelled"] = True
+            self.log("⏸️  Proceso cancelado por el usuario")
         
         self.log(f"\n📊 Resumen:")
-        self.log(f"  ✓ Clasificados: {classified_count}")
-        self.log(f"  ❌ No clasificados: {unclassified_count}")
+        self.log(f"  ✓ Clasificados: {summary['classified']}")
+        self.log(f"  ❌ No clasificados: {summary['unclassified']}")
         self.log("✅ Proceso completado")
+        return summary
 
-    def run(self):
+    def prepare(self):
+        """Valida las carpetas y carga los rostros conocidos. Devuelve False si falta alguna carpeta."""
         mode = "Carpeta Destino" if self.use_output_as_reference else "Carpeta Separada"
         self.log("=" * 60)
         self.log("🎭 Clasificador de Imágenes y Videos por Rostro (DeepFace)")
@@ -274,25 +473,47 @@ class FacialImageClassifier:
         self.log(f"Límite de imágenes de referencia: {self.max_reference_images}")
         self.log(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         self.log(f"Modelo: {self.model_name}")
+        self.log(f"Procesos: {self.num_workers}")
         self.log("=" * 60)
         
         if self.use_output_as_reference:
             if not os.path.exists(self.output_dir):
                 self.log(f"❌ No existe: {self.output_dir}")
-                return
+                return False
         else:
             if not os.path.exists(self.known_faces_dir):
                 self.log(f"❌ No existe: {self.known_faces_dir}")
-                return
+                return False
         
         if not os.path.exists(self.unknown_files_dir):
             self.log(f"❌ No existe: {self.unknown_files_dir}")
-            return
+            return False
         
         os.makedirs(self.output_dir, exist_ok=True)
         
         self.load_known_faces()
-        self.classify_files()
+        return True
+
+    def run(self):
+        if not self.prepare():
+            return None
+        return self.classify_files()
+
+
+# Estado de cada proceso del pool: el modelo se carga una sola vez por proceso
+_worker_classifier = None
+
+def _init_analysis_worker(settings, reference_index):
+    global _worker_classifier
+    warnings.filterwarnings('ignore')
+    _worker_classifier = FacialImageClassifier(None, None, None)
+    for name, value in settings.items():
+        setattr(_worker_classifier, name, value)
+    _worker_classifier.reference_index = reference_index
+    cargar_deepface().build_model(_worker_classifier.model_name)
+
+def _analyze_file_in_worker(file_path, is_image):
+    return _worker_classifier.analyze_file(file_path, is_image)
 
 
 class ClassifierGUI:
@@ -309,9 +530,19 @@ class ClassifierGUI:
         self.output_dir = tk.StringVar(value="./archivos_clasificados")
         self.mode_var = tk.StringVar(value="separate")
         self.max_ref_images = tk.IntVar(value=5)
+        self.num_workers = tk.IntVar(value=1)
         
         self.setup_ui()
         self.toggle_mode()
+        self.reporte = ReporteProgreso(self.root, on_progress=self._show_progress, on_log=self._write_log).iniciar()
+        
+        # Cargar DeepFace/TensorFlow en segundo plano mientras el usuario configura
+        self.status_var.set("⏳ Cargando modelo en segundo plano...")
+        precalentar_async(FacialImageClassifier.DEFAULT_MODEL, callback=lambda: self.reporte.en_ui(self._model_ready))
+
+    def _model_ready(self):
+        if not self.is_processing:
+            self.status_var.set("Listo - Usando DeepFace")
 
     def setup_ui(self):
         # Frame para modo de operación
@@ -360,6 +591,12 @@ class ClassifierGUI:
         spinbox.grid(row=3, column=1, sticky="w", padx=5)
         tk.Label(top_frame, text="(por persona)", font=("Arial", 8), fg="gray").grid(row=3, column=1, sticky="w", padx=80)
         
+        # Procesos en paralelo
+        tk.Label(top_frame, text="Procesos en paralelo:", font=("Arial", 9)).grid(row=4, column=0, sticky="w", pady=5)
+        tk.Spinbox(top_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.num_workers, width=10, 
+                   font=("Arial", 9)).grid(row=4, column=1, sticky="w", padx=5)
+        tk.Label(top_frame, text="(1 = secuencial)", font=("Arial", 8), fg="gray").grid(row=4, column=1, sticky="w", padx=80)
+        
         top_frame.columnconfigure(1, weight=1)
         
         # Frame de botones
@@ -421,9 +658,15 @@ class ClassifierGUI:
             self.output_dir.set(path)
 
     def log(self, message):
-        self.log_text.insert(tk.END, message + "\n")
+        # Desde cualquier hilo: el reporte lo escribe en el hilo de Tk a ritmo fijo
+        self.reporte.log(message)
+
+    def _write_log(self, text):
+        self.log_text.insert(tk.END, text + "\n")
         self.log_text.see(tk.END)
-        self.root.update()
+
+    def _show_progress(self, done, total, message, rate, eta):
+        self.status_var.set(texto_progreso(done, total, f"▶️ {done}/{total} {message}", rate, eta))
 
     def clear_log(self):
         self.log_text.delete(1.0, tk.END)
@@ -457,9 +700,11 @@ class ClassifierGUI:
             unknown, 
             output, 
             use_output_as_reference=use_output_as_ref,
-            max_reference_images=self.max_ref_images.get()
+            max_reference_images=self.max_ref_images.get(),
+            num_workers=self.num_workers.get()
         )
         self.classifier.set_log_callback(self.log)
+        self.classifier.progress_callback = self.reporte.progreso
         self.classifier.is_running = True
         self.is_processing = True
         
@@ -478,7 +723,7 @@ class ClassifierGUI:
         except Exception as e:
             self.log(f"❌ Error: {str(e)}")
         finally:
-            self.finish_classification()
+            self.reporte.en_ui(self.finish_classification)
 
     def cancel_classification(self):
         if self.classifier:
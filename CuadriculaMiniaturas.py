@@ -0,0 +1,213 @@
+import os
+import tkinter as tk
+from tkinter import Toplevel, Canvas, Scrollbar, Button, Label, StringVar, ttk
+from PIL import ImageTk
+from LogicaVisor import CacheVistas, Precargador
+
+COLOR_BG = "#202124"
+COLOR_CELDA = "#2f3136"
+COLOR_ACCENT = "#5865F2"
+LADO_CELDA = 160
+MARGEN = 8
+# Filas que se preparan por encima y por debajo de las visibles
+FILAS_EXTRA = 2
+
+
+class CuadriculaMiniaturas:
+    """Ventana con todos los archivos en una cuadrícula de miniaturas.
+
+    Solo las celdas visibles existen en el Canvas: al desplazarse se borran las
+    que salen y se dibujan las que entran, así que 10.000 archivos cuestan lo
+    mismo que 50. Las miniaturas se decodifican en un hilo (desde la caché en
+    disco) y un `after()` las pinta a medida que llegan.
+
+    Clic selecciona, Ctrl+clic suma o quita, Mayús+clic selecciona un rango y
+    Ctrl+A todo. `al_mover(rutas, carpeta, al_terminar)` mueve la selección y
+    llama a `al_terminar(movidas)`; doble clic llama a `al_abrir(ruta)`.
+    """
+    def __init__(self, master, rutas, miniaturas, destinos, al_mover, al_abrir=None):
+        self.rutas = list(rutas)
+        self.al_mover = al_mover
+        self.al_abrir = al_abrir
+        self.seleccion = set()
+        self.ancla = None
+        self.dibujadas = {}  # índice -> (ids del canvas, PhotoImage o None)
+        self.columnas = 1
+        self.precarga = Precargador(CacheVistas(presupuesto=64 << 20), vecinos=0, decodificar=miniaturas.vista)
+        self.tamano = (LADO_CELDA, LADO_CELDA)
+
+        self.window = Toplevel(master)
+        self.window.title("Cuadrícula")
+        self.window.configure(bg=COLOR_BG)
+        w, h = master.winfo_screenwidth() - 200, master.winfo_screenheight() - 150
+        self.window.geometry(f"{w}x{h}+100+50")
+
+        barra = tk.Frame(self.window, bg=COLOR_BG)
+        barra.pack(side="bottom", fill="x", padx=10, pady=8)
+        self.texto_seleccion = StringVar()
+        Label(barra, textvariable=self.texto_seleccion, bg=COLOR_BG, fg="white", font=("Segoe UI", 10)).pack(side="left")
+        self.btn_mover = Button(barra, text="Mover selección", command=self.mover, bg=COLOR_ACCENT, fg="white", bd=0, padx=15, pady=5)
+        self.btn_mover.pack(side="right")
+        self.destino = ttk.Combobox(barra, values=sorted(destinos), state="readonly", width=30)
+        self.destino.pack(side="right", padx=10)
+
+        self.canvas = Canvas(self.window, bg=COLOR_BG, highlightthickness=0)
+        self.scrollbar = Scrollbar(self.window, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._al_desplazar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.recalcular())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Control-Button-1>", lambda e: self.on_click(e, sumar=True))
+        self.canvas.bind("<Shift-Button-1>", lambda e: self.on_click(e, rango=True))
+        self.canvas.bind("<Double-Button-1>", self.on_doble_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+        self.window.bind("<Control-a>", lambda e: self.seleccionar(range(len(self.rutas))))
+        self.window.bind("<Escape>", lambda e: self.seleccionar([]))
+        self.window.protocol("WM_DELETE_WINDOW", self.cerrar)
+
+        self.actualizar_texto()
+        self.window.after(100, self._pintar_llegadas)
+
+    # --- Geometría ---
+
+    @property
+    def paso(self):
+        return LADO_CELDA + MARGEN
+
+    def recalcular(self):
+        """Ajusta columnas y scrollregion al ancho de la ventana y redibuja."""
+        columnas = max(1, (self.canvas.winfo_width() - MARGEN) // self.paso)
+        filas = (len(self.rutas) + columnas - 1) // columnas
+        self.canvas.configure(scrollregion=(0, 0, columnas * self.paso + MARGEN, filas * self.paso + MARGEN),
+                              yscrollincrement=self.paso // 4)
+        if columnas != self.columnas:
+            self.columnas = columnas
+            self.borrar_todo()
+        self.redibujar()
+
+    def visibles(self):
+        """Rango de índices en pantalla, más FILAS_EXTRA por arriba y por abajo."""
+        arriba = self.canvas.canvasy(0)
+        abajo = self.canvas.canvasy(self.canvas.winfo_height())
+        primera = max(0, int(arriba // self.paso) - FILAS_EXTRA)
+        ultima = int(abajo // self.paso) + FILAS_EXTRA
+        return range(primera * self.columnas, min(len(self.rutas), (ultima + 1) * self.columnas))
+
+    def indice_en(self, x, y):
+        x, y = self.canvas.canvasx(x), self.canvas.canvasy(y)
+        columna, fila = int((x - MARGEN) // self.paso), int((y - MARGEN) // self.paso)
+        if not 0 <= columna < self.columnas: return None
+        i = fila * self.columnas + columna
+        return i if 0 <= i < len(self.rutas) else None
+
+    # --- Dibujo ---
+
+    def _al_desplazar(self, *args):
+        self.scrollbar.set(*args)
+        self.redibujar()
+
+    def redibujar(self):
+        rango = self.visibles()
+        for i in [i for i in self.dibujadas if i not in rango]:
+            self.borrar(i)
+        for i in rango:
+            if i not in self.dibujadas:
+                self.dibujar(i)
+        # Primero las visibles; lo que ya salió de pantalla deja de pedirse
+        self.precarga.pedir([self.rutas[i] for i in rango if self.dibujadas[i][1] is None], self.tamano)
+
+    def dibujar(self, i):
+        x = MARGEN + (i % self.columnas) * self.paso
+        y = MARGEN + (i // self.columnas) * self.paso
+        ids = [self.canvas.create_rectangle(x, y, x + LADO_CELDA, y + LADO_CELDA, fill=COLOR_CELDA, width=0)]
+        foto = None
+        img = self.precarga.cache.get(self.rutas[i], self.tamano)
+        if img is not None:
+            foto = ImageTk.PhotoImage(img)
+            ids.append(self.canvas.create_image(x + LADO_CELDA // 2, y + LADO_CELDA // 2, image=foto))
+        else:
+            ids.append(self.canvas.create_text(x + LADO_CELDA // 2, y + LADO_CELDA // 2, width=LADO_CELDA - 10,
+                                               text=os.path.basename(self.rutas[i]), fill="#777", font=("Segoe UI", 8)))
+        if i in self.seleccion:
+            ids.append(self.canvas.create_rectangle(x + 1, y + 1, x + LADO_CELDA - 1, y + LADO_CELDA - 1, outline=COLOR_ACCENT, width=4))
+        self.dibujadas[i] = (ids, foto)
+
+    def borrar(self, i):
+        ids, _ = self.dibujadas.pop(i)
+        self.canvas.delete(*ids)
+
+    def borrar_todo(self):
+        for i in list(self.dibujadas):
+            self.borrar(i)
+
+    def repintar(self, i):
+        if i in self.dibujadas:
+            self.borrar(i)
+            self.dibujar(i)
+
+    def _pintar_llegadas(self):
+        if not self.window.winfo_exists(): return
+        for i, (_, foto) in list(self.dibujadas.items()):
+            if foto is None and self.precarga.cache.get(self.rutas[i], self.tamano) is not None:
+                self.repintar(i)
+        self.window.after(100, self._pintar_llegadas)
+
+    # --- Selección ---
+
+    def on_click(self, event, sumar=False, rango=False):
+        i = self.indice_en(event.x, event.y)
+        if i is None: return
+        if rango and self.ancla is not None:
+            inicio, fin = sorted((self.ancla, i))
+            self.seleccionar(self.seleccion | set(range(inicio, fin + 1)))
+            return
+        self.ancla = i
+        self.seleccionar(self.seleccion ^ {i} if sumar else {i})
+
+    def on_doble_click(self, event):
+        i = self.indice_en(event.x, event.y)
+        if i is not None and self.al_abrir:
+            self.al_abrir(self.rutas[i])
+
+    def seleccionar(self, indices):
+        nueva = set(indices)
+        cambiadas = nueva ^ self.seleccion
+        self.seleccion = nueva
+        for i in cambiadas:
+            self.repintar(i)
+        self.actualizar_texto()
+
+    def actualizar_texto(self):
+        self.texto_seleccion.set(f"{len(self.seleccion)} seleccionados de {len(self.rutas)}")
+
+    # --- Acciones ---
+
+    def mover(self):
+        carpeta = self.destino.get()
+        if not self.seleccion or not carpeta: return
+        rutas = [self.rutas[i] for i in sorted(self.seleccion)]
+        # Hasta que termine, un segundo clic no vuelve a mandar los mismos archivos
+        self.btn_mover.config(state="disabled")
+        self.texto_seleccion.set(f"Moviendo {len(rutas)} archivos a {carpeta}...")
+        self.al_mover(rutas, carpeta, self.quitar)
+
+    def quitar(self, movidas):
+        """Saca de la cuadrícula las rutas `movidas` (llamar desde el hilo de Tk)."""
+        # La ventana pudo cerrarse mientras se movían los archivos
+        if not self.window.winfo_exists(): return
+        self.btn_mover.config(state="normal")
+        movidas = set(movidas)
+        self.rutas = [r for r in self.rutas if r not in movidas]
+        self.seleccion.clear()
+        self.ancla = None
+        self.borrar_todo()
+        self.recalcular()
+        self.actualizar_texto()
+
+    def cerrar(self):
+        self.precarga.detener()
+        self.window.destroy()
@@ -1,12 +1,15 @@
 import tkinter as tk
 from tkinter import Toplevel, Canvas, Button, messagebox
 from PIL import Image, ImageTk
+from LogicaVisor import abrir_vista
 
 class EditorImagen:
-    def __init__(self, master, image_path, callback_guardado):
+    def __init__(self, master, image_path, callback_guardado, modo_video=False):
         self.master = master
         self.image_path = image_path
         self.callback_guardado = callback_guardado
+        # En modo video no se sobrescribe nada: se devuelven las coordenadas del recorte
+        self.modo_video = modo_video
         
         self.window = Toplevel(master)
         self.window.title("Editor de Recorte")
@@ -16,9 +19,9 @@ class EditorImagen:
         w, h = master.winfo_screenwidth() - 100, master.winfo_screenheight() - 100
         self.window.geometry(f"{w}x{h}+50+50")
 
-        # Cargar imagen original
-        self.original_image = Image.open(image_path)
-        self.original_w, self.original_h = self.original_image.size
+        # Tamaño original (solo la cabecera; la imagen completa se lee al guardar)
+        with Image.open(image_path) as img:
+            self.original_w, self.original_h = img.size
         
         # Calcular tamaño para mostrar en pantalla (sin deformar)
         self.display_w = w - 50
@@ -28,8 +31,10 @@ class EditorImagen:
         self.new_w = int(self.original_w * ratio)
         self.new_h = int(self.original_h * ratio)
         
-        # Imagen redimensionada para vista previa
-        self.resized_image = self.original_image.resize((self.new_w, self.new_h), Image.Resampling.LANCZOS)
+        # Vista previa decodificada a tamaño de pantalla (draft JPEG), sin pasar por la resolución completa
+        self.resized_image = abrir_vista(image_path, (self.new_w, self.new_h))
+        if self.resized_image.size != (self.new_w, self.new_h):
+            self.resized_image = self.resized_image.resize((self.new_w, self.new_h), Image.Resampling.BICUBIC)
         self.tk_image = ImageTk.PhotoImage(self.resized_image)
 
         # UI
@@ -59,6 +64,15 @@ class EditorImagen:
         tk.Label(frame_btns, text="Dibuja un rectángulo sobre el área que quieres conservar", 
                  bg="#202124", fg="#b9bbbe").pack(side="top", pady=5)
 
+        if self.modo_video:
+            # Cerrar sin recortar también avisa (con None) para limpiar el fotograma temporal
+            self.window.protocol("WM_DELETE_WINDOW", self.cancelar)
+
+    def cancelar(self):
+        self.window.destroy()
+        if self.callback_guardado:
+            self.callback_guardado(None)
+
     def on_press(self, event):
         # Guardar coordenadas iniciales
         self.start_x = self.canvas.canvasx(event.x)
@@ -103,9 +117,17 @@ class EditorImagen:
         real_x2 = int(x2 * scale_x)
         real_y2 = int(y2 * scale_y)
 
+        if self.modo_video:
+            self.window.destroy()
+            if self.callback_guardado:
+                self.callback_guardado((real_x1, real_y1, real_x2, real_y2))
+            return
+
         # 4. Recortar
         try:
-            cropped = self.original_image.crop((real_x1, real_y1, real_x2, real_y2))
+            with Image.open(self.image_path) as original:
+                cropped = original.crop((real_x1, real_y1, real_x2, real_y2))
+                cropped.load()
             cropped.save(self.image_path) # Sobrescribir
             
             messagebox.showinfo("Éxito", "Imagen recortada correctamente.")
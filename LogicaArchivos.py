@@ -0,0 +1,9 @@
+import os
+
+# Utilidades de archivos sin dependencias: las comparten el motor facial, el visor y la CLI
+
+
+def firma_archivo(ruta):
+    """(tamaño, mtime_ns): cambia si el archivo se recorta o se reemplaza."""
+    st = os.stat(ruta)
+    return st.st_size, st.st_mtime_ns
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Los archivos "borrados" se apartan en <carpeta>/.cuarentena/<sesion>/: en el
+# mismo disco, así que borrar y deshacer son un simple rename.
+CARPETA_CUARENTENA = ".cuarentena"
+NOMBRE_DIARIO = "operaciones.jsonl"
+
+
+def directorio_estado():
+    """Carpeta de estado de la aplicación ($XDG_STATE_HOME en Linux, %LOCALAPPDATA% en Windows)."""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+    return os.path.join(base, "reconocimiento-facial")
+
+
+def _ruta_libre(ruta):
+    """`ruta` si no existe; si no, la misma con _1, _2... antes de la extensión."""
+    if not os.path.exists(ruta):
+        return ruta
+    base, ext = os.path.splitext(ruta)
+    contador = 1
+    while os.path.exists(f"{base}_{contador}{ext}"):
+        contador += 1
+    return f"{base}_{contador}{ext}"
+
+
+class DiarioOperaciones:
+    """Diario de solo añadir con cada movimiento, borrado y renombrado hecho por la aplicación.
+
+    Cada operación se anota antes de ejecutarse (si falla se anota como anulada),
+    así que un corte a mitad nunca deja cambios sin registrar. Las escrituras se
+    vuelcan al momento y se sincronizan con fsync cada `lote` operaciones y al
+    cerrar cada sesión. Las operaciones se agrupan en sesiones, que son la unidad
+    que se puede deshacer; una sesión solo llega al diario con su primera operación.
+    """
+    def __init__(self, ruta=None, lote=32, log_callback=None):
+        self.ruta = ruta or os.path.join(directorio_estado(), NOMBRE_DIARIO)
+        self.lote = lote
+        self.log_callback = log_callback
+        self.lock = threading.RLock()
+        self.archivo = None
+        self.sin_sincronizar = 0
+        # Cada hilo tiene su sesión: el organizador mueve en el hilo de Tk mientras
+        # la limpieza corre en otro
+        self._local = threading.local()
+        self.deshechas = set()
+        # Cabeceras de sesiones sin operaciones todavía: se escriben con la primera,
+        # así que una ejecución que no toca nada no deja una sesión vacía
+        self.cabeceras = {}
+
+    @property
+    def sesion_actual(self):
+        return getattr(self._local, "sesion", None)
+
+    def log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            print(message)
+
+    def _escribir(self, registro):
+        with self.lock:
+            if self.archivo is None:
+                os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+                self.archivo = open(self.ruta, "a", encoding="utf-8")
+            self.archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            self.archivo.flush()
+            self.sin_sincronizar += 1
+            if self.sin_sincronizar >= self.lote:
+                self.sincronizar()
+
+    def sincronizar(self):
+        with self.lock:
+            if self.archivo and self.sin_sincronizar:
+                os.fsync(self.archivo.fileno())
+                self.sin_sincronizar = 0
+
+    def iniciar_sesion(self, descripcion=""):
+        sesion = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        with self.lock:
+            self.cabeceras[sesion] = {"sesion": sesion, "op": "inicio", "descripcion": descripcion, "t": time.time()}
+        self._local.sesion = sesion
+        self._local.propia = True
+        return sesion
+
+    def cerrar_sesion(self):
+        # Solo quien abrió la sesión la descarta si quedó vacía; los hilos que se sumaron no
+        if getattr(self._local, "propia", False):
+            with self.lock:
+                self.cabeceras.pop(self.sesion_actual, None)
+        self.sincronizar()
+        self._local.sesion = None
+        self._local.propia = False
+
+    @contextmanager
+    def sesion(self, descripcion="", existente=None):
+        """Agrupa las operaciones del bloque en una sesión.
+
+        Los bloques anidados (p. ej. procesar_carpeta dentro de "limpiar todas
+        las subcarpetas") se suman a la sesión exterior. Con `existente`, un hilo
+        de un pool se suma a la sesión que abrió otro hilo.
+        """
+        profundidad = getattr(self._local, "profundidad", 0)
+        if profundidad == 0:
+            if existente:
+                self._local.sesion = existente
+                self._local.propia = False
+            else: self.iniciar_sesion(descripcion)
+        self._local.profundidad = profundidad + 1
+        try:
+            yield self.sesion_actual
+        finally:
+            self._local.profundidad = profundidad
+            if profundidad == 0: self.cerrar_sesion()
+
+    def _operacion(self, op, ejecutar, **datos):
+        if self.sesion_actual is None or self.sesion_actual in self.deshechas:
+            # Operaciones sueltas (p. ej. el organizador manual): una sesión por hilo y ejecución
+            self.iniciar_sesion("Operaciones sueltas")
+        id_op = uuid.uuid4().hex[:12]
+        with self.lock:
+            cabecera = self.cabeceras.pop(self.sesion_actual, None)
+            if cabecera: self._escribir(cabecera)
+            self._escribir({"sesion": self.sesion_actual, "op": op, "id": id_op, **datos})
+        try:
+            return ejecutar()
+        except Exception:
+            self._escribir({"sesion": self.sesion_actual, "op": "anulada", "id": id_op})
+            raise
+
+    def mover(self, origen, destino):
+        """shutil.move registrado (rename si están en el mismo disco). Devuelve la ruta final.
+
+        Nunca sobrescribe: si `destino` ya existe se usa el primer nombre libre
+        (_1, _2...) y ese es el que queda en el diario.
+        """
+        origen = os.path.abspath(origen)
+        with self.lock:
+            destino = _ruta_libre(os.path.abspath(destino))
+            self._operacion("mover", lambda: shutil.move(origen, destino), de=origen, a=destino)
+        return destino
+
+    def eliminar(self, ruta):
+        """Aparta el archivo en la cuarentena de su carpeta. Devuelve la ruta en cuarentena."""
+        ruta = os.path.abspath(ruta)
+        if self.sesion_actual is None or self.sesion_actual in self.deshechas:
+            self.iniciar_sesion("Operaciones sueltas")
+        carpeta = os.path.join(os.path.dirname(ruta), CARPETA_CUARENTENA, self.sesion_actual)
+        os.makedirs(carpeta, exist_ok=True)
+        destino = _ruta_libre(os.path.join(carpeta, os.path.basename(ruta)))
+        def ejecutar():
+            os.rename(ruta, destino)
+            return destino
+        return self._operacion("eliminar", ejecutar, de=ruta, a=destino)
+
+    def renombrar_lote(self, carpeta, plan, ejecutar):
+        """Registra un renombrado de carpeta completo ({nombre_actual: nombre_final}) y lo ejecuta."""
+        return self._operacion("renombrar", ejecutar, carpeta=os.path.abspath(carpeta), plan=plan)
+
+    def leer(self):
+        """Registros del diario (ignora una última línea a medio escribir)."""
+        self.sincronizar()
+        registros = []
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try: registros.append(json.loads(linea))
+                    except ValueError: pass
+        except FileNotFoundError:
+            pass
+        return registros
+
+    def sesiones(self):
+        """Lista de dicts {sesion, descripcion, operaciones, deshecha, purgada, t}, ordenada por su última actividad."""
+        resumen, ultima = {}, {}
+        for i, r in enumerate(self.leer()):
+            if r["op"] not in ("deshecha", "purgada"): ultima[r["sesion"]] = i
+            s = resumen.setdefault(r["sesion"], {"sesion": r["sesion"], "descripcion": "", "operaciones": 0,
+                                                 "deshecha": False, "purgada": False, "t": r.get("t")})
+            if r["op"] == "inicio": s["descripcion"] = r.get("descripcion", "")
+            elif r["op"] == "deshecha": s["deshecha"] = True
+            elif r["op"] == "purgada": s["purgada"] = True
+            elif r["op"] == "anulada": s["operaciones"] -= 1
+            else: s["operaciones"] += 1
+        return sorted(resumen.values(), key=lambda s: ultima.get(s["sesion"], -1))
+
+    def deshacer(self, sesion=None):
+        """Deshace una sesión (por defecto la última con operaciones que no se haya deshecho).
+
+        Las operaciones se revierten en orden inverso. Un archivo que ya no está
+        donde lo dejó la operación, o cuyo sitio original está ocupado, se omite.
+        Devuelve {sesion, restaurados, omitidos} o None si no hay nada que deshacer.
+        """
+        from LogicaRenombramiento import ordenar_renombrados, ejecutar_renombrados
+
+        if sesion is None:
+            candidatas = [s for s in self.sesiones() if s["operaciones"] > 0 and not s["deshecha"]]
+            if not candidatas:
+                return None
+            sesion = candidatas[-1]["sesion"]
+        registros = [r for r in self.leer() if r["sesion"] == sesion]
+        anuladas = {r["id"] for r in registros if r["op"] == "anulada"}
+        operaciones = [r for r in registros if r["op"] in ("mover", "eliminar", "renombrar") and r["id"] not in anuladas]
+
+        restaurados, omitidos = 0, 0
+        for r in reversed(operaciones):
+            try:
+                if r["op"] == "renombrar":
+                    inverso = {final: actual for actual, final in r["plan"].items()}
+                    if not all(os.path.exists(os.path.join(r["carpeta"], n)) for n in inverso):
+                        raise FileNotFoundError(r["carpeta"])
+                    ejecutar_renombrados(r["carpeta"], ordenar_renombrados(inverso))
+                    restaurados += len(inverso)
+                    continue
+                if not os.path.exists(r["a"]) or os.path.exists(r["de"]):
+                    raise FileExistsError(r["de"])
+                os.makedirs(os.path.dirname(r["de"]), exist_ok=True)
+                shutil.move(r["a"], r["de"])
+                restaurados += 1
+            except Exception as e:
+                omitidos += 1
+                self.log(f"No se pudo deshacer {r['op']} de {r.get('de', r.get('carpeta'))}: {e}")
+
+        # Quitar las carpetas de cuarentena de la sesión que hayan quedado vacías
+        for r in operaciones:
+            if r["op"] == "eliminar":
+                sesion_dir = os.path.dirname(r["a"])
+                for carpeta in (sesion_dir, os.path.dirname(sesion_dir)):
+                    try: os.rmdir(carpeta)
+                    except OSError: break
+        self.deshechas.add(sesion)
+        self._escribir({"sesion": sesion, "op": "deshecha", "t": time.time()})
+        self.sincronizar()
+        self.log(f"Sesión {sesion} deshecha: {restaurados} archivos restaurados, {omitidos} omitidos")
+        return {"sesion": sesion, "restaurados": restaurados, "omitidos": omitidos}
+
+    def en_cuarentena(self, sesion=None):
+        """Archivos y bytes que siguen en cuarentena (de una sesión o de todas)."""
+        archivos, total = 0, 0
+        for r in self._eliminados(sesion):
+            try: total += os.path.getsize(r["a"])
+            except OSError: continue
+            archivos += 1
+        return {"archivos": archivos, "bytes": total}
+
+    def _eliminados(self, sesion=None):
+        registros = self.leer()
+        anuladas = {r["id"] for r in registros if r["op"] == "anulada"}
+        return [r for r in registros if r["op"] == "eliminar" and r["id"] not in anuladas
+                and (sesion is None or r["sesion"] == sesion)]
+
+    def purgar(self, dias=30, sesion=None):
+        """Borra de verdad lo que está en cuarentena desde hace más de `dias` días (o de una `sesion`).
+
+        Es lo único que libera espacio; esas eliminaciones ya no se pueden
+        deshacer. Devuelve {sesiones, archivos, bytes}.
+        """
+        limite = time.time() - dias * 86400
+        if sesion is None:
+            elegidas = {s["sesion"] for s in self.sesiones() if s["t"] is not None and s["t"] <= limite}
+        else:
+            elegidas = {sesion}
+        purgadas, archivos, liberados = set(), 0, 0
+        for r in self._eliminados():
+            if r["sesion"] not in elegidas: continue
+            try:
+                size = os.path.getsize(r["a"])
+                os.remove(r["a"])
+            except OSError:
+                continue
+            purgadas.add(r["sesion"])
+            archivos += 1
+            liberados += size
+            sesion_dir = os.path.dirname(r["a"])
+            for carpeta in (sesion_dir, os.path.dirname(sesion_dir)):
+                try: os.rmdir(carpeta)
+                except OSError: break
+        for s in sorted(purgadas):
+            self._escribir({"sesion": s, "op": "purgada", "t": time.time()})
+        self.sincronizar()
+        if purgadas:
+            self.log(f"Cuarentena vaciada: {archivos} archivos, {liberados} bytes liberados ({len(purgadas)} sesiones)")
+        return {"sesiones": len(purgadas), "archivos": archivos, "bytes": liberados}
+
+
+_diario = None
+_diario_lock = threading.Lock()
+
+def diario_por_defecto():
+    """Diario compartido por todo el proceso (clasificador, renombrado y organizador)."""
+    global _diario
+    with _diario_lock:
+        if _diario is None:
+            _diario = DiarioOperaciones()
+        return _diario
@@ -1,18 +1,251 @@
 import os
 import numpy as np
 import threading
-from deepface import DeepFace
+from concurrent.futures import ThreadPoolExecutor
+from LogicaArchivos import firma_archivo
+
+# DeepFace importa TensorFlow (varios segundos): se carga en el primer uso
+DeepFace = None
+_deepface_lock = threading.Lock()
+
+def cargar_deepface():
+    global DeepFace
+    with _deepface_lock:
+        if DeepFace is None:
+            from deepface import DeepFace as _DeepFace
+            DeepFace = _DeepFace
+    return DeepFace
+
+def precalentar_async(model_name, callback=None):
+    """Importa DeepFace y construye el modelo en un hilo de fondo para que el primer análisis no espere."""
+    def tarea():
+        try:
+            cargar_deepface().build_model(model_name)
+        except Exception as e:
+            print(f"IA: No se pudo precargar {model_name}: {e}")
+        if callback: callback()
+    thread = threading.Thread(target=tarea, daemon=True)
+    thread.start()
+    return thread
+
+def _detectar_rostro(item, detector_backend, enforce_detection, align):
+    faces = cargar_deepface().extract_faces(
+        img_path=item,
+        detector_backend=detector_backend,
+        enforce_detection=enforce_detection,
+        align=align
+    )
+    if not faces:
+        raise ValueError("No se detectó rostro")
+    # extract_faces devuelve RGB en [0, 1]; represent() trabaja en BGR
+    return faces[0]["face"][:, :, ::-1]
+
+def _represent_uno(item, model_name, detector_backend, enforce_detection, align):
+    # Camino público de DeepFace, imagen por imagen: más lento pero no depende de sus módulos internos
+    objs = cargar_deepface().represent(img_path=item, model_name=model_name, detector_backend=detector_backend,
+                                       enforce_detection=enforce_detection, align=align)
+    if not objs:
+        raise ValueError("No se detectó rostro")
+    return np.asarray(objs[0]["embedding"], dtype=np.float32)
+
+def _represent_individual(items, resultados, model_name, detector_backend, enforce_detection, align, progress_callback):
+    for i, item in enumerate(items):
+        try:
+            resultados[i] = {"embedding": _represent_uno(item, model_name, detector_backend, enforce_detection, align), "error": None}
+        except Exception as e:
+            resultados[i] = {"embedding": None, "error": str(e)}
+        if progress_callback: progress_callback(i + 1, len(items))
+    return resultados
+
+# Embeddings de varias imágenes (rutas o arrays BGR) por lotes: [{"embedding", "error"}, ...] alineado con `items`.
+# Todo embedding del programa pasa por aquí para que las distancias sean comparables
+def represent_batch(items, model_name, detector_backend, batch_size=32, enforce_detection=True,
+                    align=True, max_workers=4, progress_callback=None):
+    items = list(items)
+    resultados = [{"embedding": None, "error": None} for _ in items]
+    if not items: return resultados
+    
+    model = cargar_deepface().build_model(model_name)
+    # El lote usa módulos internos de DeepFace (probado con la versión fijada en el README);
+    # si otra versión los cambió se usa DeepFace.represent imagen por imagen
+    try:
+        from deepface.modules import preprocessing
+        resize_image, normalize_input = preprocessing.resize_image, preprocessing.normalize_input
+        target_size = model.input_shape
+    except (ImportError, AttributeError):
+        return _represent_individual(items, resultados, model_name, detector_backend, enforce_detection, align, progress_callback)
+    keras_model = getattr(model, "model", None)
+    
+    def preparar(item):
+        face = _detectar_rostro(item, detector_backend, enforce_detection, align)
+        face = resize_image(img=face, target_size=(target_size[1], target_size[0]))
+        return normalize_input(img=face, normalization="base")
+    
+    hechos = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for inicio in range(0, len(items), batch_size):
+            indices = range(inicio, min(inicio + batch_size, len(items)))
+            futuros = {i: pool.submit(preparar, items[i]) for i in indices}
+            
+            validos, recortes = [], []
+            for i, futuro in futuros.items():
+                try:
+                    recortes.append(futuro.result())
+                    validos.append(i)
+                except Exception as e:
+                    resultados[i]["error"] = str(e)
+            
+            if recortes:
+                lote = np.concatenate(recortes, axis=0)
+                try:
+                    if callable(keras_model):
+                        embeddings = np.asarray(keras_model(lote, training=False))
+                    else:
+                        embeddings = np.vstack([np.asarray(model.forward(r), dtype=np.float32) for r in recortes])
+                    for i, embedding in zip(validos, embeddings):
+                        resultados[i]["embedding"] = np.asarray(embedding, dtype=np.float32)
+                except Exception as e:
+                    for i in validos:
+                        resultados[i]["error"] = str(e)
+            
+            hechos += len(indices)
+            if progress_callback: progress_callback(hechos, len(items))
+    return resultados
+
+# Embeddings guardados junto a la carpeta destino, por ruta relativa y validados con tamaño + mtime
+class EmbeddingStore:
+    VERSION = 2
+
+    def __init__(self, base_dir, model_name, detector_backend):
+        self.base_dir = base_dir
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.path = os.path.join(base_dir, f".embeddings_{model_name}_{detector_backend}.npz")
+        self.entries = {}
+        self.dirty = False
+
+    def load(self):
+        # Sin pickle: un archivo manipulado en una carpeta compartida no puede ejecutar código
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if (int(data["version"]) == self.VERSION and str(data["model"]) == self.model_name
+                        and str(data["detector"]) == self.detector_backend):
+                    firmas, embeddings, con_rostro = data["firmas"], data["embeddings"], data["con_rostro"]
+                    self.entries = {
+                        str(rel): ((int(firmas[i, 0]), int(firmas[i, 1])), embeddings[i] if con_rostro[i] else None)
+                        for i, rel in enumerate(data["rutas"])
+                    }
+        except Exception:
+            self.entries = {}
+        return self
+
+    def save(self):
+        if not self.dirty: return
+        tmp_path = self.path + ".tmp"
+        # Arrays paralelos; las imágenes sin rostro llevan una fila de ceros y con_rostro=False
+        rutas = list(self.entries)
+        dim = next((len(e[1]) for e in self.entries.values() if e[1] is not None), 0)
+        embeddings = np.zeros((len(rutas), dim), dtype=np.float32)
+        for i, rel in enumerate(rutas):
+            if self.entries[rel][1] is not None: embeddings[i] = self.entries[rel][1]
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, version=self.VERSION, model=self.model_name, detector=self.detector_backend,
+                         rutas=np.array(rutas, dtype=str),
+                         firmas=np.array([self.entries[rel][0] for rel in rutas], dtype=np.int64).reshape(-1, 2),
+                         embeddings=embeddings,
+                         con_rostro=np.array([self.entries[rel][1] is not None for rel in rutas], dtype=bool))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception:
+            try: os.remove(tmp_path)
+            except: pass
+
+    def get(self, img_path):
+        """Devuelve (encontrado, embedding). embedding es None si la imagen no tenía rostro."""
+        rel = os.path.relpath(img_path, self.base_dir)
+        entry = self.entries.get(rel)
+        if entry is None: return False, None
+        try:
+            if entry[0] != firma_archivo(img_path): return False, None
+        except OSError:
+            return False, None
+        return True, entry[1]
+
+    def put(self, img_path, embedding):
+        try: firma = firma_archivo(img_path)
+        except OSError: return
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float32)
+        self.entries[os.path.relpath(img_path, self.base_dir)] = (firma, embedding)
+        self.dirty = True
+
+    def prune(self, vigentes):
+        """Elimina las entradas cuyas rutas relativas ya no están en `vigentes`."""
+        obsoletas = [rel for rel in self.entries if rel not in vigentes]
+        for rel in obsoletas:
+            del self.entries[rel]
+        if obsoletas: self.dirty = True
+        return len(obsoletas)
+
+# Referencias normalizadas en una matriz float32 agrupada por persona: una consulta es un producto matriz-vector
+class IndiceEmbeddings:
+    def __init__(self, embeddings_por_persona):
+        self.nombres = []
+        inicios = []
+        filas = []
+        for nombre, embeddings in embeddings_por_persona.items():
+            if not embeddings: continue
+            self.nombres.append(nombre)
+            inicios.append(len(filas))
+            filas.extend(np.asarray(e, dtype=np.float32) for e in embeddings)
+        
+        if filas:
+            matriz = np.vstack(filas)
+            normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+            normas[normas == 0] = 1.0
+            self.matriz = matriz / normas
+        else:
+            self.matriz = np.zeros((0, 0), dtype=np.float32)
+        self.inicios = np.asarray(inicios, dtype=np.intp)
+
+    def __len__(self):
+        return self.matriz.shape[0]
+
+    def distancias(self, embedding):
+        """Distancia coseno del embedding contra todas las referencias (una por fila)."""
+        q = np.asarray(embedding, dtype=np.float32).ravel()
+        norma = np.linalg.norm(q)
+        if norma == 0: return np.ones(len(self), dtype=np.float32)
+        return 1.0 - self.matriz @ (q / norma)
+
+    def buscar(self, embedding, top_k=1):
+        """Devuelve [(nombre, distancia), ...] con la mejor distancia de cada persona, ordenado."""
+        if len(self) == 0: return []
+        por_persona = np.minimum.reduceat(self.distancias(embedding), self.inicios)
+        k = min(top_k, len(por_persona))
+        if k < len(por_persona):
+            mejores = np.argpartition(por_persona, k - 1)[:k]
+        else:
+            mejores = np.arange(len(por_persona))
+        mejores = mejores[np.argsort(por_persona[mejores])]
+        return [(self.nombres[i], float(por_persona[i])) for i in mejores]
 
 class FaceBrain:
+    DEFAULT_MODEL = "ArcFace"
+
     def __init__(self, output_dir, log_callback=None, progress_callback=None):
         self.output_dir = output_dir
         self.known_embeddings = {} 
+        self.indice = IndiceEmbeddings({})
         self.log_callback = log_callback
         self.progress_callback = progress_callback 
         self.is_loading = False
-        self.model_name = "ArcFace"
+        self.model_name = self.DEFAULT_MODEL
         self.detector_backend = "retinaface" 
         self.threshold = 0.65 
+        self.max_referencias = 5
+        self.batch_size = 32
 
     def log(self, msg):
         if self.log_callback: 
@@ -39,78 +272,237 @@ class FaceBrain:
             return
 
         # Contar Personas (Carpetas)
-        personas = [p for p in os.listdir(self.output_dir) if os.path.isdir(os.path.join(self.output_dir, p))]
+        personas = [p for p in os.listdir(self.output_dir) 
+                    if not p.startswith('.') and os.path.isdir(os.path.join(self.output_dir, p))]
         total_personas = len(personas)
         
-        # Empezamos el proceso lineal
-        for i, person_name in enumerate(personas):
-            if self.progress_callback: 
-                self.progress_callback(i, total_personas, f"Aprendiendo: {person_name}")
-
+        # Embeddings ya calculados en sesiones anteriores
+        store = EmbeddingStore(self.output_dir, self.model_name, self.detector_backend).load()
+        vigentes = set()
+        reutilizados = 0
+        
+        # Primero lo que ya está en el almacén; lo nuevo se calcula por lotes
+        sin_calcular = {}
+        for person_name in personas:
             person_dir = os.path.join(self.output_dir, person_name)
             self.known_embeddings[person_name] = []
+            sin_calcular[person_name] = []
+            
+            imagenes = [img_name for img_name in os.listdir(person_dir) 
+                        if img_name.lower().endswith(('.jpg', '.png', '.jpeg'))]
+            vigentes.update(os.path.join(person_name, img_name) for img_name in imagenes)
+            
+            for img_name in imagenes:
+                img_path = os.path.join(person_dir, img_name)
+                encontrado, embedding = store.get(img_path)
+                if not encontrado:
+                    sin_calcular[person_name].append(img_path)
+                elif embedding is not None and len(self.known_embeddings[person_name]) < self.max_referencias:
+                    self.known_embeddings[person_name].append(embedding)
+                    reutilizados += 1
+        
+        # Rondas: se piden a cada persona tantas imágenes como le falten; si alguna
+        # falla (sin rostro) la siguiente ronda toma otras de la misma persona
+        while True:
+            lote = []
+            for person_name in personas:
+                faltan = self.max_referencias - len(self.known_embeddings[person_name])
+                tomar = sin_calcular[person_name][:max(0, faltan)]
+                del sin_calcular[person_name][:len(tomar)]
+                lote.extend((person_name, img_path) for img_path in tomar)
+            if not lote: break
             
-            images_loaded = 0
-            # Cargar imágenes de esta persona
-            for img_name in os.listdir(person_dir):
-                if img_name.lower().endswith(('.jpg', '.png', '.jpeg')):
-                    img_path = os.path.join(person_dir, img_name)
-                    try:
-                        embedding_objs = DeepFace.represent(
-                            img_path=img_path,
-                            model_name=self.model_name,
-                            enforce_detection=True,
-                            detector_backend=self.detector_backend
-                        )
-                        embedding = embedding_objs[0]["embedding"]
-                        self.known_embeddings[person_name].append(embedding)
-                        images_loaded += 1
-                    except Exception:
-                        pass
-                    if images_loaded >= 5: break
+            def progreso(hechos, total):
+                if self.progress_callback:
+                    persona = lote[min(hechos, total) - 1][0]
+                    self.progress_callback(min(hechos, total - 1), total, f"Aprendiendo: {persona}")
             
-            if images_loaded > 0:
+            resultados = self.represent_batch([img_path for _, img_path in lote], progress_callback=progreso)
+            fallidos = 0
+            for (person_name, img_path), resultado in zip(lote, resultados):
+                store.put(img_path, resultado["embedding"])
+                if resultado["embedding"] is not None:
+                    self.known_embeddings[person_name].append(resultado["embedding"])
+                else:
+                    fallidos += 1
+            if fallidos:
+                self.log(f"IA: {fallidos} de {len(lote)} imágenes sin rostro utilizable")
+        
+        for person_name in personas:
+            if self.known_embeddings[person_name]:
                 self.log(f"IA: Aprendido -> {person_name}")
             
+        # Quitar imágenes y carpetas que ya no existen
+        store.prune(vigentes)
+        store.save()
+        
+        self.indice = IndiceEmbeddings(self.known_embeddings)
+            
         self.is_loading = False
-        self.log(f"IA: Carga Finalizada. {total_personas} personas listas.")
+        self.log(f"IA: Carga Finalizada. {total_personas} personas listas ({reutilizados} embeddings reutilizados).")
         
         # Forzar 100% al final
         if self.progress_callback: self.progress_callback(total_personas, total_personas, "IA Activa")
 
-    def find_cosine_distance(self, source_representation, test_representation):
-        a = np.matmul(np.transpose(source_representation), test_representation)
-        b = np.sum(np.multiply(source_representation, source_representation))
-        c = np.sum(np.multiply(test_representation, test_representation))
-        return 1 - (a / (np.sqrt(b) * np.sqrt(c)))
+    def represent_batch(self, paths_or_arrays, progress_callback=None):
+        """Embeddings por lotes con el modelo y detector de este FaceBrain (ver `represent_batch`)"""
+        return represent_batch(paths_or_arrays, self.model_name, self.detector_backend,
+                               batch_size=self.batch_size, enforce_detection=True,
+                               progress_callback=progress_callback)
+
+    def _embedding(self, image_path):
+        # Mismo camino que las referencias (represent_batch), también para una sola imagen
+        return self.represent_batch([image_path])[0]["embedding"]
+
+    def candidatos(self, image_path, top_k=5):
+        """Las `top_k` personas más parecidas como [(nombre, distancia), ...], o None si no hay rostro."""
+        target_embedding = self._embedding(image_path)
+        if target_embedding is None: return None
+        return self.indice.buscar(target_embedding, top_k)
 
     def sugerir_persona(self, image_path):
         if self.is_loading: return "Cargando Motor..."
-        if not self.known_embeddings: return "Sin Referencias"
+        if not len(self.indice): return "Sin Referencias"
+        return self._formatear(self.candidatos(image_path, top_k=1))
 
-        try:
-            target_objs = DeepFace.represent(
-                img_path=image_path,
-                model_name=self.model_name,
-                enforce_detection=True,
-                detector_backend=self.detector_backend
-            )
-            target_embedding = target_objs[0]["embedding"]
-        except:
-            return "Rostro no visible"
+    def sugerir_lote(self, items, progress_callback=None):
+        """`sugerir_persona` para varias imágenes (rutas o arrays BGR) con una pasada del modelo por lote."""
+        if self.is_loading: return ["Cargando Motor..."] * len(items)
+        if not len(self.indice): return ["Sin Referencias"] * len(items)
+        resultados = self.represent_batch(items, progress_callback=progress_callback)
+        return [self._formatear(None if r["embedding"] is None else self.indice.buscar(r["embedding"], 1))
+                for r in resultados]
 
-        best_match = None
-        min_distance = float('inf')
+    def _formatear(self, resultado):
+        if resultado is None:
+            return "Rostro no visible"
 
-        for name, embeddings_list in self.known_embeddings.items():
-            for ref_embedding in embeddings_list:
-                distance = self.find_cosine_distance(target_embedding, ref_embedding)
-                if distance < min_distance:
-                    min_distance = distance
-                    best_match = name
+        best_match, min_distance = resultado[0]
 
         if min_distance < self.threshold:
             confianza = round((1 - min_distance) * 100, 1)
             return f"{best_match} ({confianza}%)"
         else:
-            return f"Desconocido"
\ No newline at end of file
+            return f"Desconocido"
+
+
+def leer_fotograma(video_path, posicion=0.15):
+    """Fotograma BGR a `posicion` (fracción de la duración) de un video, o None si no se puede leer."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    try:
+        length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if length > 10: cap.set(cv2.CAP_PROP_POS_FRAMES, int(length * posicion))
+        ret, frame = cap.read()
+        return frame if ret else None
+    finally:
+        cap.release()
+
+
+# Resultado de un archivo cuyo lote falló en el modelo
+SUGERENCIA_ERROR = "Error al analizar"
+
+
+# Sugerencias de un FaceBrain para toda la cola, en un hilo; `al_listo(ruta, sugerencia)` se llama desde ese hilo
+class ColaSugerencias:
+    def __init__(self, brain, al_listo=None, lote=4, formatos_video=('.mp4', '.avi', '.mov', '.mkv')):
+        self.brain = brain
+        self.al_listo = al_listo
+        self.lote = lote
+        self.formatos_video = formatos_video
+        self.resultados = {}  # ruta -> (firma, sugerencia)
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.actual = None
+        self.pendientes = []
+        self.activo = True
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    def resultado(self, ruta):
+        """Sugerencia ya calculada y vigente para `ruta`, o None."""
+        try:
+            firma = firma_archivo(ruta)
+        except OSError:
+            return None
+        with self.lock:
+            entrada = self.resultados.get(ruta)
+        return entrada[1] if entrada and entrada[0] == firma else None
+
+    def pedir(self, actual, siguientes=()):
+        """Pone `actual` al frente y `siguientes` (en orden) detrás; descarta lo pedido antes."""
+        with self.cond:
+            self.actual = actual
+            self.pendientes = list(siguientes)
+            self.cond.notify()
+
+    def invalidar(self, ruta):
+        with self.lock:
+            self.resultados.pop(ruta, None)
+
+    def limpiar(self):
+        """Olvida todas las sugerencias (al recargar las referencias o cambiar las carpetas de destino)."""
+        with self.lock:
+            self.resultados.clear()
+
+    def detener(self):
+        with self.cond:
+            self.activo = False
+            self.cond.notify()
+
+    def _siguiente_tanda(self):
+        """Rutas a calcular: el actual si falta, o hasta `lote` de la cola. Con el lock tomado."""
+        while self.activo:
+            if not self.brain.is_loading:
+                if self.actual is not None:
+                    ruta, self.actual = self.actual, None
+                    return [ruta]
+                if self.pendientes:
+                    tanda, self.pendientes = self.pendientes[:self.lote], self.pendientes[self.lote:]
+                    return tanda
+                self.cond.wait()
+            else:
+                # Mientras se cargan las referencias no hay nada que sugerir
+                self.cond.wait(0.5)
+        return None
+
+    def _preparar(self, ruta):
+        """(firma, imagen para el modelo) o None si ya está calculada. imagen es None si no se pudo leer."""
+        try:
+            firma = firma_archivo(ruta)
+        except OSError:
+            return None
+        with self.lock:
+            entrada = self.resultados.get(ruta)
+        if entrada and entrada[0] == firma:
+            return None
+        if ruta.lower().endswith(self.formatos_video):
+            # El fotograma va en memoria al modelo, sin escribir un JPEG temporal
+            try:
+                return firma, leer_fotograma(ruta)
+            except Exception:
+                return firma, None
+        return firma, ruta
+
+    def _trabajar(self):
+        while True:
+            with self.cond:
+                tanda = self._siguiente_tanda()
+            if tanda is None: return
+            preparadas = [(ruta, p) for ruta, p in ((ruta, self._preparar(ruta)) for ruta in tanda) if p]
+            legibles = [imagen for _, (_, imagen) in preparadas if imagen is not None]
+            try:
+                sugerencias = iter(self.brain.sugerir_lote(legibles)) if legibles else iter(())
+            except Exception as e:
+                self.brain.log(f"IA: Error calculando sugerencias: {e}")
+                # Cada archivo de la tanda recibe el error: la interfaz no se queda en "Analizando..."
+                sugerencias = iter([SUGERENCIA_ERROR] * len(legibles))
+            for ruta, (firma, imagen) in preparadas:
+                sugerencia = "Rostro no visible" if imagen is None else next(sugerencias)
+                # El estado del motor (o un fallo del lote) no es una sugerencia del archivo:
+                # se avisa pero no se guarda, así que se vuelve a intentar la próxima vez que se pida
+                if sugerencia not in ("Cargando Motor...", "Sin Referencias", SUGERENCIA_ERROR):
+                    with self.lock:
+                        self.resultados[ruta] = (firma, sugerencia)
+                if self.al_listo:
+                    self.al_listo(ruta, sugerencia)
@@ -0,0 +1,135 @@
+import time
+import queue
+import threading
+from collections import deque
+
+# Veces por segundo que se refresca la interfaz, sin importar cuántos avisos lleguen
+FRECUENCIA_UI = 10
+# Segundos de historia para calcular la velocidad (archivos/s) y la ETA
+VENTANA_VELOCIDAD = 5.0
+
+
+def formato_duracion(segundos):
+    if segundos is None:
+        return "--:--"
+    segundos = int(segundos)
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos}:{segundos:02d}"
+
+
+def texto_progreso(actual, total, mensaje="", velocidad=None, eta=None):
+    """'mensaje (45%) · 120.0/s · ETA 0:12', omitiendo lo que no se sepa todavía."""
+    partes = [mensaje] if mensaje else []
+    if total:
+        partes.append(f"({int(actual / total * 100)}%)")
+    texto = " ".join(partes)
+    if velocidad:
+        texto += f" · {velocidad:.1f}/s · ETA {formato_duracion(eta)}"
+    return texto
+
+
+class ReporteProgreso:
+    """Junta el progreso y el log de un hilo de trabajo y los entrega al hilo de Tk.
+
+    El hilo de trabajo solo guarda el último progreso y encola líneas de log
+    (nunca espera a la interfaz). Un `after()` en el hilo de Tk vacía la cola a
+    `frecuencia` Hz: inserta todas las líneas pendientes de una vez y entrega el
+    progreso más reciente con su velocidad y ETA. `en_ui` encola una función que
+    se ejecuta en el hilo de Tk después de lo ya encolado (p. ej. al terminar).
+    """
+    def __init__(self, widget, on_progress=None, on_log=None, frecuencia=FRECUENCIA_UI):
+        self.widget = widget
+        self.on_progress = on_progress
+        self.on_log = on_log
+        self.intervalo = max(1, int(1000 / frecuencia))
+        self.cola = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.ultimo = (0, 0, "")
+        self.pendiente = False
+        self.muestras = deque()
+        self.activo = False
+
+    # --- Desde cualquier hilo ---
+
+    def log(self, mensaje):
+        self.cola.put(("log", mensaje))
+
+    def progreso(self, actual, total, mensaje=None):
+        with self.lock:
+            self.ultimo = (actual, total, self.ultimo[2] if mensaje is None else mensaje)
+            self.pendiente = True
+
+    def estado(self, mensaje):
+        """Cambia solo el texto de estado, conservando el último progreso."""
+        with self.lock:
+            self.ultimo = (self.ultimo[0], self.ultimo[1], mensaje)
+            self.pendiente = True
+
+    def en_ui(self, funcion):
+        self.cola.put(("ui", funcion))
+
+    # --- En el hilo de Tk ---
+
+    def iniciar(self):
+        if not self.activo:
+            self.activo = True
+            self.muestras.clear()
+            self.widget.after(self.intervalo, self._drenar)
+        return self
+
+    def detener(self):
+        """Entrega lo pendiente y deja de refrescar."""
+        self.activo = False
+        self._vaciar()
+
+    def _velocidad(self, actual, total):
+        ahora = time.monotonic()
+        if self.muestras and (actual < self.muestras[-1][1] or total != self.muestras[-1][2]):
+            # Empezó otra fase (otro total o el contador volvió atrás)
+            self.muestras.clear()
+        self.muestras.append((ahora, actual, total))
+        while len(self.muestras) > 2 and ahora - self.muestras[0][0] > VENTANA_VELOCIDAD:
+            self.muestras.popleft()
+        t0, a0, _ = self.muestras[0]
+        if ahora - t0 < 0.5 or actual <= a0:
+            return None, None
+        velocidad = (actual - a0) / (ahora - t0)
+        return velocidad, max(0, total - actual) / velocidad
+
+    def _vaciar(self):
+        # El progreso va primero: una función encolada al terminar debe poder pisarlo
+        with self.lock:
+            ultimo = self.ultimo if self.pendiente else None
+            self.pendiente = False
+        if ultimo and self.on_progress:
+            actual, total, mensaje = ultimo
+            velocidad, eta = self._velocidad(actual, total)
+            self.on_progress(actual, total, mensaje, velocidad, eta)
+
+        lineas = []
+        while True:
+            try:
+                tipo, valor = self.cola.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "log":
+                lineas.append(valor)
+            else:
+                # Respetar el orden: primero el log acumulado, luego la función
+                if lineas and self.on_log: self.on_log("\n".join(lineas))
+                lineas = []
+                valor()
+        if lineas and self.on_log:
+            self.on_log("\n".join(lineas))
+
+    def _drenar(self):
+        # La ventana se cerró (p. ej. el diálogo de herramientas): dejar de refrescar
+        if not self.widget.winfo_exists():
+            self.activo = False
+            return
+        try:
+            self._vaciar()
+        finally:
+            if self.activo:
+                self.widget.after(self.intervalo, self._drenar)
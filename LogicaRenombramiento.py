@@ -1,11 +1,333 @@
 import os
+import json
+import uuid
 import hashlib
 import stat
+import threading
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from LogicaDiario import diario_por_defecto
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Bytes leídos del inicio y del final de cada archivo en la fase de hash parcial
+BLOQUE_PARCIAL = 64 * 1024
+# Buffer reutilizable por hilo para las lecturas con readinto
+TAMANO_BUFFER = 1024 * 1024
+# Digest rápido (no criptográfico si xxhash está instalado) para detectar duplicados
+ALGORITMO_RAPIDO = "xxh3_128" if xxhash else "blake2b"
+# Qué copia conservar en la deduplicación global: la de la carpeta con más
+# prioridad (orden en que se pasan), la más antigua, la más reciente o la de ruta más corta
+POLITICAS_CONSERVAR = ("prioridad", "antiguo", "reciente", "ruta_corta")
+# Diario del renombrado en curso; si queda en la carpeta, el último renombrado se interrumpió
+DIARIO_RENOMBRADO = ".renombrado.journal"
+
+_buffers = threading.local()
+
+def _buffer():
+    view = getattr(_buffers, "view", None)
+    if view is None:
+        view = _buffers.view = memoryview(bytearray(TAMANO_BUFFER))
+    return view
+
+def nuevo_hash(algoritmo):
+    if algoritmo.startswith("xxh"):
+        return getattr(xxhash, algoritmo)()
+    if algoritmo == "blake2b":
+        return hashlib.blake2b(digest_size=16)
+    return hashlib.new(algoritmo)
+
+def _leer_en(f, h, view, limite=None):
+    """Pasa el contenido de `f` por el hash `h` usando `view` como buffer. Devuelve los bytes leídos."""
+    leidos = 0
+    while limite is None or leidos < limite:
+        destino = view if limite is None else view[:min(len(view), limite - leidos)]
+        n = f.readinto(destino)
+        if not n: break
+        h.update(destino[:n])
+        leidos += n
+    return leidos
+
+def hash_archivo(filepath, algoritmo="md5"):
+    """Hash del archivo completo con un buffer grande reutilizable. Lanza OSError si no se puede leer."""
+    h = nuevo_hash(algoritmo)
+    with open(filepath, "rb", buffering=0) as f:
+        _leer_en(f, h, _buffer())
+    return h.hexdigest()
+
+def hash_parcial(filepath, size, algoritmo="md5"):
+    """Hash del primer y último bloque. Si el archivo cabe en ellos, equivale al hash completo."""
+    h = nuevo_hash(algoritmo)
+    view = _buffer()
+    with open(filepath, "rb", buffering=0) as f:
+        if size > 2 * BLOQUE_PARCIAL:
+            _leer_en(f, h, view, BLOQUE_PARCIAL)
+            f.seek(-BLOQUE_PARCIAL, os.SEEK_END)
+            _leer_en(f, h, view, BLOQUE_PARCIAL)
+        else:
+            _leer_en(f, h, view)
+    return h.hexdigest()
+
+def hash_archivos(rutas, funcion, max_workers=4, progress_callback=None):
+    """Aplica `funcion(ruta)` a varios archivos en un pool de hilos (hashlib libera el GIL
+    en bloques grandes). Devuelve {ruta: hash}, con None para los que no se pudieron leer."""
+    def seguro(ruta):
+        try: return funcion(ruta)
+        except Exception: return None
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i, (ruta, h) in enumerate(zip(rutas, pool.map(seguro, rutas)), 1):
+            resultados[ruta] = h
+            if progress_callback: progress_callback(i, len(rutas), ruta)
+    return resultados
+
+def formato_bytes(n):
+    for unidad in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unidad == "GB": break
+        n /= 1024
+    return f"{n:.1f} {unidad}" if unidad != "B" else f"{int(n)} B"
+
+def planificar_renombrado(nombres, base):
+    """Nombre final de cada archivo: base, base1, base2... en el orden de `nombres`.
+
+    Devuelve {nombre_actual: nombre_final} solo con los que cambian; los que ya
+    tienen su nombre no se tocan.
+    """
+    plan = {}
+    for i, nombre in enumerate(nombres):
+        _, ext = os.path.splitext(nombre)
+        destino = f"{base}{'' if i == 0 else i}{ext}"
+        if destino != nombre:
+            plan[nombre] = destino
+    return plan
+
+# Plan -> [(origen, destino)] ejecutable en orden: las cadenas sin temporales, cada ciclo con un solo salto temporal
+def ordenar_renombrados(plan):
+    pendientes = dict(plan)
+    quien_quiere = {destino: origen for origen, destino in plan.items()}
+    operaciones = []
+    listos = sorted((o for o, d in plan.items() if d not in plan), reverse=True)
+
+    def drenar():
+        while listos:
+            origen = listos.pop()
+            operaciones.append((origen, pendientes.pop(origen)))
+            # El nombre que acaba de quedar libre desbloquea a quien lo quería
+            siguiente = quien_quiere.get(origen)
+            if siguiente in pendientes: listos.append(siguiente)
+
+    drenar()
+    token = uuid.uuid4().hex[:8]
+    while pendientes:
+        # Solo quedan ciclos: se aparta uno de sus archivos y se deshace la cadena
+        origen = min(pendientes)
+        destino = pendientes.pop(origen)
+        temporal = f".renombrando_{token}_{len(operaciones)}{os.path.splitext(origen)[1]}"
+        operaciones.append((origen, temporal))
+        listos.append(quien_quiere[origen])
+        drenar()
+        operaciones.append((temporal, destino))
+    return operaciones
+
+def ejecutar_renombrados(carpeta, operaciones, progress_callback=None, lote=64):
+    """Ejecuta los renombrados dentro de `carpeta` dejando un diario por si se interrumpe.
+
+    El diario guarda el plan y el inode de cada archivo antes de tocar nada (con
+    fsync); el avance se anota y se sincroniza cada `lote` operaciones. Si algo
+    falla se vuelve a los nombres originales. Devuelve las operaciones hechas.
+    """
+    if not operaciones:
+        return 0
+    ruta_diario = os.path.join(carpeta, DIARIO_RENOMBRADO)
+    inodos = {}
+    for nombre in {n for op in operaciones for n in op}:
+        try: inodos[nombre] = os.stat(os.path.join(carpeta, nombre)).st_ino
+        except OSError: pass
+    hechos = 0
+    with open(ruta_diario, "w", encoding="utf-8") as diario:
+        diario.write(json.dumps({"operaciones": operaciones, "inodos": inodos}, ensure_ascii=False) + "\n")
+        diario.flush(); os.fsync(diario.fileno())
+        try:
+            for i, (origen, destino) in enumerate(operaciones):
+                ruta_origen, ruta_destino = os.path.join(carpeta, origen), os.path.join(carpeta, destino)
+                # os.rename sobrescribe en silencio en POSIX; solo se permite si es el mismo archivo (cambio de mayúsculas)
+                if os.path.exists(ruta_destino) and not os.path.samefile(ruta_origen, ruta_destino):
+                    raise FileExistsError(f"El destino ya existe: {destino}")
+                os.rename(ruta_origen, ruta_destino)
+                hechos += 1
+                diario.write(f'{{"hecho": {i}}}\n')
+                if hechos % lote == 0:
+                    diario.flush(); os.fsync(diario.fileno())
+                if progress_callback: progress_callback(hechos, len(operaciones))
+        except Exception:
+            diario.close()
+            recuperar_renombrado(carpeta, adelante=False)
+            raise
+    os.remove(ruta_diario)
+    return hechos
+
+# Completa (o deshace) un renombrado interrumpido. None: nada que recuperar, True: recuperado, False: no coincide con el diario
+def recuperar_renombrado(carpeta, adelante=True, log_callback=None):
+    log = log_callback or print
+    ruta_diario = os.path.join(carpeta, DIARIO_RENOMBRADO)
+    if not os.path.exists(ruta_diario):
+        return None
+    with open(ruta_diario, "r", encoding="utf-8") as diario:
+        lineas = diario.read().splitlines()
+    try:
+        cabecera = json.loads(lineas[0])
+    except (IndexError, ValueError):
+        # La cabecera se sincroniza antes del primer renombrado: no se llegó a tocar nada
+        os.remove(ruta_diario)
+        return True
+    operaciones = [tuple(op) for op in cabecera["operaciones"]]
+    anotados = 0
+    for linea in lineas[1:]:
+        try: anotados = max(anotados, json.loads(linea)["hecho"] + 1)
+        except (ValueError, KeyError): break
+
+    nombres = {n for op in operaciones for n in op}
+    actual = {}
+    for nombre in nombres:
+        try: actual[nombre] = os.stat(os.path.join(carpeta, nombre)).st_ino
+        except OSError: pass
+    estado, corte = dict(cabecera["inodos"]), None
+    for k in range(len(operaciones) + 1):
+        if k >= anotados and estado == actual:
+            corte = k
+            break
+        if k < len(operaciones):
+            origen, destino = operaciones[k]
+            if origen in estado: estado[destino] = estado.pop(origen)
+    if corte is None:
+        log(f"No se pudo recuperar el renombrado de {carpeta}: los archivos no coinciden con el diario")
+        return False
+
+    if adelante:
+        pendientes = operaciones[corte:]
+    else:
+        pendientes = [(destino, origen) for origen, destino in reversed(operaciones[:corte])]
+    for origen, destino in pendientes:
+        os.rename(os.path.join(carpeta, origen), os.path.join(carpeta, destino))
+    os.remove(ruta_diario)
+    log(f"Renombrado interrumpido {'completado' if adelante else 'deshecho'} en {os.path.basename(carpeta)} "
+        f"({corte}/{len(operaciones)} operaciones ya hechas)")
+    return True
+
+class HashCache:
+    """Caché persistente de hashes (SQLite) para una biblioteca.
+
+    Cada fila guarda el hash de un archivo para un `tipo` (algoritmo + fase) junto
+    con dispositivo, inode, tamaño y mtime_ns. Si el archivo no ha cambiado el
+    hash se reutiliza sin leerlo; si solo cambió de nombre (mismo inode, tamaño y
+    mtime, como tras un renombrado) también se reutiliza y se actualiza la ruta.
+    """
+    NOMBRE = ".hashes.sqlite3"
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                ruta TEXT, tipo TEXT, carpeta TEXT, dev INTEGER, inode INTEGER,
+                size INTEGER, mtime_ns INTEGER, hash TEXT, PRIMARY KEY (ruta, tipo))""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_inode ON hashes (inode, size, mtime_ns)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_carpeta ON hashes (carpeta)")
+            self.conn.commit()
+
+    @classmethod
+    def para_biblioteca(cls, carpeta):
+        return cls(os.path.join(carpeta, cls.NOMBRE))
+
+    def get(self, ruta, tipo, st):
+        ruta = os.path.abspath(ruta)
+        with self.lock:
+            fila = self.conn.execute(
+                "SELECT hash, dev, inode, size, mtime_ns FROM hashes WHERE ruta = ? AND tipo = ?",
+                (ruta, tipo)).fetchone()
+            if fila and fila[1:] == (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns):
+                return fila[0]
+            # Mismo archivo con otro nombre (renombrado o movido dentro del disco)
+            fila = self.conn.execute(
+                "SELECT hash, ruta FROM hashes WHERE inode = ? AND size = ? AND mtime_ns = ? AND dev = ? AND tipo = ?",
+                (st.st_ino, st.st_size, st.st_mtime_ns, st.st_dev, tipo)).fetchone()
+            if fila and st.st_ino:
+                self.conn.execute("UPDATE OR REPLACE hashes SET ruta = ?, carpeta = ? WHERE ruta = ? AND tipo = ?",
+                                  (ruta, os.path.dirname(ruta), fila[1], tipo))
+                return fila[0]
+        return None
+
+    def put(self, ruta, tipo, st, valor):
+        ruta = os.path.abspath(ruta)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (ruta, tipo, os.path.dirname(ruta), st.st_dev, st.st_ino,
+                               st.st_size, st.st_mtime_ns, valor))
+
+    def podar(self, carpeta, vigentes):
+        """Sincroniza las filas de `carpeta` con los archivos `vigentes`.
+
+        Las filas de archivos renombrados (mismo inode, tamaño y mtime) pasan a la
+        ruta nueva; las demás que ya no existen se borran. Devuelve cuántas se borraron.
+        """
+        carpeta = os.path.abspath(carpeta)
+        actuales = {}
+        for ruta in vigentes:
+            try:
+                st = os.stat(ruta)
+            except OSError:
+                continue
+            actuales[(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)] = os.path.abspath(ruta)
+        rutas_actuales = set(actuales.values())
+        borradas = 0
+        with self.lock:
+            filas = self.conn.execute(
+                "SELECT ruta, tipo, dev, inode, size, mtime_ns FROM hashes WHERE carpeta = ?", (carpeta,)).fetchall()
+            for ruta, tipo, *firma in filas:
+                if ruta in rutas_actuales: continue
+                nueva = actuales.get(tuple(firma))
+                if nueva:
+                    self.conn.execute("UPDATE OR REPLACE hashes SET ruta = ? WHERE ruta = ? AND tipo = ?", (nueva, ruta, tipo))
+                else:
+                    self.conn.execute("DELETE FROM hashes WHERE ruta = ? AND tipo = ?", (ruta, tipo))
+                    borradas += 1
+        return borradas
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
 
 class RenamerTool:
-    def __init__(self, log_callback=None, progress_callback=None):
+    def __init__(self, log_callback=None, progress_callback=None, algoritmo=ALGORITMO_RAPIDO, max_workers=4, diario=None):
         self.log_callback = log_callback
         self.progress_callback = progress_callback
+        # Solo se usa para comparar archivos entre sí, así que no necesita ser criptográfico
+        self.algoritmo = algoritmo
+        self.max_workers = max_workers
+        self.cache = None
+        # Borrados y renombrados quedan anotados para poder deshacerlos
+        self.diario = diario or diario_por_defecto()
+
+    def usar_cache(self, carpeta_biblioteca):
+        """Activa la caché de hashes persistente de la biblioteca (o la desactiva con None)."""
+        if self.cache: self.cache.close()
+        self.cache = None
+        if carpeta_biblioteca:
+            try:
+                self.cache = HashCache.para_biblioteca(carpeta_biblioteca)
+            except Exception as e:
+                self.log(f"Caché de hashes no disponible: {e}")
 
     def log(self, message):
         if self.log_callback:
@@ -13,16 +335,158 @@ class RenamerTool:
         else:
             print(message)
 
+    def _hash_cacheado(self, filepath, tipo, calcular):
+        """Devuelve (hash, leido); leido=False si salió de la caché sin tocar el contenido."""
+        if not self.cache:
+            return calcular(), True
+        st = os.stat(filepath)
+        h = self.cache.get(filepath, tipo, st)
+        if h is not None:
+            return h, False
+        h = calcular()
+        self.cache.put(filepath, tipo, st, h)
+        return h, True
+
+    def _hash_completo(self, filepath):
+        return self._hash_cacheado(filepath, f"{self.algoritmo}:completo",
+                                   lambda: hash_archivo(filepath, self.algoritmo))
+
+    def _hash_parcial(self, filepath, size):
+        return self._hash_cacheado(filepath, f"{self.algoritmo}:parcial",
+                                   lambda: hash_parcial(filepath, size, self.algoritmo))
+
     def hash_archivo(self, filepath):
-        hash_md5 = hashlib.md5()
         try:
-            with open(filepath, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            return self._hash_completo(filepath)[0]
         except Exception:
             return None
 
+    def hash_parcial(self, filepath, size):
+        try:
+            return self._hash_parcial(filepath, size)[0]
+        except Exception:
+            return None
+
+    def buscar_duplicados(self, rutas, progress_callback=None):
+        """Busca archivos idénticos por fases: tamaño -> hash parcial -> hash completo.
+
+        Solo se lee lo necesario: un tamaño único no puede tener duplicado, y el
+        hash completo solo se calcula para archivos que siguen coincidiendo tras
+        el parcial. Devuelve (grupos, estadisticas); cada grupo respeta el orden
+        de `rutas`, así que el primero es el que se conserva.
+        """
+        stats = {"archivos": 0, "bytes_totales": 0, "bytes_parcial": 0, "bytes_completo": 0, "en_cache": 0}
+
+        # Fase 1: tamaño (solo metadatos)
+        por_tamano = {}
+        for ruta in rutas:
+            try: size = os.path.getsize(ruta)
+            except OSError: continue
+            por_tamano.setdefault(size, []).append(ruta)
+            stats["archivos"] += 1
+            stats["bytes_totales"] += size
+        candidatos = [(size, grupo) for size, grupo in por_tamano.items() if len(grupo) > 1]
+
+        # Fase 2: inicio + final de los archivos con el mismo tamaño (en paralelo)
+        tamanos = {ruta: size for size, grupo in candidatos for ruta in grupo}
+        parciales = hash_archivos(list(tamanos), lambda ruta: self._hash_parcial(ruta, tamanos[ruta]),
+                                  self.max_workers, progress_callback)
+        colisiones = []
+        for size, grupo in candidatos:
+            por_parcial = {}
+            for ruta in grupo:
+                if parciales[ruta] is None: continue
+                h, leido = parciales[ruta]
+                if leido: stats["bytes_parcial"] += min(size, 2 * BLOQUE_PARCIAL)
+                else: stats["en_cache"] += 1
+                por_parcial.setdefault(h, []).append(ruta)
+            colisiones.extend((size, g) for g in por_parcial.values() if len(g) > 1)
+
+        # Fase 3: hash completo solo si el parcial no cubrió todo el archivo
+        grupos = [g for size, g in colisiones if size <= 2 * BLOQUE_PARCIAL]
+        pendientes = [(size, g) for size, g in colisiones if size > 2 * BLOQUE_PARCIAL]
+        completos = hash_archivos([ruta for _, g in pendientes for ruta in g], self._hash_completo, self.max_workers)
+        for size, grupo in pendientes:
+            por_hash = {}
+            for ruta in grupo:
+                if completos[ruta] is None: continue
+                h, leido = completos[ruta]
+                if leido: stats["bytes_completo"] += size
+                else: stats["en_cache"] += 1
+                por_hash.setdefault(h, []).append(ruta)
+            grupos.extend(g for g in por_hash.values() if len(g) > 1)
+        if self.cache: self.cache.commit()
+
+        orden = {ruta: i for i, ruta in enumerate(rutas)}
+        grupos = sorted((sorted(g, key=orden.get) for g in grupos), key=lambda g: orden[g[0]])
+        return grupos, stats
+
+    def listar_archivos(self, carpeta):
+        try:
+            nombres = sorted(os.listdir(carpeta))
+        except OSError:
+            return []
+        rutas = (os.path.join(carpeta, f) for f in nombres)
+        return [r for r in rutas if os.path.isfile(r) and not self.es_oculto(r)]
+
+    def duplicados_biblioteca(self, carpetas, politica="prioridad", progress_callback=None):
+        """Un solo índice de contenido para varias carpetas (origen + subcarpetas de personas).
+
+        `carpetas` va de más a menos prioridad. Usa la misma búsqueda por fases
+        que `procesar_carpeta`, así que el coste depende de los bytes que coinciden
+        en tamaño y no del tamaño de la biblioteca. Devuelve (grupos, stats); en
+        cada grupo el primer archivo es el que se conserva según `politica`.
+        """
+        if politica not in POLITICAS_CONSERVAR:
+            raise ValueError(f"Política desconocida: {politica}")
+        rutas, prioridad = [], {}
+        for i, carpeta in enumerate(carpetas):
+            for ruta in self.listar_archivos(carpeta):
+                if ruta not in prioridad:
+                    prioridad[ruta] = i
+                    rutas.append(ruta)
+        grupos, stats = self.buscar_duplicados(rutas, progress_callback=progress_callback)
+        return [self.ordenar_grupo(g, politica, prioridad) for g in grupos], stats
+
+    def ordenar_grupo(self, grupo, politica, prioridad=None):
+        """Pone primero la copia a conservar; el orden original desempata."""
+        orden = {ruta: i for i, ruta in enumerate(grupo)}
+        def mtime(ruta):
+            try: return os.path.getmtime(ruta)
+            except OSError: return 0
+        claves = {
+            "prioridad": lambda r: (prioridad or {}).get(r, 0),
+            "antiguo": mtime,
+            "reciente": lambda r: -mtime(r),
+            "ruta_corta": lambda r: len(r),
+        }
+        return sorted(grupo, key=lambda r: (claves[politica](r), orden[r]))
+
+    def eliminar_duplicados(self, grupos):
+        """Manda a cuarentena todos los archivos de cada grupo menos el primero. Devuelve (eliminados, bytes en cuarentena).
+
+        El espacio no se libera hasta que se purga la cuarentena (`DiarioOperaciones.purgar`).
+        """
+        eliminados, en_cuarentena = 0, 0
+        with self.diario.sesion("Eliminar duplicados de la biblioteca"):
+            for grupo in grupos:
+                for ruta in grupo[1:]:
+                    try:
+                        size = os.path.getsize(ruta)
+                        self.diario.eliminar(ruta)
+                        eliminados += 1
+                        en_cuarentena += size
+                        self.log(f"Eliminado duplicado: {ruta} (se conserva {grupo[0]})")
+                    except Exception as e:
+                        self.log(f"Error borrando: {e}")
+        return eliminados, en_cuarentena
+
+    def log_estadisticas(self, stats):
+        leidos = stats["bytes_parcial"] + stats["bytes_completo"]
+        self.log(f"Bytes leídos: {formato_bytes(leidos)} de {formato_bytes(stats['bytes_totales'])} "
+                 f"(parcial {formato_bytes(stats['bytes_parcial'])}, completo {formato_bytes(stats['bytes_completo'])}, "
+                 f"{stats['en_cache']} hashes desde caché)")
+
     def es_oculto(self, filepath):
         try:
             if os.path.basename(filepath).startswith('.'): return True
@@ -31,10 +495,101 @@ class RenamerTool:
         except: pass
         return False
 
-    def procesar_carpeta(self, folder_path):
+    def listar_arbol(self, raiz, incluir_raiz=True):
+        """Recorre `raiz` con os.scandir y devuelve [(carpeta, n_archivos)] de las carpetas con archivos.
+
+        Se saltan las carpetas ocultas (incluida la cuarentena) y los enlaces
+        simbólicos, para no salir del árbol ni procesar dos veces la misma carpeta.
+        """
+        resultado, pendientes = [], [raiz]
+        while pendientes:
+            carpeta = pendientes.pop()
+            archivos, subcarpetas = 0, []
+            try:
+                with os.scandir(carpeta) as it:
+                    for entrada in it:
+                        if entrada.name.startswith('.'): continue
+                        try:
+                            if entrada.is_dir(follow_symlinks=False): subcarpetas.append(entrada.path)
+                            elif entrada.is_file() and not self.es_oculto(entrada.path): archivos += 1
+                        except OSError:
+                            continue
+            except OSError as e:
+                self.log(f"No se pudo leer {carpeta}: {e}")
+                continue
+            if archivos and (incluir_raiz or carpeta != raiz):
+                resultado.append((carpeta, archivos))
+            pendientes.extend(sorted(subcarpetas, reverse=True))
+        return resultado
+
+    # Varias carpetas en paralelo, en una sola sesión del diario y con el progreso ponderado por archivos
+    def procesar_carpetas(self, carpetas, max_carpetas=3):
+        trabajos = [c if isinstance(c, tuple) else (c, max(1, len(self.listar_archivos(c)))) for c in carpetas]
+        totales = {"carpetas": 0, "eliminados": 0, "renombrados": 0, "errores": 0}
+        if not trabajos:
+            return totales
+        peso_total = sum(n for _, n in trabajos)
+        fracciones = [0.0] * len(trabajos)
+        lock = threading.Lock()
+
+        def avisar(mensaje):
+            if self.progress_callback:
+                hecho = sum(f * n for f, (_, n) in zip(fracciones, trabajos))
+                self.progress_callback(hecho, peso_total, f"{totales['carpetas']}/{len(trabajos)} carpetas · {mensaje}")
+
+        with self.diario.sesion(f"Limpieza de {len(trabajos)} carpetas") as sesion:
+            def trabajo(i):
+                carpeta, _ = trabajos[i]
+                def progreso(hechos, total, mensaje=""):
+                    with lock:
+                        fracciones[i] = min(1.0, hechos / total) if total else 1.0
+                        avisar(f"{os.path.basename(carpeta)}: {mensaje}" if mensaje else os.path.basename(carpeta))
+                # Los hilos del pool se suman a la sesión de este
+                with self.diario.sesion(existente=sesion):
+                    resultado = self.procesar_carpeta(carpeta, progress_callback=progreso)
+                with lock:
+                    fracciones[i] = 1.0
+                    totales["carpetas"] += 1
+                    totales["eliminados"] += resultado["eliminados"]
+                    totales["renombrados"] += resultado["renombrados"]
+                    totales["errores"] += resultado.get("errores", 0)
+                    avisar(f"Terminada {os.path.basename(carpeta)}")
+
+            with ThreadPoolExecutor(max_workers=max(1, max_carpetas)) as pool:
+                futuros = [pool.submit(trabajo, i) for i in range(len(trabajos))]
+                for futuro, (carpeta, _) in zip(futuros, trabajos):
+                    try:
+                        futuro.result()
+                    except Exception as e:
+                        self.log(f"Error procesando {carpeta}: {e}")
+                        totales["errores"] += 1
+        return totales
+
+    def procesar_arbol(self, raiz, incluir_raiz=True, max_carpetas=3):
+        """Limpia `raiz` y todas sus subcarpetas (recursivo); ver `procesar_carpetas`."""
+        carpetas = self.listar_arbol(raiz, incluir_raiz)
+        self.log(f"{len(carpetas)} carpetas con archivos en {raiz}")
+        return self.procesar_carpetas(carpetas, max_carpetas)
+
+    def procesar_carpeta(self, folder_path, progress_callback=None):
+        """Elimina duplicados y renombra una carpeta (sin recorrer subcarpetas).
+
+        `progress_callback` sustituye al de la instancia para esta llamada, lo que
+        permite procesar varias carpetas a la vez con un progreso por carpeta.
+        """
+        with self.diario.sesion(f"Limpieza de {folder_path}"):
+            return self._procesar_carpeta(folder_path, progress_callback or self.progress_callback)
+
+    def _procesar_carpeta(self, folder_path, progress_callback):
         if not os.path.exists(folder_path):
             self.log(f"Error: Carpeta no existe {folder_path}")
-            return
+            return {"eliminados": 0, "renombrados": 0}
+
+        # Terminar un renombrado anterior que se haya interrumpido. Si no se pudo, el diario
+        # queda para revisarlo a mano: un renombrado nuevo lo sobrescribiría
+        if recuperar_renombrado(folder_path, log_callback=self.log) is False:
+            self.log(f"Se omite {folder_path}: revisa {os.path.join(folder_path, DIARIO_RENOMBRADO)}")
+            return {"eliminados": 0, "renombrados": 0, "errores": 1}
 
         # Obtener lista total de archivos para la barra
         all_files = [
@@ -44,74 +599,66 @@ class RenamerTool:
         total_files = len(all_files)
         
         if total_files == 0:
-            if self.progress_callback: self.progress_callback(100, 100)
-            return
+            if progress_callback: progress_callback(100, 100)
+            return {"eliminados": 0, "renombrados": 0}
 
         self.log(f"--- Procesando: {os.path.basename(folder_path)} ---")
         
-        # ELIMINAR DUPLICADOS (Hashing)
+        # ELIMINAR DUPLICADOS (tamaño -> hash parcial -> hash completo)
         files_sorted = sorted(all_files)
-        hashes = {}
         eliminados = 0
         
-        for i, filepath in enumerate(files_sorted):
-            # Actualizar barra (Primera mitad del proceso: 0-50%)
-            if self.progress_callback:
-                self.progress_callback(i, total_files * 2, f"Analizando: {os.path.basename(filepath)}")
-
-            f_hash = self.hash_archivo(filepath)
-            if not f_hash: continue
-            
-            if f_hash in hashes:
+        def progreso(hechos, total, filepath):
+            # Primera mitad del proceso: 0-50%
+            if progress_callback:
+                progress_callback(hechos * total_files / max(total, 1), total_files * 2, f"Analizando: {os.path.basename(filepath)}")
+        
+        grupos, stats = self.buscar_duplicados(files_sorted, progress_callback=progreso)
+        borrados = set()
+        for grupo in grupos:
+            for filepath in grupo[1:]:
                 try:
-                    os.remove(filepath)
+                    self.diario.eliminar(filepath)
+                    borrados.add(filepath)
                     eliminados += 1
                     self.log(f"Eliminado duplicado: {os.path.basename(filepath)}")
                 except Exception as e:
                     self.log(f"Error borrando: {e}")
-            else:
-                hashes[f_hash] = filepath
+        self.log_estadisticas(stats)
 
-        # RENOMBRAR (Secuencial)
-        remaining = sorted([f for f in os.listdir(folder_path) 
-                            if os.path.isfile(os.path.join(folder_path, f)) and not self.es_oculto(os.path.join(folder_path, f))])
-        
-        base_name = os.path.basename(folder_path)
-        temp_map = []
-        
-        # Renombrado temporal
-        for i, filename in enumerate(remaining):
-            # Barra (50-75%)
-            if self.progress_callback:
-                current_step = total_files + (i / 2) # calculo aproximado
-                self.progress_callback(current_step, total_files * 2, "Renombrando (Temp)...")
+        # RENOMBRAR: un solo plan, sin volver a listar la carpeta ni tocar los que ya están bien
+        remaining = [os.path.basename(f) for f in files_sorted if f not in borrados]
+        plan = planificar_renombrado(remaining, os.path.basename(folder_path))
+        operaciones = ordenar_renombrados(plan)
 
-            _, ext = os.path.splitext(filename)
-            old_path = os.path.join(folder_path, filename)
-            temp_path = os.path.join(folder_path, f"__temp_{i}{ext}")
-            try:
-                os.rename(old_path, temp_path)
-                temp_map.append(temp_path)
-            except: pass
+        def progreso_renombrado(hechos, total):
+            # Segunda mitad del proceso: 50-100%
+            if progress_callback:
+                progress_callback(total_files + hechos * total_files / total, total_files * 2, f"Renombrando: {hechos}/{total}")
 
-        # Renombrado final
         renombrados = 0
-        for i, temp_path in enumerate(temp_map):
-            # Barra (75-100%)
-            if self.progress_callback:
-                current_step = total_files + (len(remaining)/2) + (i / 2)
-                self.progress_callback(current_step, total_files * 2, f"Finalizando: {i+1}/{len(temp_map)}")
+        finales = remaining
+        try:
+            if plan:
+                self.diario.renombrar_lote(folder_path, plan, lambda: ejecutar_renombrados(
+                    folder_path, operaciones, progress_callback=progreso_renombrado))
+            renombrados = len(plan)
+            finales = [plan.get(nombre, nombre) for nombre in remaining]
+        except Exception as e:
+            self.log(f"Error renombrando, se restauraron los nombres originales: {e}")
+        if remaining:
+            self.log(f"Renombrados: {renombrados} ({len(remaining) - len(plan)} ya tenían su nombre, "
+                     f"{len(operaciones) - len(plan)} nombres temporales)")
+
+        # Quitar de la caché los archivos de esta carpeta que ya no existen
+        if self.cache:
+            vigentes = [os.path.join(folder_path, f) for f in finales]
+            podadas = self.cache.podar(folder_path, vigentes)
+            self.cache.commit()
+            if podadas: self.log(f"Caché de hashes: {podadas} entradas obsoletas eliminadas")
 
-            _, ext = os.path.splitext(temp_path)
-            counter = "" if i == 0 else str(i)
-            new_name = f"{base_name}{counter}{ext}"
-            new_path = os.path.join(folder_path, new_name)
-            try:
-                os.rename(temp_path, new_path)
-                renombrados += 1
-            except: pass
-            
         self.log(f"Proceso finalizado. Duplicados: {eliminados}, Renombrados: {renombrados}")
         
         # Forzar 100%
-        if self.progress_callback: self.progress_callback(100, 100, "Completado")
\ No newline at end of file
+        if progress_callback: progress_callback(100, 100, "Completado")
+        return {"eliminados": eliminados, "renombrados": renombrados}
\ No newline at end of file
@@ -0,0 +1,440 @@
+import os
+import itertools
+import numpy as np
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+
+# Huellas perceptuales de 64 bits: dos fotos re-guardadas, redimensionadas o
+# recomprimidas quedan a pocos bits de distancia aunque sus bytes no se parezcan.
+TIPOS_HUELLA = ("ahash", "dhash", "phash")
+# Distancia de Hamming máxima (de 64 bits) para considerar dos imágenes la misma
+DISTANCIA_MAXIMA = 8
+# Lado de la imagen reducida sobre la que se calcula la DCT del pHash
+LADO_PHASH = 32
+FORMATOS_IMAGEN = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.webp')
+FORMATOS_VIDEO = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm', '.m4v')
+# Fotogramas por video, repartidos por la duración: la posición relativa es la
+# misma en una copia re-codificada o a otra resolución
+FOTOGRAMAS_VIDEO = 16
+# Fracción de fotogramas alineados que deben coincidir para agrupar dos videos
+FRACCION_VIDEO = 0.6
+# Varianza mínima del gris reducido (0-255): por debajo la imagen es uniforme
+# (en blanco, negra o de un solo color) y su huella no distingue nada
+VARIANZA_MINIMA = 4.0
+
+
+def _matriz_dct(n):
+    """Matriz de la DCT-II ortonormal de tamaño n (D @ x es la DCT de x)."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    d = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    d[0] /= np.sqrt(2)
+    return d.astype(np.float32)
+
+_DCT = _matriz_dct(LADO_PHASH)
+_PESOS = np.uint64(1) << np.arange(63, -1, -1, dtype=np.uint64)
+
+
+def _a_enteros(bits):
+    """(N, 64) booleanos -> N enteros de 64 bits (el primer bit es el más significativo)."""
+    return [int(v) for v in (bits.reshape(len(bits), 64).astype(np.uint64) * _PESOS).sum(axis=1, dtype=np.uint64)]
+
+
+def huellas_lote(grises, tipo="phash"):
+    """Calcula las huellas de un lote de imágenes en escala de grises ya reducidas.
+
+    `grises` es un array (N, alto, ancho) float32: 8x8 para aHash, 8x9 para dHash
+    y 32x32 para pHash. Todo el lote se procesa con operaciones vectorizadas.
+    """
+    if tipo == "ahash":
+        bits = grises > grises.mean(axis=(1, 2), keepdims=True)
+    elif tipo == "dhash":
+        bits = grises[:, :, 1:] > grises[:, :, :-1]
+    elif tipo == "phash":
+        coef = (_DCT @ grises @ _DCT.T)[:, :8, :8].reshape(len(grises), 64)
+        # La mediana sin el término DC, que solo refleja el brillo medio
+        bits = coef > np.median(coef[:, 1:], axis=1, keepdims=True)
+    else:
+        raise ValueError(f"Tipo de huella desconocido: {tipo}")
+    return _a_enteros(bits)
+
+
+def uniformes(grises):
+    """Máscara de las imágenes de un lote (N, alto, ancho) sin contenido que comparar."""
+    return grises.var(axis=(1, 2)) < VARIANZA_MINIMA
+
+
+def tamano_reducido(tipo):
+    """(ancho, alto) de la reducción que necesita cada huella."""
+    return {"ahash": (8, 8), "dhash": (9, 8), "phash": (LADO_PHASH, LADO_PHASH)}[tipo]
+
+
+def cargar_reducida(ruta, tipo="phash"):
+    """Abre una imagen en gris a tamaño de huella. Devuelve (array, (ancho, alto) original)."""
+    ancho, alto = tamano_reducido(tipo)
+    with Image.open(ruta) as img:
+        original = img.size
+        # En JPEG, draft decodifica directamente a 1/2, 1/4 o 1/8 de resolución
+        img.draft("L", (ancho * 4, alto * 4))
+        gris = img.convert("L").resize((ancho, alto), Image.Resampling.BILINEAR)
+        return np.asarray(gris, dtype=np.float32), original
+
+
+def fotogramas_reducidos(ruta, n=FOTOGRAMAS_VIDEO, lado=LADO_PHASH):
+    """Lee `n` fotogramas repartidos uniformemente por el video, en gris y a lado x lado.
+
+    Salta directo a cada posición en lugar de decodificar el video completo. Un
+    fotograma que no se pueda leer repite el anterior para que la secuencia
+    siempre tenga `n` elementos. Devuelve (array (n, lado, lado), (ancho, alto), segundos) o None.
+    """
+    import cv2
+    cap = cv2.VideoCapture(ruta)
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if not cap.isOpened() or total <= 0:
+            return None
+        dims = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        duracion = total / fps if fps > 0 else 0.0
+        paso = total / n
+        grises, anterior = [], None
+        for i in range(n):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(paso * i + paso / 2))
+            ok, frame = cap.read()
+            if ok:
+                gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                anterior = cv2.resize(gris, (lado, lado), interpolation=cv2.INTER_AREA)
+            if anterior is not None:
+                grises.append(anterior)
+        if len(grises) < n // 2:
+            return None
+        # Los primeros fotogramas ilegibles toman el primero que sí se leyó
+        grises = [grises[0]] * (n - len(grises)) + grises
+        return np.asarray(grises, dtype=np.float32), dims, duracion
+    finally:
+        cap.release()
+
+
+def distancia_hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(x):
+        return np.bitwise_count(x)
+else:
+    _BITS_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    def _popcount(x):
+        return _BITS_BYTE[x.view(np.uint8).reshape(len(x), 8)].sum(axis=1)
+
+
+# Multi-index hashing: la huella se parte en 3 trozos (22 + 21 + 21 bits). Si dos
+# huellas están a <= radio bits, algún trozo difiere en <= radio // 3 bits
+# (palomar), así que basta con buscar, trozo a trozo, los valores a esa distancia.
+ANCHOS_TROZO = (22, 21, 21)
+
+
+def _mascaras(ancho, bits):
+    """Todas las máscaras de `ancho` bits con como mucho `bits` bits a 1."""
+    return np.array([sum(1 << p for p in pos) for k in range(bits + 1)
+                     for pos in itertools.combinations(range(ancho), k)], dtype=np.int64)
+
+
+def pares_cercanos(huellas, radio=DISTANCIA_MAXIMA):
+    """Pares de índices (i, j), i < j, cuyas huellas están a <= radio bits.
+
+    Todo se hace con arrays: por cada trozo se cuentan las huellas de cada valor
+    (bincount) y, para cada máscara de <= radio // 3 bits, el trozo XOR máscara
+    indexa directamente su cubeta. Los candidatos se verifican con un popcount
+    vectorizado de los 64 bits.
+    """
+    h = np.asarray(huellas, dtype=np.uint64)
+    n = len(h)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    sub_radio = radio // len(ANCHOS_TROZO)
+    encontrados, desplazamiento = [], 0
+    for ancho in ANCHOS_TROZO:
+        trozo = ((h >> np.uint64(desplazamiento)) & np.uint64((1 << ancho) - 1)).astype(np.int64)
+        desplazamiento += ancho
+        orden = np.argsort(trozo, kind="stable")
+        conteo = np.bincount(trozo, minlength=1 << ancho)
+        inicio = np.cumsum(conteo) - conteo
+        for mascara in _mascaras(ancho, sub_radio):
+            buscado = trozo ^ mascara
+            cuantos = conteo[buscado]
+            i = np.flatnonzero(cuantos)
+            if not len(i): continue
+            cuantos = cuantos[i]
+            total = int(cuantos.sum())
+            posicion = np.arange(total) - np.repeat(np.cumsum(cuantos) - cuantos, cuantos)
+            j = orden[np.repeat(inicio[buscado[i]], cuantos) + posicion]
+            i = np.repeat(i, cuantos)
+            validos = i < j
+            i, j = i[validos], j[validos]
+            cerca = _popcount(h[i] ^ h[j]) <= radio
+            encontrados.append(np.stack([i[cerca], j[cerca]], axis=1))
+    if not encontrados:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(encontrados), axis=0)
+
+
+def agrupar(huellas, radio=DISTANCIA_MAXIMA):
+    """Agrupa claves cuyas huellas están a <= radio bits (cierre transitivo).
+
+    `huellas` es una lista de (clave, huella). Devuelve listas de claves en el
+    orden de entrada, solo las de dos o más elementos.
+    """
+    padre = list(range(len(huellas)))
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for i, j in pares_cercanos([h for _, h in huellas], radio).tolist():
+        a, b = raiz(i), raiz(j)
+        if a != b: padre[max(a, b)] = min(a, b)
+
+    grupos = {}
+    for i, (clave, _) in enumerate(huellas):
+        grupos.setdefault(raiz(i), []).append(clave)
+    return [g for g in grupos.values() if len(g) > 1]
+
+
+def coincidencia_secuencia(a, b, radio=DISTANCIA_MAXIMA, ventana=2):
+    """Fracción de fotogramas de cada secuencia con pareja a <= radio bits en la otra.
+
+    La pareja se busca a +-`ventana` posiciones: en una copia recortada unos
+    segundos las posiciones relativas se van corriendo a lo largo del video.
+    Se devuelve la menor de las dos fracciones (a respecto de b y b respecto de a).
+    Los fotogramas uniformes (None) no cuentan ni como pareja ni en la fracción.
+    """
+    validos_a = np.array([h is not None for h in a])
+    validos_b = np.array([h is not None for h in b])
+    if not validos_a.any() or not validos_b.any():
+        return 0.0
+    a = np.array([h or 0 for h in a], dtype=np.uint64)
+    b = np.array([h or 0 for h in b], dtype=np.uint64)
+    cerca = _popcount(a[:, None] ^ b[None, :]) <= radio
+    posiciones_a = np.linspace(0, 1, len(a))[:, None]
+    posiciones_b = np.linspace(0, 1, len(b))[None, :]
+    banda = np.abs(posiciones_a - posiciones_b) <= ventana / max(len(a), len(b), 2)
+    cerca &= banda & validos_a[:, None] & validos_b[None, :]
+    return float(min(cerca.any(axis=1)[validos_a].mean(), cerca.any(axis=0)[validos_b].mean()))
+
+
+class DetectorSimilares:
+    """Buscador de imágenes casi duplicadas (re-guardadas, redimensionadas o recomprimidas).
+
+    Complementa a `RenamerTool`, que solo encuentra copias idénticas byte a byte.
+    Si se le pasa la `HashCache` de la biblioteca, las huellas se guardan ahí con
+    el mismo criterio de tamaño + mtime. Las imágenes y videos uniformes (en
+    blanco, negros o de un solo color) se omiten y quedan en `uniformes`.
+    """
+    def __init__(self, log_callback=None, progress_callback=None, tipo="phash",
+                 radio=DISTANCIA_MAXIMA, max_workers=4, cache=None, lote=256,
+                 fotogramas_video=FOTOGRAMAS_VIDEO):
+        if tipo not in TIPOS_HUELLA:
+            raise ValueError(f"Tipo de huella desconocido: {tipo}")
+        self.log_callback = log_callback
+        self.progress_callback = progress_callback
+        self.tipo = tipo
+        self.radio = radio
+        self.max_workers = max_workers
+        self.cache = cache
+        self.lote = lote
+        self.fotogramas_video = fotogramas_video
+        self.uniformes = []
+
+    def log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            print(message)
+
+    def _cargar(self, ruta):
+        try:
+            return cargar_reducida(ruta, self.tipo)
+        except Exception:
+            return None
+
+    def huellas_imagenes(self, rutas):
+        """Devuelve {ruta: (huella, (ancho, alto))} para las imágenes que se pudieron leer.
+
+        Las uniformes no aparecen: se añaden a `self.uniformes`.
+        """
+        clave_cache = f"{self.tipo}:img:u"
+        resultado, pendientes = {}, []
+        for ruta in rutas:
+            st = None
+            if self.cache:
+                try:
+                    st = os.stat(ruta)
+                    guardado = self.cache.get(ruta, clave_cache, st)
+                except OSError:
+                    guardado = None
+                if guardado:
+                    h, dims = guardado.split(":")
+                    if h == "u":
+                        self.uniformes.append(ruta)
+                    else:
+                        resultado[ruta] = (int(h, 16), tuple(int(v) for v in dims.split("x")))
+                    continue
+            pendientes.append((ruta, st))
+
+        total, hechos = len(rutas), len(rutas) - len(pendientes)
+        if self.progress_callback: self.progress_callback(hechos, total, "Huellas de imágenes")
+        # Decodificar en hilos (PIL libera el GIL) y calcular las huellas por lotes
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for inicio in range(0, len(pendientes), self.lote):
+                tanda = pendientes[inicio:inicio + self.lote]
+                cargadas = [(ruta, st, r) for (ruta, st), r in zip(tanda, pool.map(self._cargar, [t[0] for t in tanda])) if r]
+                if cargadas:
+                    grises = np.stack([r[0] for _, _, r in cargadas])
+                    huellas = huellas_lote(grises, self.tipo)
+                    for (ruta, st, (_, dims)), huella, uniforme in zip(cargadas, huellas, uniformes(grises)):
+                        if uniforme:
+                            self.uniformes.append(ruta)
+                        else:
+                            resultado[ruta] = (huella, dims)
+                        if self.cache and st is not None:
+                            texto = "u" if uniforme else f"{huella:016x}"
+                            self.cache.put(ruta, clave_cache, st, f"{texto}:{dims[0]}x{dims[1]}")
+                hechos += len(tanda)
+                if self.progress_callback: self.progress_callback(hechos, total, "Huellas de imágenes")
+        if self.cache: self.cache.commit()
+        return resultado
+
+    def _cargar_video(self, ruta):
+        try:
+            return fotogramas_reducidos(ruta, self.fotogramas_video)
+        except Exception:
+            return None
+
+    def huellas_videos(self, rutas):
+        """Devuelve {ruta: ([huellas pHash de cada fotograma], (ancho, alto), segundos)}.
+
+        Los fotogramas uniformes (negros, fundidos) tienen huella None; los videos
+        en los que son mayoría no aparecen y se añaden a `self.uniformes`. Se
+        guardan en la caché por tamaño + mtime: volver a buscar solo lee los
+        videos nuevos o modificados.
+        """
+        clave_cache = f"phash:video{self.fotogramas_video}:d:u"
+        resultado, pendientes = {}, []
+        for ruta in rutas:
+            st = None
+            if self.cache:
+                try:
+                    st = os.stat(ruta)
+                    guardado = self.cache.get(ruta, clave_cache, st)
+                except OSError:
+                    guardado = None
+                if guardado:
+                    huellas, dims, duracion = guardado.split(":")
+                    self._agregar_video(resultado, ruta, [None if h == "u" else int(h, 16) for h in huellas.split("-")],
+                                        tuple(int(v) for v in dims.split("x")), float(duracion))
+                    continue
+            pendientes.append((ruta, st))
+
+        total, hechos = len(rutas), len(rutas) - len(pendientes)
+        if self.progress_callback: self.progress_callback(hechos, total, "Huellas de videos")
+        # OpenCV libera el GIL al decodificar, así que varios videos avanzan a la vez
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for (ruta, st), leido in zip(pendientes, pool.map(self._cargar_video, [p[0] for p in pendientes])):
+                hechos += 1
+                if self.progress_callback: self.progress_callback(hechos, total, f"Huellas de videos: {os.path.basename(ruta)}")
+                if leido is None:
+                    self.log(f"No se pudieron leer fotogramas de {os.path.basename(ruta)}")
+                    continue
+                huellas = [None if uniforme else h for h, uniforme in zip(huellas_lote(leido[0], "phash"), uniformes(leido[0]))]
+                self._agregar_video(resultado, ruta, huellas, leido[1], leido[2])
+                if self.cache and st is not None:
+                    texto = "-".join("u" if h is None else f"{h:016x}" for h in huellas)
+                    self.cache.put(ruta, clave_cache, st, f"{texto}:{leido[1][0]}x{leido[1][1]}:{leido[2]:.3f}")
+        if self.cache: self.cache.commit()
+        return resultado
+
+    def _agregar_video(self, resultado, ruta, huellas, dims, duracion):
+        # Con más de la mitad de fotogramas uniformes no queda contenido que comparar
+        if sum(h is None for h in huellas) * 2 > len(huellas):
+            self.uniformes.append(ruta)
+        else:
+            resultado[ruta] = (huellas, dims, duracion)
+
+    def _avisar_uniformes(self, antes, que):
+        omitidas = len(self.uniformes) - antes
+        if omitidas:
+            self.log(f"Se omitieron {omitidas} {que} uniformes (en blanco o de un solo color)")
+
+    def buscar_videos_similares(self, rutas):
+        """Agrupa videos con el mismo contenido aunque cambie el formato, la resolución o se hayan recortado.
+
+        Todas las huellas de fotogramas van a un único índice (`pares_cercanos`):
+        dos videos son candidatos si comparten suficientes fotogramas cercanos, y
+        se confirman comparando las secuencias alineadas (`coincidencia_secuencia`).
+        En cada grupo va primero el más largo (una copia recortada pierde
+        contenido), luego el de mayor resolución y luego el archivo más grande.
+        """
+        rutas = [r for r in rutas if r.lower().endswith(FORMATOS_VIDEO)]
+        antes = len(self.uniformes)
+        datos = self.huellas_videos(rutas)
+        self._avisar_uniformes(antes, "videos")
+        videos = [r for r in rutas if r in datos]
+        if len(videos) < 2:
+            return []
+
+        # Los fotogramas uniformes no entran al índice: todos los negros coincidirían entre sí
+        validas = [[h for h in datos[r][0] if h is not None] for r in videos]
+        planas = np.concatenate([np.asarray(v, dtype=np.uint64) for v in validas])
+        dueno = np.repeat(np.arange(len(videos)), [len(v) for v in validas])
+        pares = pares_cercanos(planas, self.radio)
+        pares = np.stack([dueno[pares[:, 0]], dueno[pares[:, 1]]], axis=1)
+        pares = pares[pares[:, 0] != pares[:, 1]]
+        candidatos, votos = np.unique(np.sort(pares, axis=1), axis=0, return_counts=True)
+
+        minimo = max(1, int(self.fotogramas_video * FRACCION_VIDEO) // 2)
+        padre = list(range(len(videos)))
+        def raiz(x):
+            while padre[x] != x:
+                padre[x] = padre[padre[x]]
+                x = padre[x]
+            return x
+        for (i, j), n in zip(candidatos.tolist(), votos.tolist()):
+            if n < minimo: continue
+            if coincidencia_secuencia(datos[videos[i]][0], datos[videos[j]][0], self.radio) >= FRACCION_VIDEO:
+                a, b = raiz(i), raiz(j)
+                if a != b: padre[max(a, b)] = min(a, b)
+
+        por_raiz = {}
+        for i, ruta in enumerate(videos):
+            por_raiz.setdefault(raiz(i), []).append(ruta)
+        def calidad(ruta):
+            ancho, alto = datos[ruta][1]
+            try: size = os.path.getsize(ruta)
+            except OSError: size = 0
+            # Duración redondeada al segundo: diferencias de contenedor no deben pesar más que la resolución
+            return (-round(datos[ruta][2]), -ancho * alto, -size)
+        grupos = [sorted(g, key=calidad) for g in por_raiz.values() if len(g) > 1]
+        self.log(f"Videos similares: {len(grupos)} grupos entre {len(videos)} videos")
+        return grupos
+
+    def buscar_similares(self, rutas):
+        """Agrupa las imágenes casi idénticas de `rutas`.
+
+        En cada grupo va primero la de mayor resolución (y, a igualdad, el
+        archivo más grande), que es la que conviene conservar.
+        """
+        rutas = [r for r in rutas if r.lower().endswith(FORMATOS_IMAGEN)]
+        antes = len(self.uniformes)
+        datos = self.huellas_imagenes(rutas)
+        self._avisar_uniformes(antes, "imágenes")
+        grupos = agrupar([(r, datos[r][0]) for r in rutas if r in datos], self.radio)
+        def calidad(ruta):
+            ancho, alto = datos[ruta][1]
+            try: size = os.path.getsize(ruta)
+            except OSError: size = 0
+            return (-ancho * alto, -size)
+        grupos = [sorted(g, key=calidad) for g in grupos]
+        self.log(f"Imágenes similares: {len(grupos)} grupos entre {len(datos)} imágenes ({self.tipo}, radio {self.radio})")
+        return grupos
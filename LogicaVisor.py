@@ -0,0 +1,423 @@
+import io
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from PIL import Image, ExifTags
+from LogicaArchivos import firma_archivo
+
+FORMATOS_IMAGEN = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+FORMATOS_VIDEO = ('.mp4', '.avi', '.mov', '.mkv')
+# Elementos que se preparan por delante y por detrás del actual
+VECINOS_PRECARGA = 4
+# Las miniaturas en disco caben en un cuadrado de este lado (basta para el visor en una pantalla 1080p)
+LADO_MINIATURA = 1280
+LIMITE_MINIATURAS = 1 << 30
+CALIDAD_MINIATURA = 80
+
+
+def directorio_cache():
+    """Carpeta de caché de la aplicación ($XDG_CACHE_HOME en Linux, %LOCALAPPDATA% en Windows)."""
+    if sys.platform.startswith("win"):
+        base = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "cache")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "reconocimiento-facial")
+
+
+def presupuesto_memoria(fraccion=1 / 16, minimo=64 << 20, maximo=512 << 20):
+    """Bytes para la caché de vistas: una fracción de la RAM, entre `minimo` y `maximo`."""
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return 256 << 20
+    return int(min(maximo, max(minimo, total * fraccion)))
+
+
+def _encajar(dims, tamano):
+    """Tamaño de `dims` escalado para caber en `tamano` sin deformar (nunca mayor que el original)."""
+    escala = min(tamano[0] / dims[0], tamano[1] / dims[1], 1.0)
+    return max(1, round(dims[0] * escala)), max(1, round(dims[1] * escala))
+
+
+def miniatura_exif(img, minimo):
+    """Miniatura JPEG incrustada en el EXIF si mide al menos `minimo` y tiene la misma proporción."""
+    try:
+        datos = img.info.get("exif")
+        if not datos: return None
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        inicio, largo = ifd1.get(0x0201), ifd1.get(0x0202)
+        if not inicio or not largo: return None
+        # Los desplazamientos cuentan desde la cabecera TIFF, después de "Exif\0\0"
+        base = 6 if datos.startswith(b"Exif\x00\x00") else 0
+        mini = Image.open(io.BytesIO(datos[base + inicio:base + inicio + largo]))
+        if mini.size[0] < minimo[0] or mini.size[1] < minimo[1]: return None
+        if abs(mini.size[0] / mini.size[1] - img.size[0] / img.size[1]) > 0.02: return None
+        mini.load()
+        return mini
+    except Exception:
+        return None
+
+
+def abrir_vista(ruta, tamano, usar_miniatura=True):
+    """Decodifica una imagen directamente a tamaño de pantalla.
+
+    En JPEG usa la miniatura del EXIF si basta para `tamano` y, si no, el modo
+    draft de Pillow: el decodificador escala los bloques DCT a 1/2, 1/4 o 1/8
+    sin pasar por la resolución completa. En otros formatos `reduce()` divide
+    por un entero. Queda un remuestreo final pequeño (menos de 2x). Devuelve una
+    imagen ya cargada que no mantiene el archivo abierto.
+    """
+    with Image.open(ruta) as img:
+        objetivo = _encajar(img.size, tamano)
+        if img.format == "JPEG":
+            mini = miniatura_exif(img, objetivo) if usar_miniatura else None
+            if mini is None:
+                img.draft(img.mode, objetivo)
+            img = mini or img
+            img.thumbnail(tamano, Image.Resampling.BICUBIC, reducing_gap=None)
+        else:
+            img.thumbnail(tamano, Image.Resampling.BICUBIC, reducing_gap=1.5)
+        return img.copy()
+
+
+def decodificar_vista(ruta, tamano):
+    """Imagen PIL lista para mostrar en un recuadro de `tamano` (ancho, alto).
+
+    Para videos es el primer fotograma. Devuelve None si no se puede leer.
+    """
+    ext = os.path.splitext(ruta)[1].lower()
+    try:
+        if ext in FORMATOS_VIDEO:
+            import cv2
+            cap = cv2.VideoCapture(ruta)
+            ret, frame = cap.read()
+            cap.release()
+            if not ret: return None
+            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            img.thumbnail(tamano)
+            return img
+        return abrir_vista(ruta, tamano)
+    except Exception:
+        return None
+
+
+class CacheMiniaturas:
+    """Miniaturas en disco (de hasta LADO_MINIATURA) de fotos y del primer fotograma de videos.
+
+    El nombre de cada miniatura es el hash de ruta + tamaño + mtime del
+    original: un archivo recortado o reemplazado tiene otra clave y su miniatura
+    vieja simplemente deja de usarse. Cada acierto actualiza el mtime de la
+    miniatura; cuando la carpeta supera `limite` bytes se borran las menos
+    usadas hasta bajar al 90%. Se guardan en JPEG, o en PNG si tienen
+    transparencia; una foto que ya cabe en LADO_MINIATURA no se copia.
+    """
+    def __init__(self, carpeta=None, limite=LIMITE_MINIATURAS, lado=LADO_MINIATURA):
+        self.carpeta = carpeta or os.path.join(directorio_cache(), "miniaturas")
+        self.limite = limite
+        self.lado = lado
+        self.lock = threading.Lock()
+        self.ocupado = None  # se calcula al guardar la primera miniatura (en el hilo del poblador)
+        # Aviso de que falta la miniatura de una ruta (lo conecta PobladorMiniaturas)
+        self.al_faltar = None
+
+    def _archivo(self, ruta, st):
+        """Ruta de la miniatura de `ruta` sin extensión (.jpg o .png según se haya guardado)."""
+        clave = hashlib.sha1(f"{os.path.abspath(ruta)}\0{st.st_size}\0{st.st_mtime_ns}".encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(self.carpeta, clave[:2], clave)
+
+    def _pequena(self, ruta):
+        """True si `ruta` es una foto que ya cabe en la miniatura (solo lee la cabecera)."""
+        if not ruta.lower().endswith(FORMATOS_IMAGEN): return False
+        try:
+            with Image.open(ruta) as img:
+                return max(img.size) <= self.lado
+        except Exception:
+            return False
+
+    def vista(self, ruta, tamano):
+        """Vista de `ruta` para un recuadro de `tamano`, desde la miniatura si alcanza.
+
+        Nunca escribe en disco (se llama desde el hilo de Tk): si falta la
+        miniatura se decodifica el original y se avisa a `al_faltar` para que la
+        cree el hilo de fondo. Si el recuadro es claramente más grande que la
+        miniatura también se usa el original. Devuelve None si no se puede leer.
+        """
+        try:
+            base = self._archivo(ruta, os.stat(ruta))
+        except OSError:
+            return None
+        for archivo in (base + ".jpg", base + ".png"):
+            try:
+                with Image.open(archivo) as img:
+                    dims = img.size
+                os.utime(archivo)
+                break
+            except OSError:
+                continue
+        else:
+            if self.al_faltar: self.al_faltar(ruta)
+            return decodificar_vista(ruta, tamano)
+        # Menor que el lado en ambos ejes: es el original a tamaño completo. Si no,
+        # se acepta estirar hasta un 10% antes de volver al original
+        if max(dims) < self.lado or min(tamano[0] / dims[0], tamano[1] / dims[1]) <= 1.1:
+            try:
+                return abrir_vista(archivo, tamano, usar_miniatura=False)
+            except Exception:
+                pass
+        return decodificar_vista(ruta, tamano)
+
+    def generar(self, ruta):
+        """Crea la miniatura de `ruta` si falta (una foto que ya cabe no se copia). Devuelve True si no hace falta más."""
+        try:
+            base = self._archivo(ruta, os.stat(ruta))
+        except OSError:
+            return False
+        if os.path.exists(base + ".jpg") or os.path.exists(base + ".png") or self._pequena(ruta):
+            return True
+        self._crear(ruta, base)
+        return os.path.exists(base + ".jpg") or os.path.exists(base + ".png")
+
+    def _crear(self, ruta, base):
+        """Decodifica `ruta` a LADO_MINIATURA y la guarda junto a `base`. Solo desde el hilo de fondo."""
+        img = decodificar_vista(ruta, (self.lado, self.lado))
+        if img is None:
+            return
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            # JPEG no tiene canal alfa: el fondo transparente se volvería negro
+            img, archivo, formato, opciones = img.convert("RGBA"), base + ".png", "PNG", {}
+        else:
+            img, archivo, formato, opciones = img.convert("RGB"), base + ".jpg", "JPEG", {"quality": CALIDAD_MINIATURA, "optimize": True}
+        temporal = f"{archivo}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(archivo), exist_ok=True)
+            img.save(temporal, formato, **opciones)
+            os.replace(temporal, archivo)
+            peso = os.path.getsize(archivo)
+        except OSError:
+            # Sin espacio o sin permisos: la vista sirve igual, solo no queda guardada
+            try: os.remove(temporal)
+            except OSError: pass
+            return
+        with self.lock:
+            if self.ocupado is None:
+                self.ocupado = self._medir()
+            else:
+                self.ocupado += peso
+            exceso = self.ocupado > self.limite
+        if exceso:
+            self.podar()
+
+    def _listar(self):
+        entradas = []
+        for raiz, _, archivos in os.walk(self.carpeta):
+            for nombre in archivos:
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    st = os.stat(ruta)
+                except OSError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, ruta))
+        return entradas
+
+    def _medir(self):
+        return sum(peso for _, peso, _ in self._listar())
+
+    def podar(self):
+        """Borra las miniaturas menos usadas hasta quedar en el 90% del límite."""
+        entradas = sorted(self._listar())
+        total = sum(peso for _, peso, _ in entradas)
+        for _, peso, ruta in entradas:
+            if total <= self.limite * 0.9: break
+            try:
+                os.remove(ruta)
+                total -= peso
+            except OSError:
+                pass
+        with self.lock:
+            self.ocupado = total
+
+
+class PobladorMiniaturas:
+    """Hilo de baja prioridad que va creando las miniaturas que faltan.
+
+    `agregar` acepta archivos o carpetas (se listan en el propio hilo, sin
+    subcarpetas). Con `prioridad=True` se ponen delante de lo ya pendiente,
+    p. ej. la carpeta origen que el usuario está revisando.
+    """
+    def __init__(self, miniaturas, formatos=FORMATOS_IMAGEN + FORMATOS_VIDEO):
+        self.miniaturas = miniaturas
+        self.formatos = formatos
+        self.cond = threading.Condition()
+        self.pendientes = deque()
+        self.activo = True
+        # Lo que el visor pidió y no estaba en disco pasa delante de todo
+        miniaturas.al_faltar = lambda ruta: self.agregar([ruta], prioridad=True)
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    def agregar(self, rutas, prioridad=False):
+        with self.cond:
+            if prioridad: self.pendientes.extendleft(reversed(list(rutas)))
+            else: self.pendientes.extend(rutas)
+            self.cond.notify()
+
+    def detener(self):
+        with self.cond:
+            self.activo = False
+            self.pendientes.clear()
+            self.cond.notify()
+
+    def _bajar_prioridad(self):
+        try:
+            # En Linux la prioridad es por hilo; en otros sistemas se deja como está
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+    def _trabajar(self):
+        self._bajar_prioridad()
+        while True:
+            with self.cond:
+                while self.activo and not self.pendientes:
+                    self.cond.wait()
+                if not self.activo: return
+                ruta = self.pendientes.popleft()
+            if os.path.isdir(ruta):
+                try:
+                    nombres = sorted(os.listdir(ruta))
+                except OSError:
+                    continue
+                rutas = [os.path.join(ruta, n) for n in nombres if n.lower().endswith(self.formatos)]
+                with self.cond:
+                    self.pendientes.extend(rutas)
+                continue
+            self.miniaturas.generar(ruta)
+
+
+class CacheVistas:
+    """LRU de imágenes ya escaladas para el visor, limitada por memoria.
+
+    La clave es (ruta, tamaño del recuadro); cada entrada guarda la firma del
+    archivo, así que una vista de un archivo que cambió en disco no se devuelve
+    aunque nadie la haya invalidado.
+    """
+    def __init__(self, presupuesto=None):
+        self.presupuesto = presupuesto or presupuesto_memoria()
+        self.entradas = OrderedDict()
+        self.ocupado = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _peso(img):
+        return img.size[0] * img.size[1] * len(img.getbands())
+
+    def get(self, ruta, tamano, firma=None):
+        with self.lock:
+            entrada = self.entradas.get((ruta, tamano))
+            if entrada is None: return None
+            if firma is not None and entrada[0] != firma:
+                self._quitar((ruta, tamano))
+                return None
+            self.entradas.move_to_end((ruta, tamano))
+            return entrada[1]
+
+    def put(self, ruta, tamano, firma, img):
+        peso = self._peso(img)
+        if peso > self.presupuesto: return
+        with self.lock:
+            self._quitar((ruta, tamano))
+            self.entradas[(ruta, tamano)] = (firma, img, peso)
+            self.ocupado += peso
+            while self.ocupado > self.presupuesto:
+                _, (_, _, p) = self.entradas.popitem(last=False)
+                self.ocupado -= p
+
+    def _quitar(self, clave):
+        entrada = self.entradas.pop(clave, None)
+        if entrada: self.ocupado -= entrada[2]
+
+    def invalidar(self, ruta):
+        """Olvida todas las vistas de `ruta` (al moverla o recortarla)."""
+        with self.lock:
+            for clave in [c for c in self.entradas if c[0] == ruta]:
+                self._quitar(clave)
+
+    def limpiar(self):
+        with self.lock:
+            self.entradas.clear()
+            self.ocupado = 0
+
+
+class Precargador:
+    """Hilo que decodifica y escala por adelantado los vecinos del elemento actual.
+
+    `pedir` solo cambia el objetivo (no espera): el hilo abandona la tanda
+    anterior en cuanto termina el archivo que tiene entre manos. Así, al pulsar
+    Siguiente/Anterior la vista suele estar ya en la caché.
+    """
+    def __init__(self, cache=None, vecinos=VECINOS_PRECARGA, decodificar=decodificar_vista):
+        self.cache = cache or CacheVistas()
+        self.vecinos = vecinos
+        self.decodificar = decodificar
+        self.cond = threading.Condition()
+        self.pendientes = []
+        self.tamano = None
+        self.activo = True
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    def alrededor(self, lista, indice):
+        """Rutas a preparar, de más a menos cercanas: i+1, i-1, i+2, i-2..."""
+        n = len(lista)
+        rutas = []
+        for d in range(1, self.vecinos + 1):
+            for j in (indice + d, indice - d):
+                ruta = lista[j % n]
+                if ruta not in rutas and ruta != lista[indice]: rutas.append(ruta)
+        return rutas
+
+    def pedir(self, rutas, tamano):
+        with self.cond:
+            self.pendientes = list(rutas)
+            self.tamano = tamano
+            self.cond.notify()
+
+    def obtener(self, ruta, tamano):
+        """Vista de `ruta`: de la caché si está al día; si no, se decodifica ahora."""
+        try:
+            firma = firma_archivo(ruta)
+        except OSError:
+            return None
+        img = self.cache.get(ruta, tamano, firma)
+        if img is None:
+            img = self.decodificar(ruta, tamano)
+            if img is not None: self.cache.put(ruta, tamano, firma, img)
+        return img
+
+    def detener(self):
+        with self.cond:
+            self.activo = False
+            self.cond.notify()
+
+    def _trabajar(self):
+        while True:
+            with self.cond:
+                while self.activo and not self.pendientes:
+                    self.cond.wait()
+                if not self.activo: return
+                ruta = self.pendientes.pop(0)
+                tamano = self.tamano
+            try:
+                firma = firma_archivo(ruta)
+            except OSError:
+                continue
+            if self.cache.get(ruta, tamano, firma) is not None:
+                continue
+            img = self.decodificar(ruta, tamano)
+            # Si entretanto cambió el tamaño del recuadro, esta vista ya no sirve
+            if img is not None and tamano == self.tamano:
+                self.cache.put(ruta, tamano, firma, img)
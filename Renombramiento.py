@@ -1,24 +1,15 @@
 import os
-import hashlib
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 from tkinter import ttk
 import stat
 import threading
+from LogicaDiario import diario_por_defecto
+from LogicaProgreso import ReporteProgreso, texto_progreso
+from LogicaRenombramiento import RenamerTool, planificar_renombrado, ordenar_renombrados, ejecutar_renombrados, recuperar_renombrado, DIARIO_RENOMBRADO
+
+diario = diario_por_defecto()
 
-def hashArchivo(filepath):
-    """Calcula el hash MD5 de un archivo. Lee en bloques para archivos grandes."""
-    hash_md5 = hashlib.md5()
-    try:
-        with open(filepath, "rb") as f:
-            # Lee el archivo en trozos de 4096 bytes
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    except Exception as e:
-        actualizarMensaje(f"Error leyendo {filepath}: {e}")
-        return None
-    
 def esOculto(filepath):
     """
     Comprueba si un archivo es oculto.
@@ -38,8 +29,19 @@ def esOculto(filepath):
     return False
 
 def procesamientoArchivos(folder_path):
-    """Función principal para eliminar duplicados y renombrar."""
+    """Función principal para eliminar duplicados y renombrar. Todo queda en una sesión del diario (se puede deshacer)."""
+    with diario.sesion(f"Renombramiento de {folder_path}"):
+        _procesamientoArchivos(folder_path)
+
+def _procesamientoArchivos(folder_path):
     
+    # Terminar un renombrado anterior que se haya interrumpido. Si no se pudo, el diario
+    # queda para revisarlo a mano: un renombrado nuevo lo sobrescribiría
+    if recuperar_renombrado(folder_path, log_callback=actualizarMensaje) is False:
+        actualizarMensaje(f"Se omite la carpeta: revisa {os.path.join(folder_path, DIARIO_RENOMBRADO)}")
+        finalizarProceso()
+        return
+
     # Contar archivos totales para la barra de carga
     mensajeProceso("Escaneando cantidad de archivos...")
     todos_los_archivos = []
@@ -66,114 +68,99 @@ def procesamientoArchivos(folder_path):
     
     # Eliminar Duplicados
     mensajeProceso("Buscando y eliminando duplicados...")
-    hashes = {}
     files_deleted = 0
-    files_processed = 0
 
-    # Recorremos la lista que ya obtuvimos
-    for entry in todos_los_archivos:
-        files_processed += 1
-        
-        # Actualizar UI (Barra y Texto)
-        actualizarProgreso(files_processed, total_archivos)
+    def progreso(hechos, total, ruta):
+        # Solo se reportan los archivos que comparten tamaño con otro (los únicos que se leen)
+        actualizarProgreso(hechos, total)
+        nombre = os.path.basename(ruta)
         # Mostrar nombre corto para que no sature la vista
-        nombre_corto = (entry.name[:40] + '..') if len(entry.name) > 40 else entry.name
-        mensajeProceso(f"Procesando ({files_processed}/{total_archivos}): {nombre_corto}")
+        nombre_corto = (nombre[:40] + '..') if len(nombre) > 40 else nombre
+        mensajeProceso(f"Comparando ({hechos}/{total}): {nombre_corto}")
 
-        file_hash = hashArchivo(entry.path)
-        
-        if not file_hash: continue
+    buscador = RenamerTool(log_callback=actualizarMensaje)
+    grupos, stats = buscador.buscar_duplicados([entry.path for entry in todos_los_archivos], progress_callback=progreso)
 
-        if file_hash in hashes:
+    borrados = set()
+    for grupo in grupos:
+        for ruta in grupo[1:]:
+            nombre = os.path.basename(ruta)
             try:
-                os.remove(entry.path)
-                actualizarMensaje(f"Eliminado (duplicado): {entry.name}")
+                diario.eliminar(ruta)
+                borrados.add(ruta)
+                actualizarMensaje(f"Eliminado (duplicado, a cuarentena): {nombre}")
                 files_deleted += 1
             except Exception as e:
-                actualizarMensaje(f"Error al eliminar {entry.name}: {e}")
-        else:
-            hashes[file_hash] = entry.path
+                actualizarMensaje(f"Error al eliminar {nombre}: {e}")
 
+    buscador.log_estadisticas(stats)
     actualizarMensaje(f"{files_deleted} duplicados eliminados.")
     actualizarMensaje("-----------------------------------")
 
     # Renombrar
     mensajeProceso("Renombrando archivos restantes...")
-    actualizarProgreso(0, 0) # Modo indeterminado (barra rebotando) para esta fase rápida
-    iniciarBarraProgreso() 
-    
-    base_name = os.path.basename(folder_path)
+
+    # Plan único a partir de la lista inicial: los que ya tienen su nombre no se tocan
+    # y los ciclos (a->b->a) usan un solo nombre temporal
+    remaining_files = sorted(entry.name for entry in todos_los_archivos if entry.path not in borrados)
+    plan = planificar_renombrado(remaining_files, os.path.basename(folder_path))
+    operaciones = ordenar_renombrados(plan)
+    actualizarProgreso(0, max(len(operaciones), 1))
+
     files_renamed = 0
-    
     try:
-        # Volvemos a leer el directorio ya limpio
-        remaining_files = sorted(
-            [f for f in os.scandir(folder_path) if f.is_file() and not esOculto(f.path)],
-            key=lambda f: f.name)
+        if plan:
+            diario.renombrar_lote(folder_path, plan, lambda: ejecutar_renombrados(
+                folder_path, operaciones, progress_callback=actualizarProgreso))
+        files_renamed = len(plan)
     except Exception as e:
-        actualizarMensaje(f"Error listando: {e}")
-        finalizarProceso()
-        return
+        actualizarMensaje(f"Error renombrando, se restauraron los nombres originales: {e}")
 
-    # Renombrado Temporal
-    temp_files = []
-    for i, entry in enumerate(remaining_files):
-        _, ext = os.path.splitext(entry.name)
-        temp_name = f"__temp_{i}{ext}"
-        temp_path = os.path.join(folder_path, temp_name)
-        try:
-            os.rename(entry.path, temp_path)
-            temp_files.append((temp_path, ext))
-        except Exception as e:
-            actualizarMensaje(f"Error temp: {entry.name}: {e}")
-
-    # Renombrado Final
-    for i, (temp_path, ext) in enumerate(temp_files):
-        counter_str = "" if i == 0 else str(i)
-        final_name = f"{base_name}{counter_str}{ext}"
-        final_path = os.path.join(folder_path, final_name)
-        try:
-            os.rename(temp_path, final_path)
-            files_renamed += 1
-        except Exception as e:
-            actualizarMensaje(f"Error final {final_name}: {e}")
-
-    actualizarMensaje(f"{files_renamed} archivos renombrados.")
+    actualizarMensaje(f"{files_renamed} archivos renombrados ({len(remaining_files) - len(plan)} ya tenían su nombre).")
     actualizarMensaje("--- PROCESO FINALIZADO ---")
     
     # Llamar a la función de finalización
     finalizarProceso(exito=True)
 
+# El hilo de trabajo solo avisa al reporte; la interfaz se refresca 10 veces por segundo
+# desde el hilo de Tk (ver LogicaProgreso.ReporteProgreso)
+reporte = None
+
 def actualizarMensaje(mensaje):
-    app_log.config(state="normal")
-    app_log.insert(tk.END, mensaje + "\n")
-    app_log.config(state="disabled")
-    app_log.see(tk.END)
+    reporte.log(mensaje)
 
 def mensajeProceso(texto):
-    status_var.set(texto)
+    reporte.estado(texto)
 
 def actualizarProgreso(valor, maximo):
+    reporte.progreso(valor, maximo)
+
+def escribirLog(texto):
+    app_log.config(state="normal")
+    app_log.insert(tk.END, texto + "\n")
+    app_log.config(state="disabled")
+    app_log.see(tk.END)
+
+def mostrarProgreso(valor, maximo, mensaje, velocidad, eta):
     # Configurar máximo si cambió
     if pb['maximum'] != maximo and maximo > 0:
         pb['maximum'] = maximo
     pb['mode'] = 'determinate'
     pb['value'] = valor
-
-def iniciarBarraProgreso():
-    pb['mode'] = 'indeterminate'
-    pb.start(10)
+    status_var.set(texto_progreso(valor, maximo, mensaje, velocidad, eta))
 
 def finalizarProceso(exito=False):
-    # Detener barra y resetear UI
-    pb.stop()
-    pb['mode'] = 'determinate'
-    pb['value'] = 100
-    mensajeProceso("Listo.")
-    btn_start.config(state="normal")
-    
-    if exito:
-        messagebox.showinfo("Completado", "El proceso ha finalizado con éxito.")
+    def finalizarUI():
+        # Detener barra y resetear UI
+        reporte.detener()
+        pb['mode'] = 'determinate'
+        pb['value'] = pb['maximum']
+        status_var.set("Listo.")
+        btn_start.config(state="normal")
+        
+        if exito:
+            messagebox.showinfo("Completado", "El proceso ha finalizado con éxito.")
+    reporte.en_ui(finalizarUI)
 
 def iniciarProceso():
     """Prepara la GUI e inicia el hilo."""
@@ -192,6 +179,8 @@ def iniciarProceso():
     app_log.config(state="disabled")
     
     # Iniciar Proceso
+    global reporte
+    reporte = ReporteProgreso(window, on_progress=mostrarProgreso, on_log=escribirLog).iniciar()
     t = threading.Thread(target=procesamientoArchivos, args=(folder,))
     t.start()
 
@@ -0,0 +1,152 @@
+import os
+import threading
+import pytest
+import LogicaDiario
+from LogicaDiario import CARPETA_CUARENTENA, DiarioOperaciones
+
+
+@pytest.fixture
+def diario(tmp_path):
+    return DiarioOperaciones(str(tmp_path / "estado" / "operaciones.jsonl"), log_callback=lambda m: None)
+
+
+@pytest.fixture
+def carpetas(tmp_path):
+    origen, destino = tmp_path / "origen", tmp_path / "destino"
+    origen.mkdir()
+    destino.mkdir()
+    return origen, destino
+
+
+def test_mover_no_sobrescribe_y_se_deshace(diario, carpetas):
+    origen, destino = carpetas
+    (origen / "IMG.jpg").write_text("nuevo")
+    (destino / "IMG.jpg").write_text("existente")
+
+    with diario.sesion("prueba"):
+        final = diario.mover(str(origen / "IMG.jpg"), str(destino / "IMG.jpg"))
+    assert final == str(destino / "IMG_1.jpg")
+    assert (destino / "IMG.jpg").read_text() == "existente"
+    assert (destino / "IMG_1.jpg").read_text() == "nuevo"
+
+    resultado = diario.deshacer()
+    assert resultado["restaurados"] == 1 and resultado["omitidos"] == 0
+    assert (origen / "IMG.jpg").read_text() == "nuevo"
+    assert (destino / "IMG.jpg").read_text() == "existente"
+    assert not (destino / "IMG_1.jpg").exists()
+
+
+def test_deshacer_no_pisa_un_archivo_nuevo_en_el_origen(diario, carpetas):
+    origen, destino = carpetas
+    (origen / "a.jpg").write_text("movido")
+    with diario.sesion("prueba"):
+        diario.mover(str(origen / "a.jpg"), str(destino / "a.jpg"))
+    # Después del movimiento otro archivo ocupa el sitio original
+    (origen / "a.jpg").write_text("otro")
+
+    resultado = diario.deshacer()
+    assert resultado["restaurados"] == 0 and resultado["omitidos"] == 1
+    assert (origen / "a.jpg").read_text() == "otro"
+    assert (destino / "a.jpg").read_text() == "movido"
+
+
+def test_eliminar_va_a_cuarentena_y_se_deshace(diario, carpetas):
+    origen, _ = carpetas
+    (origen / "a.jpg").write_text("a")
+    (origen / "b.jpg").write_text("b")
+
+    with diario.sesion("limpieza") as sesion:
+        apartado = diario.eliminar(str(origen / "a.jpg"))
+        diario.eliminar(str(origen / "b.jpg"))
+    assert apartado == str(origen / CARPETA_CUARENTENA / sesion / "a.jpg")
+    assert sorted(os.listdir(origen)) == [CARPETA_CUARENTENA]
+
+    resultado = diario.deshacer()
+    assert resultado == {"sesion": sesion, "restaurados": 2, "omitidos": 0}
+    assert (origen / "a.jpg").read_text() == "a"
+    assert (origen / "b.jpg").read_text() == "b"
+    # La cuarentena vacía de la sesión se borra
+    assert not (origen / CARPETA_CUARENTENA).exists()
+
+
+def test_deshacer_solo_una_vez(diario, carpetas):
+    origen, _ = carpetas
+    (origen / "a.jpg").write_text("a")
+    with diario.sesion("limpieza"):
+        diario.eliminar(str(origen / "a.jpg"))
+    assert diario.deshacer()["restaurados"] == 1
+    assert diario.deshacer() is None
+    assert [s["deshecha"] for s in diario.sesiones()] == [True]
+
+
+def test_operacion_fallida_no_se_deshace(diario, carpetas):
+    origen, destino = carpetas
+    with diario.sesion("prueba"):
+        with pytest.raises(OSError):
+            diario.mover(str(origen / "no_existe.jpg"), str(destino / "x.jpg"))
+    assert diario.sesiones()[-1]["operaciones"] == 0
+    assert diario.deshacer() is None
+
+
+def test_purgar_borra_la_cuarentena_de_sesiones_antiguas(diario, carpetas, monkeypatch):
+    origen, _ = carpetas
+    (origen / "viejo.jpg").write_text("12345")
+    (origen / "nuevo.jpg").write_text("123")
+    with diario.sesion("antigua"):
+        diario.eliminar(str(origen / "viejo.jpg"))
+    # La segunda sesión empieza 10 días después
+    ahora = LogicaDiario.time.time()
+    monkeypatch.setattr(LogicaDiario.time, "time", lambda: ahora + 10 * 86400)
+    with diario.sesion("reciente") as reciente:
+        diario.eliminar(str(origen / "nuevo.jpg"))
+    assert diario.en_cuarentena() == {"archivos": 2, "bytes": 8}
+
+    assert diario.purgar(dias=5) == {"sesiones": 1, "archivos": 1, "bytes": 5}
+    assert diario.en_cuarentena() == {"archivos": 1, "bytes": 3}
+    assert [s["purgada"] for s in diario.sesiones()] == [True, False]
+    # Lo reciente se sigue pudiendo deshacer
+    assert diario.deshacer(reciente)["restaurados"] == 1
+    assert (origen / "nuevo.jpg").read_text() == "123"
+    assert not (origen / CARPETA_CUARENTENA).exists()
+
+
+def test_purgar_una_sesion(diario, carpetas):
+    origen, _ = carpetas
+    (origen / "a.jpg").write_text("a")
+    with diario.sesion("limpieza") as sesion:
+        diario.eliminar(str(origen / "a.jpg"))
+    assert diario.purgar(sesion=sesion)["archivos"] == 1
+    assert diario.purgar(sesion=sesion)["archivos"] == 0
+    resultado = diario.deshacer(sesion)
+    assert resultado["restaurados"] == 0 and resultado["omitidos"] == 1
+
+
+def test_sesion_sin_operaciones_no_queda_en_el_diario(diario, carpetas):
+    origen, destino = carpetas
+    with diario.sesion("nada que hacer"):
+        pass
+    assert diario.sesiones() == []
+    assert not os.path.exists(diario.ruta)
+
+    (origen / "a.jpg").write_text("a")
+    with diario.sesion("mover") as sesion:
+        with diario.sesion("anidada"):
+            pass
+        diario.mover(str(origen / "a.jpg"), str(destino / "a.jpg"))
+    assert [(s["sesion"], s["descripcion"], s["operaciones"]) for s in diario.sesiones()] == [(sesion, "mover", 1)]
+
+
+def test_hilo_que_se_suma_escribe_la_cabecera(diario, carpetas):
+    origen, destino = carpetas
+    (origen / "a.jpg").write_text("a")
+    with diario.sesion("limpieza") as sesion:
+        def trabajo():
+            with diario.sesion(existente=sesion):
+                diario.mover(str(origen / "a.jpg"), str(destino / "a.jpg"))
+        hilo = threading.Thread(target=trabajo)
+        hilo.start()
+        hilo.join()
+    registros = diario.leer()
+    assert [r["op"] for r in registros] == ["inicio", "mover"]
+    assert registros[0]["descripcion"] == "limpieza"
+    assert diario.deshacer(sesion)["restaurados"] == 1
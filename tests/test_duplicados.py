@@ -0,0 +1,145 @@
+import os
+import pytest
+import LogicaRenombramiento
+from LogicaDiario import DiarioOperaciones
+from LogicaRenombramiento import BLOQUE_PARCIAL, HashCache, RenamerTool, hash_archivo, hash_parcial
+
+
+@pytest.fixture
+def renamer(tmp_path):
+    diario = DiarioOperaciones(str(tmp_path / "operaciones.jsonl"), log_callback=lambda m: None)
+    return RenamerTool(log_callback=lambda m: None, diario=diario)
+
+
+def escribir(ruta, datos):
+    ruta.write_bytes(datos)
+    return str(ruta)
+
+
+def contar_lecturas(monkeypatch, funcion):
+    # Anota qué archivos llega a leer cada fase
+    leidos = []
+    original = getattr(LogicaRenombramiento, funcion)
+    def envuelta(ruta, *args):
+        leidos.append(os.path.basename(ruta))
+        return original(ruta, *args)
+    monkeypatch.setattr(LogicaRenombramiento, funcion, envuelta)
+    return leidos
+
+
+def test_buscar_duplicados_por_fases(tmp_path, renamer, monkeypatch):
+    grande = bytes(3 * BLOQUE_PARCIAL)
+    # Mismo inicio y final, distinto solo en el medio: el parcial coincide, el completo no
+    medio = bytearray(grande)
+    medio[len(medio) // 2] = 1
+    rutas = [escribir(tmp_path / "a.bin", grande), escribir(tmp_path / "b.bin", bytes(medio)),
+             escribir(tmp_path / "c.bin", grande), escribir(tmp_path / "unico.bin", b"solo"),
+             escribir(tmp_path / "p1.txt", b"igual"), escribir(tmp_path / "p2.txt", b"igual")]
+
+    parciales = contar_lecturas(monkeypatch, "hash_parcial")
+    completos = contar_lecturas(monkeypatch, "hash_archivo")
+
+    grupos, stats = renamer.buscar_duplicados(rutas)
+    assert grupos == [[rutas[0], rutas[2]], [rutas[4], rutas[5]]]
+    # Un tamaño único no se lee; los pequeños quedan resueltos con el parcial
+    assert sorted(parciales) == ["a.bin", "b.bin", "c.bin", "p1.txt", "p2.txt"]
+    assert sorted(completos) == ["a.bin", "b.bin", "c.bin"]
+    assert stats["archivos"] == 6
+    assert stats["bytes_parcial"] == 3 * 2 * BLOQUE_PARCIAL + 2 * len(b"igual")
+    assert stats["bytes_completo"] == 3 * len(grande)
+
+
+@pytest.mark.parametrize("size", [0, 1, BLOQUE_PARCIAL, 2 * BLOQUE_PARCIAL - 1, 2 * BLOQUE_PARCIAL])
+@pytest.mark.parametrize("algoritmo", ["md5", "blake2b"])
+def test_hash_parcial_de_archivo_pequeno_es_el_completo(tmp_path, size, algoritmo):
+    ruta = escribir(tmp_path / "a.bin", os.urandom(size))
+    assert hash_parcial(ruta, size, algoritmo) == hash_archivo(ruta, algoritmo)
+
+
+def test_hash_parcial_solo_lee_los_extremos(tmp_path):
+    datos = bytearray(os.urandom(2 * BLOQUE_PARCIAL + 10))
+    a = escribir(tmp_path / "a.bin", bytes(datos))
+    datos[BLOQUE_PARCIAL + 5] ^= 0xFF
+    b = escribir(tmp_path / "b.bin", bytes(datos))
+    assert hash_parcial(a, len(datos)) == hash_parcial(b, len(datos))
+    assert hash_archivo(a) != hash_archivo(b)
+
+
+def test_cache_sobrevive_a_un_renombrado(tmp_path, renamer):
+    renamer.usar_cache(str(tmp_path))
+    ruta = escribir(tmp_path / "IMG_1.jpg", b"foto")
+    h, leido = renamer._hash_completo(ruta)
+    assert leido
+
+    # Mismo inode, tamaño y mtime: se reutiliza sin leer y la fila pasa a la ruta nueva
+    nueva = str(tmp_path / "Ana1.jpg")
+    os.rename(ruta, nueva)
+    assert renamer._hash_completo(nueva) == (h, False)
+    assert renamer.cache.conn.execute("SELECT ruta FROM hashes").fetchall() == [(nueva,)]
+
+    # Si el contenido cambia, se vuelve a leer
+    escribir(tmp_path / "Ana1.jpg", b"otra foto")
+    assert renamer._hash_completo(nueva)[1]
+    renamer.usar_cache(None)
+
+
+def test_podar_borra_los_archivos_que_ya_no_existen(tmp_path):
+    cache = HashCache.para_biblioteca(str(tmp_path))
+    rutas = [escribir(tmp_path / nombre, nombre.encode()) for nombre in ("a.jpg", "b.jpg", "c.jpg")]
+    for ruta in rutas:
+        cache.put(ruta, "md5", os.stat(ruta), "h-" + os.path.basename(ruta))
+    os.remove(rutas[0])
+    renombrada = str(tmp_path / "d.jpg")
+    os.rename(rutas[1], renombrada)
+
+    assert cache.podar(str(tmp_path), [renombrada, rutas[2]]) == 1
+    filas = cache.conn.execute("SELECT ruta, hash FROM hashes ORDER BY ruta").fetchall()
+    assert filas == [(rutas[2], "h-c.jpg"), (renombrada, "h-b.jpg")]
+    cache.close()
+
+
+@pytest.mark.parametrize("politica, esperado", [
+    ("prioridad", ["Ana/IMG.jpg", "IMG.jpg", "Luis/largo_nombre.jpg"]),
+    ("antiguo", ["Luis/largo_nombre.jpg", "Ana/IMG.jpg", "IMG.jpg"]),
+    ("reciente", ["IMG.jpg", "Ana/IMG.jpg", "Luis/largo_nombre.jpg"]),
+    ("ruta_corta", ["IMG.jpg", "Ana/IMG.jpg", "Luis/largo_nombre.jpg"]),
+])
+def test_ordenar_grupo_segun_politica(tmp_path, renamer, politica, esperado):
+    for carpeta in ("Ana", "Luis"):
+        (tmp_path / carpeta).mkdir()
+    nombres = ["IMG.jpg", "Ana/IMG.jpg", "Luis/largo_nombre.jpg"]
+    grupo = [escribir(tmp_path / n, b"igual") for n in nombres]
+    for i, ruta in enumerate(grupo):
+        # IMG.jpg es el más reciente, largo_nombre.jpg el más antiguo
+        os.utime(ruta, (1000 - i * 100, 1000 - i * 100))
+    prioridad = {grupo[1]: 0, grupo[0]: 1, grupo[2]: 1}
+    ordenado = renamer.ordenar_grupo(grupo, politica, prioridad)
+    assert [os.path.relpath(r, tmp_path) for r in ordenado] == esperado
+
+
+def test_ordenar_grupo_desempata_por_orden_original(renamer):
+    grupo = ["/no/existe/b.jpg", "/no/existe/a.jpg"]
+    assert renamer.ordenar_grupo(grupo, "antiguo") == grupo
+    assert renamer.ordenar_grupo(grupo, "prioridad") == grupo
+
+
+def test_duplicados_biblioteca_entre_subcarpetas(tmp_path, renamer):
+    origen = tmp_path / "origen"
+    ana, luis = origen / "Ana", origen / "Luis"
+    for carpeta in (ana, luis):
+        carpeta.mkdir(parents=True)
+    foto = escribir(origen / "foto.jpg", b"foto de ana")
+    en_ana = escribir(ana / "Ana1.jpg", b"foto de ana")
+    en_luis = escribir(luis / "Luis1.jpg", b"foto de ana")
+    escribir(luis / "Luis2.jpg", b"otra foto")
+    escribir(ana / "Ana2.jpg", b"otra fotx")
+
+    # Las carpetas de personas van primero: lo ya clasificado se conserva
+    grupos, stats = renamer.duplicados_biblioteca([str(ana), str(luis), str(origen)])
+    assert grupos == [[en_ana, en_luis, foto]]
+    assert stats["archivos"] == 5
+
+    grupos, _ = renamer.duplicados_biblioteca([str(origen), str(ana), str(luis)])
+    assert grupos == [[foto, en_ana, en_luis]]
+    with pytest.raises(ValueError):
+        renamer.duplicados_biblioteca([str(origen)], politica="al_azar")
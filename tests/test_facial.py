@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from LogicaFacial import IndiceEmbeddings
+
+
+def fuerza_bruta(referencias, embedding, top_k):
+    # Mejor distancia coseno de cada persona, comparando uno a uno
+    q = np.asarray(embedding, dtype=np.float64)
+    mejores = {}
+    for nombre, embeddings in referencias.items():
+        for e in embeddings:
+            e = np.asarray(e, dtype=np.float64)
+            d = 1 - e @ q / (np.linalg.norm(e) * np.linalg.norm(q))
+            mejores[nombre] = min(mejores.get(nombre, 2.0), d)
+    return sorted(mejores.items(), key=lambda par: par[1])[:top_k]
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 10])
+def test_buscar_igual_que_fuerza_bruta(top_k):
+    rng = np.random.default_rng(top_k)
+    referencias = {f"persona{i}": list(rng.normal(size=(rng.integers(1, 6), 512))) for i in range(8)}
+    referencias["sin_fotos"] = []
+    indice = IndiceEmbeddings(referencias)
+    for _ in range(5):
+        embedding = rng.normal(size=512)
+        resultado = indice.buscar(embedding, top_k)
+        esperado = fuerza_bruta(referencias, embedding, top_k)
+        assert [n for n, _ in resultado] == [n for n, _ in esperado]
+        assert np.allclose([d for _, d in resultado], [d for _, d in esperado], atol=1e-5)
+
+
+def test_buscar_sin_referencias():
+    assert IndiceEmbeddings({}).buscar(np.ones(4)) == []
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Lo que tarda segundos en importarse: solo se carga al usarse por primera vez
+PESADOS = ("deepface", "tensorflow", "cv2", "pygame", "moviepy")
+MODULOS = ("LogicaArchivos", "LogicaDiario", "LogicaProgreso", "LogicaRenombramiento", "LogicaSimilitud",
+           "LogicaFacial", "LogicaVisor", "EditorImagen", "CuadriculaMiniaturas", "ClasificadorDaemon",
+           "ClasificadorCLI", "ClasificadorFacial", "ClasificadorArchivos")
+
+
+def test_importar_no_carga_dependencias_pesadas():
+    pytest.importorskip("tkinter")
+    # En un proceso aparte: otros tests pueden haber importado cv2 en este
+    codigo = (f"import sys\n"
+              f"import {', '.join(MODULOS)}\n"
+              f"print(','.join(m for m in {PESADOS!r} if m in sys.modules))")
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert salida.stdout.strip() == ""
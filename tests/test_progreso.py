@@ -0,0 +1,78 @@
+import threading
+from LogicaProgreso import ReporteProgreso, texto_progreso
+
+
+class WidgetFalso:
+    """Hace de ventana de Tk: guarda los `after` y los ejecuta cuando se le pide."""
+    def __init__(self):
+        self.programados = []
+        self.existe = True
+
+    def after(self, ms, funcion):
+        self.programados.append(funcion)
+
+    def winfo_exists(self):
+        return self.existe
+
+    def tick(self):
+        programados, self.programados = self.programados, []
+        for funcion in programados:
+            funcion()
+
+
+def reporte_con_registro():
+    widget, eventos = WidgetFalso(), []
+    reporte = ReporteProgreso(widget, on_progress=lambda *a: eventos.append(("progreso", a[:3])),
+                              on_log=lambda texto: eventos.append(("log", texto)))
+    return widget, reporte, eventos
+
+
+def test_muchos_avisos_se_entregan_una_vez_por_refresco():
+    widget, reporte, eventos = reporte_con_registro()
+    reporte.iniciar()
+
+    def trabajo():
+        for i in range(1, 1001):
+            reporte.progreso(i, 1000, "Hash")
+            reporte.log(f"linea {i}")
+    hilo = threading.Thread(target=trabajo)
+    hilo.start()
+    hilo.join()
+    assert eventos == []
+
+    widget.tick()
+    assert eventos == [("progreso", (1000, 1000, "Hash")), ("log", "\n".join(f"linea {i}" for i in range(1, 1001)))]
+    # Sin avisos nuevos el siguiente refresco no entrega nada, pero sigue programado
+    widget.tick()
+    assert len(eventos) == 2 and len(widget.programados) == 1
+
+
+def test_detener_entrega_lo_pendiente_en_orden():
+    widget, reporte, eventos = reporte_con_registro()
+    reporte.iniciar()
+    reporte.progreso(3, 10, "Moviendo")
+    reporte.log("a")
+    reporte.en_ui(lambda: eventos.append(("ui", "fin")))
+    reporte.log("b")
+    reporte.estado("Listo")
+
+    reporte.detener()
+    assert eventos == [("progreso", (3, 10, "Listo")), ("log", "a"), ("ui", "fin"), ("log", "b")]
+    # Tras detener, el refresco programado ya no se vuelve a programar
+    widget.tick()
+    assert widget.programados == []
+
+
+def test_ventana_cerrada_deja_de_refrescar():
+    widget, reporte, eventos = reporte_con_registro()
+    reporte.iniciar()
+    reporte.log("perdida")
+    widget.existe = False
+    widget.tick()
+    assert eventos == [] and widget.programados == [] and not reporte.activo
+
+
+def test_texto_progreso():
+    assert texto_progreso(45, 100, "Hash") == "Hash (45%)"
+    assert texto_progreso(0, 0) == ""
+    assert texto_progreso(50, 100, "Hash", velocidad=10.0, eta=75) == "Hash (50%) · 10.0/s · ETA 1:15"
@@ -0,0 +1,125 @@
+import os
+import pytest
+import LogicaRenombramiento
+from LogicaDiario import DiarioOperaciones
+from LogicaRenombramiento import (DIARIO_RENOMBRADO, ejecutar_renombrados, ordenar_renombrados,
+                                  planificar_renombrado, recuperar_renombrado)
+
+
+def crear(carpeta, nombres):
+    # Cada archivo guarda su nombre original para comprobar adónde fue a parar
+    for nombre in nombres:
+        (carpeta / nombre).write_text(nombre)
+
+
+def contenido(carpeta):
+    return {p.name: p.read_text() for p in carpeta.iterdir()}
+
+
+def aplicar_en_memoria(nombres, operaciones):
+    archivos = {n: n for n in nombres}
+    for origen, destino in operaciones:
+        assert destino not in archivos, f"{destino} se sobrescribiría"
+        archivos[destino] = archivos.pop(origen)
+    return archivos
+
+
+class Corte(BaseException):
+    # BaseException: ejecutar_renombrados no la captura, como si se cortara la luz
+    pass
+
+
+def test_planificar_omite_los_que_ya_tienen_su_nombre():
+    plan = planificar_renombrado(["Ana.jpg", "x.png", "Ana2.jpg"], "Ana")
+    assert plan == {"x.png": "Ana1.png"}
+
+
+def test_cadena_sin_temporales():
+    # a -> b -> c -> d: cada uno espera a que su destino quede libre
+    plan = {"a.jpg": "b.jpg", "b.jpg": "c.jpg", "c.jpg": "d.jpg"}
+    operaciones = ordenar_renombrados(plan)
+    assert operaciones == [("c.jpg", "d.jpg"), ("b.jpg", "c.jpg"), ("a.jpg", "b.jpg")]
+    assert aplicar_en_memoria(plan, operaciones) == {"b.jpg": "a.jpg", "c.jpg": "b.jpg", "d.jpg": "c.jpg"}
+
+
+def test_ciclo_con_un_solo_temporal():
+    plan = {"a.jpg": "b.jpg", "b.jpg": "c.jpg", "c.jpg": "a.jpg"}
+    operaciones = ordenar_renombrados(plan)
+    assert len(operaciones) == len(plan) + 1
+    assert aplicar_en_memoria(plan, operaciones) == {"b.jpg": "a.jpg", "c.jpg": "b.jpg", "a.jpg": "c.jpg"}
+
+
+def test_intercambio_y_cadena_en_disco(tmp_path):
+    nombres = ["a.jpg", "b.jpg", "c.jpg", "d.jpg", "e.jpg"]
+    crear(tmp_path, nombres)
+    plan = {"a.jpg": "b.jpg", "b.jpg": "a.jpg", "c.jpg": "d.jpg", "d.jpg": "f.jpg"}
+    hechos = ejecutar_renombrados(str(tmp_path), ordenar_renombrados(plan))
+    assert hechos == 5
+    assert contenido(tmp_path) == {"b.jpg": "a.jpg", "a.jpg": "b.jpg", "d.jpg": "c.jpg", "f.jpg": "d.jpg", "e.jpg": "e.jpg"}
+
+
+def test_destino_ocupado_vuelve_al_estado_original(tmp_path):
+    crear(tmp_path, ["a.jpg", "b.jpg", "ajeno.jpg"])
+    # ajeno.jpg no está en el plan: pisarlo perdería un archivo
+    operaciones = [("a.jpg", "c.jpg"), ("b.jpg", "ajeno.jpg")]
+    with pytest.raises(FileExistsError):
+        ejecutar_renombrados(str(tmp_path), operaciones)
+    assert contenido(tmp_path) == {"a.jpg": "a.jpg", "b.jpg": "b.jpg", "ajeno.jpg": "ajeno.jpg"}
+
+
+@pytest.mark.parametrize("corte", [0, 1, 3, 4])
+@pytest.mark.parametrize("adelante", [True, False])
+@pytest.mark.parametrize("perder_anotaciones", [False, True])
+def test_recuperar_diario_a_medias(tmp_path, monkeypatch, corte, adelante, perder_anotaciones):
+    nombres = ["a.jpg", "b.jpg", "c.jpg", "x.jpg"]
+    crear(tmp_path, nombres)
+    plan = {"a.jpg": "b.jpg", "b.jpg": "c.jpg", "c.jpg": "a.jpg", "x.jpg": "d.jpg"}
+    operaciones = ordenar_renombrados(plan)
+    assert len(operaciones) == 5
+
+    rename = os.rename
+    llamadas = []
+    def rename_con_corte(origen, destino):
+        if len(llamadas) == corte: raise Corte()
+        llamadas.append(origen)
+        rename(origen, destino)
+    monkeypatch.setattr(LogicaRenombramiento.os, "rename", rename_con_corte)
+    with pytest.raises(Corte):
+        ejecutar_renombrados(str(tmp_path), operaciones, lote=1)
+    monkeypatch.setattr(LogicaRenombramiento.os, "rename", rename)
+
+    diario = tmp_path / DIARIO_RENOMBRADO
+    assert diario.exists()
+    if perder_anotaciones:
+        # Solo la cabecera llegó al disco: el corte se deduce de los inodes
+        diario.write_text(diario.read_text().splitlines()[0] + "\n")
+
+    assert recuperar_renombrado(str(tmp_path), adelante=adelante, log_callback=lambda m: None) is True
+    assert not diario.exists()
+    esperado = {plan.get(n, n): n for n in nombres} if adelante else {n: n for n in nombres}
+    assert contenido(tmp_path) == esperado
+
+
+def test_recuperar_sin_diario(tmp_path):
+    assert recuperar_renombrado(str(tmp_path)) is None
+
+
+def test_diario_que_no_coincide_se_conserva(tmp_path):
+    crear(tmp_path, ["a.jpg"])
+    diario = tmp_path / DIARIO_RENOMBRADO
+    diario.write_text('{"operaciones": [["q.jpg", "r.jpg"]], "inodos": {"q.jpg": 1}}\n')
+    assert recuperar_renombrado(str(tmp_path), log_callback=lambda m: None) is False
+    assert diario.exists()
+    assert (tmp_path / "a.jpg").exists()
+
+
+def test_procesar_carpeta_omite_diario_irrecuperable(tmp_path):
+    carpeta = tmp_path / "Ana"
+    carpeta.mkdir()
+    crear(carpeta, ["x.jpg"])
+    (carpeta / DIARIO_RENOMBRADO).write_text('{"operaciones": [["q.jpg", "r.jpg"]], "inodos": {"q.jpg": 1}}\n')
+    diario = DiarioOperaciones(str(tmp_path / "operaciones.jsonl"), log_callback=lambda m: None)
+    renamer = LogicaRenombramiento.RenamerTool(log_callback=lambda m: None, diario=diario)
+    totales = renamer.procesar_carpetas([str(carpeta)])
+    assert totales["errores"] == 1 and totales["renombrados"] == 0
+    assert (carpeta / "x.jpg").exists()
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from PIL import Image
+from LogicaSimilitud import DetectorSimilares, agrupar, coincidencia_secuencia, distancia_hamming, pares_cercanos
+
+
+def guardar(ruta, pixeles):
+    Image.fromarray(np.asarray(pixeles, dtype=np.uint8)).save(ruta)
+    return str(ruta)
+
+
+def variantes(rng, n_bases, por_base, max_bits):
+    # Huellas alrededor de unas pocas bases, a 0..max_bits bits de distancia
+    huellas = []
+    for base in rng.integers(0, 2**63, n_bases, dtype=np.int64).tolist():
+        for _ in range(por_base):
+            bits = rng.choice(64, rng.integers(0, max_bits + 1), replace=False)
+            huellas.append(base ^ sum(1 << int(b) for b in bits))
+    return huellas
+
+
+@pytest.mark.parametrize("radio", [0, 3, 8, 11])
+def test_pares_cercanos_igual_que_fuerza_bruta(radio):
+    rng = np.random.default_rng(radio)
+    huellas = variantes(rng, 20, 8, 12)
+    esperado = [(i, j) for i in range(len(huellas)) for j in range(i + 1, len(huellas))
+                if distancia_hamming(huellas[i], huellas[j]) <= radio]
+    assert [tuple(p) for p in pares_cercanos(huellas, radio).tolist()] == esperado
+
+
+def test_pares_cercanos_con_menos_de_dos_huellas():
+    assert pares_cercanos([]).shape == (0, 2)
+    assert pares_cercanos([5]).shape == (0, 2)
+
+
+def test_agrupar_es_transitivo():
+    # a-b y b-c están a 8 bits, pero a-c a 16: los tres van al mismo grupo
+    a, b, c = 0, 0xFF, 0xFFFF
+    lejos = 0xFFFFFFFF00000000
+    assert agrupar([("a", a), ("lejos", lejos), ("c", c), ("b", b)], radio=8) == [["a", "c", "b"]]
+    assert agrupar([("a", a), ("c", c)], radio=8) == []
+
+
+def test_imagenes_uniformes_no_se_agrupan(tmp_path):
+    rng = np.random.default_rng(0)
+    ruido = rng.integers(0, 256, (64, 64, 3))
+    uniformes = [guardar(tmp_path / "blanca.png", np.full((64, 64, 3), 255)),
+                 guardar(tmp_path / "negra.png", np.zeros((64, 64, 3))),
+                 guardar(tmp_path / "roja.png", np.tile([200, 10, 10], (64, 64, 1)))]
+    foto = guardar(tmp_path / "foto.png", ruido)
+    copia = guardar(tmp_path / "copia.png", np.clip(ruido.astype(int) + 3, 0, 255))
+
+    detector = DetectorSimilares(log_callback=lambda m: None)
+    grupos = detector.buscar_similares(uniformes + [foto, copia])
+    assert grupos == [[foto, copia]]
+    assert sorted(detector.uniformes) == sorted(uniformes)
+
+
+def test_fotogramas_uniformes_no_cuentan_en_la_secuencia():
+    # Dos videos distintos que solo comparten los fundidos a negro
+    a = [None, None, 0x0F0F0F0F0F0F0F0F, 0x123456789ABCDEF0]
+    b = [None, None, 0xF0F0F0F0F0F0F0F0, 0x0FEDCBA987654321]
+    assert coincidencia_secuencia(a, b) == 0.0
+    assert coincidencia_secuencia(a, list(a)) == 1.0
+
+
+def grabar(ruta, fotogramas, lado):
+    cv2 = pytest.importorskip("cv2")
+    video = cv2.VideoWriter(str(ruta), cv2.VideoWriter_fourcc(*"MJPG"), 10, (lado, lado))
+    for fotograma in fotogramas:
+        video.write(cv2.resize(fotograma, (lado, lado), interpolation=cv2.INTER_AREA))
+    video.release()
+    return str(ruta)
+
+
+def test_videos_recortados_y_reescalados_se_agrupan(tmp_path):
+    rng = np.random.default_rng(1)
+    # Escenas que cambian poco a poco, como en un video real
+    escenas = [rng.integers(0, 256, (8, 8, 3)).astype(np.uint8) for _ in range(5)]
+    fotogramas = [np.kron(escenas[i // 12], np.ones((16, 16, 1), dtype=np.uint8)) for i in range(60)]
+    original = grabar(tmp_path / "original.avi", fotogramas, 128)
+    recortado = grabar(tmp_path / "recortado.avi", fotogramas[2:], 64)
+    otro = grabar(tmp_path / "otro.avi", fotogramas[::-1], 128)
+
+    detector = DetectorSimilares(log_callback=lambda m: None)
+    # El más largo va primero aunque se pase al final
+    assert detector.buscar_videos_similares([recortado, otro, original]) == [[original, recortado]]